@@ -0,0 +1,74 @@
+"""
+Benchmarks for the agents and utilities of this repository.
+
+Run from the root of the repository, e.g. `python -m benchmarks.cartpole`.
+"""
+
+import os
+import sys
+import time
+import importlib.util
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load(path, name=None):
+    """
+    Load a module from a file path relative to the root of the repository.
+
+    Needed as the game directories (e.g. `cart-pole`) are not valid package names, and as several
+    of them contain a module with the same name (e.g. `DQN.py`). The directory of the module is
+    searched first while loading, so that imports of neighbouring modules are resolved.
+
+    Parameters
+    ----------
+    path : str
+        Path relative to the root of the repository, e.g. "cart-pole/DQN.py".
+    name : str, optional
+        Name of the module. Defaults to the path with non-alphanumeric characters replaced.
+
+    Returns
+    -------
+    module
+    """
+    name = name or "".join(c if c.isalnum() else "_" for c in path[:-3])
+
+    path = os.path.join(ROOT, path)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+
+    sys.path.insert(0, os.path.dirname(path))
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(os.path.dirname(path))
+
+    return module
+
+
+def timeit(function, repeat=1, warmup=0):
+    """
+    Measure the wall time of a function.
+
+    Parameters
+    ----------
+    function : callable
+        Function without arguments.
+    repeat : int, optional
+        Number of timed calls.
+    warmup : int, optional
+        Number of untimed calls before timing.
+
+    Returns
+    -------
+    seconds : float
+        Average wall time per call.
+    """
+    for _ in range(warmup):
+        function()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+
+    return (time.perf_counter() - start) / repeat
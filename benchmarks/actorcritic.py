@@ -0,0 +1,147 @@
+"""
+Wall time and environment steps until cart-pole is solved; advantage actor-critic versus REINFORCE.
+
+Cart-pole ("CartPole-v1") is considered solved when the average length of the last 100 games
+reaches 475 steps.
+
+Usage: `python -m benchmarks.actorcritic [--steps 1000000] [--seed 0]`
+"""
+
+import time
+import argparse
+
+import numpy as np
+import torch
+import gymnasium as gym
+
+from benchmarks import load
+
+SOLVED = 475
+
+PolicyGradient = load("cart-pole/REINFORCE.py").PolicyGradient
+ActorCritic = load("cart-pole/A2C.py").ActorCritic
+CartPole = load("cart-pole/vectorized.py").CartPole
+
+
+class Progress:
+    """Keeps track of the environment steps and finished games until solved."""
+    def __init__(self, budget):
+        self.budget = budget
+        self.steps = 0
+        self.games = []
+        self.start = time.perf_counter()
+
+    def update(self, steps):
+        """
+        Register finished games.
+
+        Parameters
+        ----------
+        steps : list of int
+            Length of each finished game.
+
+        Returns
+        -------
+        bool
+            Whether to stop; solved or out of budget.
+        """
+        self.games.extend(steps)
+        return self.solved or self.steps >= self.budget
+
+    @property
+    def solved(self):
+        """Whether the average length of the last 100 games reaches `SOLVED`."""
+        return len(self.games) >= 100 and np.mean(self.games[-100:]) >= SOLVED
+
+    def __str__(self):
+        return (f"{self.steps if self.solved else '-':>12}{len(self.games):>10}"
+                f"{time.perf_counter() - self.start:>12.1f}")
+
+
+def reinforce(budget):
+    """REINFORCE as in `cart-pole/REINFORCE.ipynb`; learns after every game."""
+    agent = PolicyGradient(network={"inputs": 4, "outputs": 2, "nodes": [30, 15]},
+                           optimizer={"optimizer": torch.optim.RMSprop, "lr": 0.00025})
+    environment = gym.make("CartPole-v1")
+    environment.reset(seed=0)
+
+    progress = Progress(budget)
+    done = False
+    while not done:
+        state = torch.tensor(environment.reset()[0], dtype=torch.float32).view(-1)
+        terminated = truncated = False
+
+        steps = 0
+        while not (terminated or truncated):
+            steps += 1
+            action, logarithm = agent.action(state)
+            state, reward, terminated, truncated, _ = environment.step(action)
+            state = torch.tensor(state, dtype=torch.float32).view(-1)
+            agent.memorize(logarithm, reward)
+        agent.learn()
+
+        progress.steps += steps
+        done = progress.update([steps])
+
+    return progress
+
+
+def batched(budget, environments=16):
+    """REINFORCE with batched rollouts; learns after every `environments` games."""
+    agent = PolicyGradient(network={"inputs": 4, "outputs": 2, "nodes": [30, 15]},
+                           optimizer={"optimizer": torch.optim.Adam, "lr": 0.005},
+                           batched=True)
+    environment = CartPole(environments=environments, seed=0)
+    states, _ = environment.reset()
+
+    progress = Progress(budget)
+    done = False
+    while not done:
+        states, steps = agent.rollout(environment, states, games=environments)
+        agent.learn()
+
+        progress.steps += sum(steps)
+        done = progress.update(steps)
+
+    return progress
+
+
+def actorcritic(budget, environments=16):
+    """Advantage actor-critic; learns after every segment of 8 steps in each game."""
+    agent = ActorCritic(network={"inputs": 4, "outputs": 2, "nodes": [64, 64]},
+                        optimizer={"optimizer": torch.optim.Adam, "lr": 0.001},
+                        segment=8)
+    environment = CartPole(environments=environments, seed=0)
+    states, _ = environment.reset()
+
+    progress = Progress(budget)
+    done = False
+    while not done:
+        states, steps = agent.observe(environment, states)
+        agent.learn()
+
+        progress.steps += environments * agent.parameter["segment"]
+        done = progress.update(steps)
+
+    return progress
+
+
+def main():
+    """Train each agent until solved (or out of budget)."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--steps", type=int, default=10 ** 6,
+                        help="Maximum number of environment steps per agent.")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args()
+
+    print(f"{'agent':<22}{'steps':>12}{'games':>10}{'seconds':>12}")
+    for name, function in [("REINFORCE", reinforce),
+                           ("REINFORCE (batched)", batched),
+                           ("actor-critic", actorcritic)]:
+        torch.manual_seed(arguments.seed)
+        np.random.seed(arguments.seed)
+        print(f"{name:<22}{function(arguments.steps)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
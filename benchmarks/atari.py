@@ -0,0 +1,116 @@
+"""
+Deterministic stand-in for the Atari (ALE) environments; no ROMs needed.
+
+The frames have the shape of `gymnasium.make("ALE/<Game>-v5", obs_type="grayscale")`, i.e.
+(210, 160) of `uint8`, and contain a few moving blocks on a static background. The frames,
+rewards and game lengths only depend on the seed given to `reset` and the actions taken.
+"""
+
+import time
+
+import numpy as np
+import gymnasium as gym
+
+
+class Atari(gym.Env):
+    """Deterministic Atari-shaped environment."""
+    metadata = {"render_modes": ["rgb_array"], "render_fps": 30}
+
+    def __init__(self, actions=4, length=200, cost=0.0, render_mode="rgb_array", **other):
+        """
+        Deterministic Atari-shaped environment.
+
+        Parameters
+        ----------
+        actions : int, optional
+            Number of actions, e.g. 4 for Breakout, 9 for Enduro and 5 for Tetris.
+        length : int, optional
+            Number of frames (steps) per game.
+        cost : float, optional
+            Emulation cost per frame in microseconds (busy-waiting), e.g. to mimic the ALE.
+        render_mode : str, optional
+        other
+            Additional parameters.
+
+            reward : int, optional
+                A reward of 1 is given every `reward` frames when the action is non-zero.
+            background : int, optional
+                Grey level of the background.
+        """
+        self.observation_space = gym.spaces.Box(0, 255, (210, 160), np.uint8)
+        self.action_space = gym.spaces.Discrete(actions)
+        self.render_mode = render_mode
+
+        self.parameter = {
+            "length": length,
+            "cost": cost / 1e6,
+            "reward": other.get("reward", 25),
+            "background": other.get("background", 0),
+        }
+        self.state = {"frame": 0, "blocks": np.zeros((8, 2), dtype=np.int64)}
+
+    def reset(self, *, seed=None, options=None):
+        """
+        Start a new game.
+
+        Parameters
+        ----------
+        seed : int, optional
+            Seeds the positions of the blocks.
+        options : dict, optional
+            Unused; as of `gymnasium.Env.reset`.
+
+        Returns
+        -------
+        observation : numpy.ndarray
+        info : dict
+        """
+        super().reset(seed=seed, options=options)
+
+        self.state["frame"] = 0
+        self.state["blocks"] = self.np_random.integers(0, [200, 150], size=(8, 2))
+
+        return self._observation(), {}
+
+    def step(self, action):
+        """
+        Advance the game by a frame; the blocks move by the action.
+
+        Parameters
+        ----------
+        action : int
+
+        Returns
+        -------
+        observation : numpy.ndarray
+        reward : float
+        terminated : bool
+        truncated : bool
+        info : dict
+        """
+        if self.parameter["cost"]:
+            end = time.perf_counter() + self.parameter["cost"]
+            while time.perf_counter() < end:
+                pass
+
+        self.state["frame"] += 1
+        self.state["blocks"] = (self.state["blocks"] + [3, 2] + int(action)) % [200, 150]
+
+        reward = float(int(action) != 0 and self.state["frame"] % self.parameter["reward"] == 0)
+        terminated = self.state["frame"] >= self.parameter["length"]
+
+        return self._observation(), reward, terminated, False, {}
+
+    def render(self):
+        """The current frame, as RGB."""
+        return np.repeat(self._observation()[..., None], 3, axis=2)
+
+    def _observation(self):
+        """Grayscale frame with the blocks drawn on the background."""
+        frame = np.full((210, 160), self.parameter["background"], dtype=np.uint8)
+        for y, x in self.state["blocks"]:
+            frame[y:y + 10, x:x + 10] = 200
+        return frame
+
+
+gym.register("benchmarks/Atari-v0", entry_point="benchmarks.atari:Atari")
@@ -0,0 +1,132 @@
+"""
+Parity and throughput of the vectorized cart-pole environment (`cart-pole/vectorized.py`).
+
+Usage: `python -m benchmarks.cartpole [--games 100] [--steps 200]`
+"""
+
+import time
+import argparse
+
+import numpy as np
+import gymnasium as gym
+
+from benchmarks import load
+
+CartPole = load("cart-pole/vectorized.py").CartPole
+
+
+def parity(games=100, seed=0):
+    """
+    Compare the vectorized environment with `gymnasium`'s "CartPole-v1" using random actions.
+
+    The reference initial states are copied into the vectorized environment, so that every
+    observation, reward, termination and truncation can be compared step by step.
+
+    Parameters
+    ----------
+    games : int, optional
+    seed : int, optional
+
+    Returns
+    -------
+    steps : int
+        Number of compared steps.
+
+    Raises
+    ------
+    AssertionError
+        If the environments diverge.
+    """
+    reference = gym.make("CartPole-v1")
+    environment = CartPole(environments=1, seed=seed)
+    random = np.random.default_rng(seed)
+
+    environment.reset()
+    total = 0
+    for game in range(games):
+        observation, _ = reference.reset(seed=seed + game)
+        environment.state[0] = reference.unwrapped.state
+
+        done = False
+        while not done:
+            action = int(random.integers(2))
+
+            observation, reward, terminated, truncated, _ = reference.step(action)
+            _observation, _reward, _terminated, _truncated, info = environment.step(
+                np.array([action])
+            )
+
+            np.testing.assert_allclose(info["final_observation"][0], observation, rtol=1e-6)
+            assert (_reward[0], _terminated[0], _truncated[0]) == (reward, terminated, truncated)
+
+            done = terminated or truncated
+            total += 1
+
+    # Long games are needed to verify truncation.
+    environment = CartPole(environments=1, max_steps=10, seed=seed)
+    environment.reset()
+    for step in range(1, 11):
+        environment.state[0] = 0.0
+        _, _, terminated, truncated, _ = environment.step(np.array([step % 2]))
+        assert not terminated[0] and truncated[0] == (step == 10)
+
+    return total
+
+
+def throughput(environments, steps):
+    """
+    Steps per second of the vectorized environment with random actions.
+
+    Parameters
+    ----------
+    environments : int
+    steps : int
+
+    Returns
+    -------
+    float
+        Total (over all games) steps per second.
+    """
+    environment = CartPole(environments=environments, seed=0)
+    environment.reset()
+    actions = np.random.default_rng(0).integers(2, size=(steps, environments))
+
+    start = time.perf_counter()
+    for action in actions:
+        environment.step(action)
+
+    return environments * steps / (time.perf_counter() - start)
+
+
+def baseline(steps):
+    """Steps per second of `gymnasium`'s "CartPole-v1" with random actions."""
+    environment = gym.make("CartPole-v1")
+    environment.reset(seed=0)
+    actions = np.random.default_rng(0).integers(2, size=steps)
+
+    start = time.perf_counter()
+    for action in actions:
+        _, _, terminated, truncated, _ = environment.step(int(action))
+        if terminated or truncated:
+            environment.reset()
+
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    """Run the parity check, then benchmark N = 1 to 100k parallel games."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=200)
+    arguments = parser.parse_args()
+
+    print(f"Parity: {parity(arguments.games)} steps matching CartPole-v1")
+
+    print(f"{'environments':>12}{'steps/s':>16}")
+    print(f"{'gymnasium':>12}{baseline(arguments.steps * 10):>16.0f}")
+    for environments in (1, 10, 100, 1000, 10000, 100000):
+        print(f"{environments:>12}{throughput(environments, arguments.steps):>16.0f}")
+
+
+if __name__ == "__main__":
+    main()
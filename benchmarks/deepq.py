@@ -0,0 +1,143 @@
+"""
+Training throughput of the cart-pole `DeepQ` agent; default versus high-throughput (`fast`) mode.
+
+Usage: `python -m benchmarks.deepq [--games 200] [--repeat 200]`
+"""
+
+import copy
+import time
+import argparse
+
+import torch
+import gymnasium as gym
+
+from benchmarks import load, timeit
+
+DeepQ = load("cart-pole/DQN.py").DeepQ
+CartPole = load("cart-pole/vectorized.py").CartPole
+
+NETWORK = {"inputs": 4, "outputs": 2, "nodes": [15, 30]}
+OPTIMIZER = {"optimizer": torch.optim.RMSprop, "lr": 0.0025}
+
+
+def play(environment, agent, games, learn=False):
+    """
+    Play (and optionally learn from) a number of games.
+
+    Parameters
+    ----------
+    environment : gymnasium.Env
+    agent : DeepQ
+    games : int
+    learn : bool, optional
+        Whether to call `learn` after every game.
+
+    Returns
+    -------
+    steps : int
+        Total number of environment steps.
+    """
+    network = copy.deepcopy(agent)
+
+    total = 0
+    for _ in range(games):
+        state = torch.tensor(environment.reset()[0], dtype=torch.float32).unsqueeze(0)
+        terminated = truncated = False
+
+        steps = 0
+        while not (terminated or truncated):
+            steps += 1
+            action = agent.action(state)
+            new_state, reward, terminated, truncated, _ = environment.step(action.item())
+            new_state = torch.tensor(new_state, dtype=torch.float32).unsqueeze(0)
+
+            agent.remember(state, action, new_state, torch.tensor([reward]))
+            state = new_state
+        agent.memorize(steps)
+        total += steps
+
+        if learn:
+            agent.learn(network=network)
+
+    return total
+
+
+def vectorized(agent, environments, steps):
+    """
+    Play and learn (every step) in a vectorized environment; high-throughput mode only.
+
+    Parameters
+    ----------
+    agent : DeepQ
+    environments : int
+        Number of parallel games.
+    steps : int
+        Number of vectorized steps.
+
+    Returns
+    -------
+    float
+        Environment steps per second.
+    """
+    network = copy.deepcopy(agent)
+    environment = CartPole(environments=environments, seed=0)
+    state, _ = environment.reset()
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        action = agent.action(torch.from_numpy(state)).numpy()
+        new_state, reward, terminated, truncated, info = environment.step(action)
+
+        agent.experience(state, action, info["final_observation"], reward, terminated | truncated)
+        state = new_state
+
+        if agent.memory["size"] >= agent.batch_size:
+            agent.learn(network=network)
+
+    return environments * steps / (time.perf_counter() - start)
+
+
+def main():
+    """Benchmark `DeepQ.learn` and end-to-end training in both modes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=64)
+    arguments = parser.parse_args()
+
+    environment = gym.make("CartPole-v1")
+    environment.reset(seed=0)
+
+    print(f"{'mode':<10}{'learn/s':>12}{'samples/s':>14}{'env steps/s':>14}")
+    for fast in (False, True):
+        torch.manual_seed(0)
+        agent = DeepQ(network=dict(NETWORK), optimizer=OPTIMIZER,
+                      batch_size=arguments.batch_size, memory=10 ** 5 if fast else 200,
+                      exploration_rate=1.0, fast=fast)
+        network = copy.deepcopy(agent)
+        play(environment, agent, arguments.games)
+
+        # Samples per call; transitions of whole games in the default mode.
+        samples = arguments.batch_size if fast else (
+            sum(game.steps for game in agent.memory)
+            * min(1.0, arguments.batch_size / len(agent.memory))
+        )
+        seconds = timeit(lambda: agent.learn(network=network),  # pylint: disable=W0640
+                         repeat=arguments.repeat, warmup=5)
+
+        start = time.perf_counter()
+        steps = play(environment, agent, arguments.games, learn=True)
+        duration = time.perf_counter() - start
+
+        print(f"{'fast' if fast else 'default':<10}"
+              f"{1 / seconds:>12.1f}{samples / seconds:>14.0f}{steps / duration:>14.0f}")
+
+    for environments in (16, 256):
+        agent = DeepQ(network=dict(NETWORK), optimizer=OPTIMIZER,
+                      batch_size=arguments.batch_size, memory=10 ** 5, fast=True)
+        print(f"{f'fast x{environments}':<10}{'':>26}"
+              f"{vectorized(agent, environments, arguments.repeat * 5):>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Aggregate throughput of data-parallel training (`help.training.distributed`) over 1, 2 and 4 ranks.
+
+Each rank plays breakout on the stand-in environment of `benchmarks.atari` and learns after every
+game, with the gradients averaged over the ranks. The frames played and samples (games) learned
+per second are summed over the ranks; ideally, they scale with the number of ranks, as long as
+there is a core per rank.
+
+Usage: `python -m benchmarks.distributed [--ranks 1 2 4] [--seconds 20] [--length 64]`
+"""
+
+import os
+import copy
+import json
+import time
+import argparse
+import tempfile
+
+import torch
+
+from benchmarks.suite import vision
+from help.training.distributed import launch
+
+
+def play(distributed, seconds, length, path):
+    """Play and learn for `seconds` (after filling the memory); rank 0 writes the throughput."""
+    torch.set_num_threads(max(1, len(os.sched_getaffinity(0)) // distributed.world))
+
+    agent, environment, _ = vision("breakout", length=length)
+    agent.memory["batch_size"] = 8
+    agent.parameter["rate"] = agent.parameter["min"] = 0.5
+    distributed.broadcast(agent)
+    network = copy.deepcopy(agent)
+    distributed.wrap(agent)
+
+    game = frames = samples = 0
+    start = None
+    while True:
+        game += 1
+        initial = agent.preprocess(environment.reset(seed=1000 * distributed.rank + game)[0])
+        states = torch.cat([initial] * agent.shape["reshape"][1], dim=1)
+
+        done, steps = False, 0
+        while not done:
+            action, new_states, rewards, done = agent.observe(environment, states, 4)
+            agent.remember(states, action, torch.tensor(rewards))
+            states = new_states
+            steps += 1
+        agent.memorize(states, steps)
+        agent.memory["game"].clear()
+
+        if game <= agent.memory["batch_size"]:
+            continue
+        start = start or time.perf_counter()
+
+        agent.learn(network=network, clamp=(-10, 10))
+        frames += steps * 4 * agent.shape["reshape"][1]
+        samples += agent.memory["batch_size"]
+
+        # The ranks stop together, as each `learn` is a collective call.
+        if distributed.any(time.perf_counter() - start > seconds)[0]:
+            break
+
+    elapsed = distributed.sum(time.perf_counter() - start)[0] / distributed.world
+    frames, samples = distributed.sum(frames, samples)
+    if distributed.rank == 0:
+        with open(path, "w", encoding="UTF-8") as file:
+            json.dump({"frames": frames / elapsed, "samples": samples / elapsed}, file)
+    return 0
+
+
+def main():
+    """Measure the aggregate throughput for each number of ranks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ranks", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--length", type=int, default=64, help="Frames per game.")
+    arguments = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores")
+    print(f"{'ranks':>6}{'frames/s':>12}{'samples/s':>12}{'speed-up':>10}")
+    base = None
+    with tempfile.TemporaryDirectory() as directory:
+        for ranks in arguments.ranks:
+            path = os.path.join(directory, f"{ranks}.json")
+            launch(play, ranks, arguments.seconds, arguments.length, path)
+            with open(path, encoding="UTF-8") as file:
+                result = json.load(file)
+            base = base or result["frames"]
+            print(f"{ranks:>6}{result['frames']:>12.1f}{result['samples']:>12.1f}"
+                  f"{result['frames'] / base:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
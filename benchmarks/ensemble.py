@@ -0,0 +1,122 @@
+"""
+Agent-steps per second of K cart-pole `DeepQ` agents; ensemble (one process) versus K processes.
+
+Every agent plays `--environments` parallel games and learns after every step.
+
+Usage: `python -m benchmarks.ensemble [--agents 1 4 16 64] [--steps 200]`
+"""
+
+import os
+import time
+import argparse
+import multiprocessing
+
+import torch
+
+from benchmarks import load
+
+NETWORK = {"inputs": 4, "outputs": 2, "nodes": [15, 30]}
+OPTIMIZER = {"optimizer": torch.optim.RMSprop, "lr": 0.0025}
+
+DeepQ = load("cart-pole/DQN.py").DeepQ
+CartPole = load("cart-pole/vectorized.py").CartPole
+Ensemble = load("cart-pole/ensemble.py").Ensemble
+
+
+def agent(seed):
+    """A high-throughput `DeepQ` agent."""
+    torch.manual_seed(seed)
+    return DeepQ(network=dict(NETWORK), optimizer=OPTIMIZER,
+                 batch_size=64, memory=10 ** 4, fast=True)
+
+
+def single(seed, environments, steps):
+    """
+    Train one agent (as one of K separate processes).
+
+    Returns
+    -------
+    start, end : float
+        Wall-clock interval of the training, comparable across processes.
+    """
+    torch.set_num_threads(1)
+    _agent = agent(seed)
+    network = DeepQ(network=dict(NETWORK), optimizer=OPTIMIZER)
+    network.load_state_dict(_agent.state_dict())
+
+    environment = CartPole(environments=environments, seed=seed)
+    state, _ = environment.reset()
+
+    start = time.time()
+    for _ in range(steps):
+        action = _agent.action(torch.from_numpy(state)).numpy()
+        new_state, reward, terminated, truncated, info = environment.step(action)
+        _agent.experience(state, action, info["final_observation"], reward, terminated | truncated)
+        state = new_state
+
+        if _agent.memory["size"] >= _agent.batch_size:
+            _agent.learn(network=network)
+
+    return start, time.time()
+
+
+def ensemble(agents, environments, steps):
+    """
+    Train K agents as one ensemble.
+
+    Returns
+    -------
+    seconds : float
+    """
+    _ensemble = Ensemble([agent(seed) for seed in range(agents)])
+
+    # One vectorized environment for all agents; each agent plays its own slice of games.
+    environment = CartPole(environments=agents * environments, seed=0)
+    state, _ = environment.reset()
+    state = state.reshape(agents, environments, -1)
+
+    start = time.perf_counter()
+    for _ in range(steps):
+        action = _ensemble.action(torch.from_numpy(state)).numpy()
+        new_state, reward, terminated, truncated, info = environment.step(action.reshape(-1))
+        new_state, reward, done, final = (
+            value.reshape(agents, environments, *value.shape[1:])
+            for value in (new_state, reward, terminated | truncated, info["final_observation"])
+        )
+        _ensemble.experience(state, action, final, reward, done)
+        state = new_state
+
+        if min(member.memory["size"] for member in _ensemble.agents) >= 64:
+            _ensemble.learn()
+
+    return time.perf_counter() - start
+
+
+def main():
+    """Benchmark the ensemble and separate processes for increasing numbers of agents."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--agents", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--environments", type=int, default=8)
+    parser.add_argument("--steps", type=int, default=200)
+    arguments = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s)")
+    print(f"{'agents':>8}{'processes (steps/s)':>24}{'ensemble (steps/s)':>24}")
+
+    context = multiprocessing.get_context("spawn")
+    for agents in arguments.agents:
+        total = agents * arguments.environments * arguments.steps
+
+        # The start-up of the processes (e.g. importing PyTorch) is excluded.
+        with context.Pool(min(agents, os.cpu_count())) as pool:
+            start, end = zip(*pool.starmap(single, [(seed, arguments.environments, arguments.steps)
+                                                    for seed in range(agents)]))
+        processes = max(end) - min(start)
+
+        seconds = ensemble(agents, arguments.environments, arguments.steps)
+
+        print(f"{agents:>8}{total / processes:>24.0f}{total / seconds:>24.0f}")
+
+
+if __name__ == "__main__":
+    main()
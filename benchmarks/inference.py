@@ -0,0 +1,115 @@
+"""
+Actions per second and request latency of actor processes selecting their actions through an
+inference server (`help.training.inference`), versus each with its own copy of the agent.
+
+Each actor plays breakout (`VisionDeepQ.observe`) on the stand-in environment of
+`benchmarks.atari`, greedily. Meanwhile, the learner publishes its weights to the server every
+`--publish` seconds.
+
+Usage: `python -m benchmarks.inference [--actors 1 4 16] [--seconds 10] [--latency 0.002]`
+"""
+
+import os
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+import torch
+
+from benchmarks.suite import CONFIGURATIONS, vision
+from help.training.inference import InferenceServer
+
+
+def actor(index, synchronization, client, output, length):
+    """Play, selecting the actions locally or through the client; the actions and latencies."""
+    torch.set_num_threads(1)
+    agent, environment, states = vision("breakout", length=length)
+    barrier, stop = synchronization
+
+    latencies = []
+    barrier.wait()
+    game = actions = 0
+    while not stop.is_set():
+        if client is None:
+            start = time.perf_counter()
+            action = agent.action(states)
+            latencies.append(time.perf_counter() - start)
+        else:
+            action = client.action(states)
+        _, states, _, done = agent.observe(environment, states, 4, action=action)
+        actions += 1
+
+        if done:
+            game += 1
+            initial = agent.preprocess(environment.reset(seed=1000 * index + game)[0])
+            states = torch.cat([initial] * agent.shape["reshape"][1], dim=1)
+
+    if client is not None:
+        latencies = list(client.latencies)
+        client.close()
+    output.put((actions, latencies))
+
+
+def run(actors, seconds, length, latency=None, publish=1.0):
+    """Actions per second, latency percentiles (ms) and mean batch size, with `actors`."""
+    agent, _, _ = vision("breakout", length=length)
+
+    context = multiprocessing.get_context("spawn")
+    barrier, stop, output = context.Barrier(actors + 1), context.Event(), context.Queue()
+    server = (InferenceServer(agent, CONFIGURATIONS["breakout"], actors=actors, latency=latency)
+              if latency is not None else None)
+
+    processes = [context.Process(target=actor, args=(
+        i, (barrier, stop), server.clients[i] if server else None, output, length
+    )) for i in range(actors)]
+    for process in processes:
+        process.start()
+
+    barrier.wait()
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        time.sleep(min(publish, seconds - (time.perf_counter() - start)))
+        if server is not None:
+            server.publish(agent)
+    stop.set()
+    elapsed = time.perf_counter() - start
+
+    results = [output.get() for _ in processes]
+    actions = sum(result[0] for result in results)
+    latencies = np.concatenate([result[1] for result in results])
+    for process in processes:
+        process.join()
+
+    batch = 1.0
+    if server is not None:
+        statistics = server.close()
+        batch = statistics["requests"] / max(statistics["batches"], 1)
+    return (actions / elapsed, *(np.percentile(latencies, [50, 90, 99]) * 1000), batch)
+
+
+def main():
+    """Measure the throughput and latency for each number of actors."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--actors", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--length", type=int, default=64, help="Frames per game.")
+    parser.add_argument("--latency", type=float, default=0.002,
+                        help="Seconds the server waits for more requests.")
+    parser.add_argument("--publish", type=float, default=1.0,
+                        help="Seconds between publishing the weights.")
+    arguments = parser.parse_args()
+
+    torch.set_num_threads(1)
+    print(f"{os.cpu_count()} cores")
+    print(f"{'actors':>6}{'mode':>8}{'actions/s':>12}{'p50 (ms)':>10}{'p90 (ms)':>10}"
+          f"{'p99 (ms)':>10}{'batch':>8}")
+    for actors in arguments.actors:
+        for mode, latency in (("local", None), ("server", arguments.latency)):
+            result = run(actors, arguments.seconds, arguments.length, latency, arguments.publish)
+            print(f"{actors:>6}{mode:>8}{result[0]:>12.1f}{result[1]:>10.2f}{result[2]:>10.2f}"
+                  f"{result[3]:>10.2f}{result[4]:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Games per second and peak memory of the cart-pole `PolicyGradient` agent; default versus batched.
+
+Every configuration runs in its own process, so that the peak memory (RSS) is measured in
+isolation. With `--length`, termination is disabled and every game lasts exactly that many steps,
+which shows how memory grows with the length of the games.
+
+Usage: `python -m benchmarks.reinforce [--games 200] [--length 0]`
+"""
+
+import time
+import argparse
+import resource
+import multiprocessing
+
+import numpy as np
+import torch
+import gymnasium as gym
+
+from benchmarks import load
+
+NETWORK = {"inputs": 4, "outputs": 2, "nodes": [30, 15]}
+OPTIMIZER = {"optimizer": torch.optim.RMSprop, "lr": 0.00025}
+
+
+def default(games, length):
+    """Play and learn from `games` games one at a time; the current implementation."""
+    agent = load("cart-pole/REINFORCE.py").PolicyGradient(network=dict(NETWORK),
+                                                          optimizer=OPTIMIZER)
+
+    environment = gym.make("CartPole-v1", max_episode_steps=length or 500)
+    if length:
+        environment.unwrapped.theta_threshold_radians = environment.unwrapped.x_threshold = np.inf
+    environment.reset(seed=0)
+
+    for _ in range(games):
+        state = torch.tensor(environment.reset()[0], dtype=torch.float32).view(-1)
+        terminated = truncated = False
+        while not (terminated or truncated):
+            action, logarithm = agent.action(state)
+            state, reward, terminated, truncated, _ = environment.step(action)
+            state = torch.tensor(state, dtype=torch.float32).view(-1)
+            agent.memorize(logarithm, reward)
+        agent.learn()
+
+
+def batched(games, length, environments):
+    """Play `games` games in a vectorized environment, learning from every `environments` games."""
+    agent = load("cart-pole/REINFORCE.py").PolicyGradient(network=dict(NETWORK),
+                                                          optimizer=OPTIMIZER, batched=True)
+
+    environment = load("cart-pole/vectorized.py").CartPole(environments=environments,
+                                                           max_steps=length or 500, seed=0)
+    if length:
+        environment.theta_threshold = environment.x_threshold = np.inf
+    states, _ = environment.reset()
+
+    played = 0
+    while played < games:
+        states, steps = agent.rollout(environment, states, games=environments)
+        agent.learn()
+        played += len(steps)
+
+
+def measure(configuration):
+    """
+    Run a configuration and measure its throughput and peak memory.
+
+    Parameters
+    ----------
+    configuration : tuple
+        Function and its arguments.
+
+    Returns
+    -------
+    seconds : float
+    memory : float
+        Growth of the peak resident memory during the run, in megabytes.
+    """
+    function, games, *arguments = configuration
+
+    # Excludes the one-off memory of initialising PyTorch (threads, kernels, etc.).
+    function(1, *arguments)
+
+    torch.manual_seed(0)
+    np.random.seed(0)
+
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    function(games, *arguments)
+    seconds = time.perf_counter() - start
+
+    return seconds, (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024
+
+
+def main():
+    """Benchmark the default and batched modes."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--length", type=int, default=0,
+                        help="Fixed length of every game (0: regular cart-pole games).")
+    arguments = parser.parse_args()
+
+    configurations = {"default": (default, arguments.games, arguments.length)}
+    for environments in (1, 16, 64):
+        configurations[f"batched x{environments}"] = (batched, arguments.games,
+                                                      arguments.length, environments)
+
+    print(f"{'mode':<14}{'games/s':>10}{'peak memory (MB)':>20}")
+    context = multiprocessing.get_context("spawn")
+    for name, configuration in configurations.items():
+        with context.Pool(1) as pool:
+            seconds, memory = pool.apply(measure, (configuration,))
+        print(f"{name:<14}{arguments.games / seconds:>10.1f}{memory:>20.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Throughput of actor processes writing to a shared-memory replay (`help.training.shared`), versus
+sending the transitions to the learner through a `multiprocessing.Queue`.
+
+Each actor plays breakout (`VisionDeepQ.observe`) on the stand-in environment of
+`benchmarks.atari`. Meanwhile, the learner samples minibatches of games from the replay and
+learns from them (`VisionDeepQ.learn`), or drains the queue into its replay memory.
+
+Usage: `python -m benchmarks.shared [--actors 1 4 16] [--seconds 10] [--length 64]`
+"""
+
+import os
+import copy
+import time
+import argparse
+import multiprocessing
+from collections import deque
+
+import torch
+
+from benchmarks.suite import vision
+from help.training.shared import SharedReplay
+
+
+def actor(index, barrier, stop, output, length):
+    """Play and write the transitions to the shared replay (`output` is its spec) or a queue."""
+    torch.set_num_threads(1)
+    agent, environment, states = vision("breakout", length=length)
+    agent.parameter["rate"] = 0.5
+
+    replay = SharedReplay(**output) if isinstance(output, dict) else None
+    barrier.wait()
+    game = 0
+    while not stop.is_set():
+        action, new_states, rewards, done = agent.observe(environment, states, 4)
+        if replay is not None:
+            replay.write(index, states, action, rewards, done)
+        else:
+            output.put((states, action, torch.tensor(rewards), done))
+        states = new_states
+
+        if done:
+            game += 1
+            initial = agent.preprocess(environment.reset(seed=1000 * index + game)[0])
+            states = torch.cat([initial] * agent.shape["reshape"][1], dim=1)
+
+    if replay is not None:
+        replay.close()
+    else:
+        output.cancel_join_thread()
+
+
+def learner(agent, output, seconds):
+    """Learn from the shared replay, or drain the queue; the minibatches and transitions."""
+    network = copy.deepcopy(agent)
+    minibatches = transitions = 0
+    memory = deque(maxlen=2 ** 15)
+
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        if isinstance(output, SharedReplay):
+            agent.memory["memory"] = output.games(agent.Memory)
+            if len(agent.memory["memory"]) >= agent.memory["batch_size"]:
+                agent.learn(network=network)
+                minibatches += 1
+            else:
+                time.sleep(0.01)
+        else:
+            while not output.empty() and time.perf_counter() - start < seconds:
+                memory.append(output.get())
+                transitions += 1
+            time.sleep(0.001)
+
+    if isinstance(output, SharedReplay):
+        transitions = sum(output.written())
+    return minibatches, transitions
+
+
+def run(actors, seconds, length, shared=True):
+    """Transitions written and minibatches learned per second, with `actors` processes."""
+    agent, _, _ = vision("breakout", length=length)
+    agent.memory["batch_size"] = 8
+
+    context = multiprocessing.get_context("spawn")
+    barrier, stop = context.Barrier(actors + 1), context.Event()
+    replay = (SharedReplay(agent.shape["reshape"], capacity=2 ** 11 * actors, actors=actors)
+              if shared else None)
+    output = replay.spec if shared else context.Queue()
+
+    processes = [context.Process(target=actor, args=(i, barrier, stop, output, length))
+                 for i in range(actors)]
+    for process in processes:
+        process.start()
+
+    barrier.wait()
+    minibatches, transitions = learner(agent, replay if shared else output, seconds)
+    stop.set()
+    for process in processes:
+        process.join()
+
+    if shared:
+        replay.close()
+        replay.unlink()
+    return transitions / seconds, minibatches / seconds
+
+
+def main():
+    """Measure the throughput for each number of actors."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--actors", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--length", type=int, default=64, help="Frames per game.")
+    arguments = parser.parse_args()
+
+    torch.set_num_threads(1)
+    print(f"{os.cpu_count()} cores")
+    print(f"{'actors':>6}{'shared (transitions/s)':>24}{'minibatches/s':>15}"
+          f"{'queue (transitions/s)':>23}")
+    for actors in arguments.actors:
+        shared, minibatches = run(actors, arguments.seconds, arguments.length)
+        queued, _ = run(actors, arguments.seconds, arguments.length, shared=False)
+        print(f"{actors:>6}{shared:>24.1f}{minibatches:>15.1f}{queued:>23.1f}")
+
+
+if __name__ == "__main__":
+    main()
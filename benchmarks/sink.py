@@ -0,0 +1,93 @@
+"""
+Overhead per game of writing the training metrics; per-row appends versus the buffered `Sink`.
+
+The per-row append is what the training scripts did before: open the file, write one row and close
+it, once per game.
+
+Usage: `python -m benchmarks.sink [--games 30000] [--directory /tmp]`
+"""
+
+import os
+import csv
+import time
+import argparse
+import tempfile
+
+from help.training.sink import Sink
+
+COLUMNS = ["game", "steps", "loss", "exploration", "reward"]
+
+
+def rows(games):
+    """Synthetic metrics, as written by the training scripts."""
+    return [[game, 200 + game % 50, None if game % 5 else 0.5 / game, max(1 - game / games, 0.1),
+             game % 7] for game in range(1, games + 1)]
+
+
+def append(path, metrics):
+    """
+    Open, append one row and close the file for every game.
+
+    Returns
+    -------
+    seconds : float
+        Time spent by the training loop.
+    """
+    with open(path, "w", newline="", encoding="UTF-8") as file:
+        csv.writer(file).writerow(COLUMNS)
+
+    start = time.perf_counter()
+    for row in metrics:
+        with open(path, "a", newline="", encoding="UTF-8") as file:
+            metric = csv.writer(file)
+            metric.writerow(row)
+    return time.perf_counter() - start
+
+
+def sink(path, metrics):
+    """
+    Buffer the rows in a `Sink`.
+
+    Returns
+    -------
+    seconds : float
+        Time spent by the training loop.
+    total : float
+        Including the final write on `close`.
+    """
+    writer = Sink(path, COLUMNS)
+
+    start = time.perf_counter()
+    for row in metrics:
+        writer.write(row)
+    seconds = time.perf_counter() - start
+
+    writer.close()
+    return seconds, time.perf_counter() - start
+
+
+def main():
+    """Measure the overhead per game of each writer."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=30000)
+    parser.add_argument("--directory", default=None,
+                        help="Where to write; e.g. a shared filesystem. Defaults to a temporary "
+                             "directory.")
+    arguments = parser.parse_args()
+
+    metrics = rows(arguments.games)
+    with tempfile.TemporaryDirectory(dir=arguments.directory) as directory:
+        print(f"{'writer':<16}{'loop (us/game)':>16}{'total (us/game)':>18}")
+
+        seconds = append(os.path.join(directory, "append.csv"), metrics)
+        print(f"{'append (csv)':<16}{seconds / arguments.games * 1e6:>16.2f}"
+              f"{seconds / arguments.games * 1e6:>18.2f}")
+
+        for name, path in [("Sink (csv)", "sink.csv"), ("Sink (binary)", "sink")]:
+            seconds, total = sink(os.path.join(directory, path), metrics)
+            print(f"{name:<16}{seconds / arguments.games * 1e6:>16.2f}"
+                  f"{total / arguments.games * 1e6:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Soak test; thousands of short games of the breakout training loop, failing if memory keeps rising.
+
+The agent plays the deterministic stand-in environment of `benchmarks.atari`, with a small replay
+memory so that it is full early on. From then on, the resident memory and the number of live
+tensors should be flat; the test fails (exit status 1) if either grows steadily over the latter
+half of the samples.
+
+Usage: `python -m benchmarks.soak [--games 3000] [--every 100] [--tolerance 32]`
+"""
+
+import sys
+import copy
+import logging
+import argparse
+
+import torch
+
+from benchmarks.suite import vision
+from help.training.memory import Telemetry
+
+
+def soak(games, every, **other):
+    """
+    Play and learn from short games, sampling the memory every `every` games.
+
+    Parameters
+    ----------
+    games : int
+    every : int
+    other
+        Additional parameters.
+
+        length : int, optional
+            Number of frames per game.
+        memory : int, optional
+            Number of games in the replay memory.
+        batch_size : int, optional
+        logger : logging.Logger, optional
+
+    Returns
+    -------
+    Telemetry
+    """
+    agent, environment, _ = vision("breakout", length=other.get("length", 16))
+    agent.memory["memory"] = type(agent.memory["memory"])(maxlen=other.get("memory", 50))
+    agent.memory["batch_size"] = other.get("batch_size", 8)
+    agent.parameter["rate"] = agent.parameter["min"] = 0.1
+    network = copy.deepcopy(agent)
+
+    telemetry = Telemetry(other.get("logger"))
+    for game in range(1, games + 1):
+        initial = agent.preprocess(environment.reset(seed=game)[0])
+        states = torch.cat([initial] * agent.shape["reshape"][1], dim=1)
+
+        done = False
+        steps = 0
+        while not done:
+            action, new_states, rewards, done = agent.observe(environment, states, 4)
+            agent.remember(states, action, torch.tensor(rewards))
+            states = new_states
+            steps += 1
+        agent.memorize(states, steps)
+        agent.memory["game"].clear()
+
+        agent.learn(network=network, clamp=(-10, 10))
+        if game % 5 == 0:
+            network.load_state_dict(agent.state_dict())
+
+        if game % every == 0:
+            telemetry.report(agent.memory["memory"])
+
+    return telemetry
+
+
+def main():
+    """Run the soak test, and exit with status 1 if memory keeps rising."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--games", type=int, default=3000)
+    parser.add_argument("--every", type=int, default=100, help="Games between samples.")
+    parser.add_argument("--tolerance", type=float, default=32,
+                        help="Allowed growth of the resident memory (MB) over the latter half.")
+    parser.add_argument("--tensors", type=int, default=100,
+                        help="Allowed growth of the number of live tensors over the latter half.")
+    arguments = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logger = logging.getLogger(__name__)
+
+    telemetry = soak(arguments.games, arguments.every, logger=logger)
+
+    rss = telemetry.growth("rss") / 2 ** 20
+    live = telemetry.growth("tensors")
+    logger.info("Growth over the latter half: RSS %.1f MB, %d live tensors", rss, live)
+
+    if rss > arguments.tolerance or live > arguments.tensors:
+        logger.error("Memory keeps rising (tolerance %.1f MB, %d tensors)",
+                     arguments.tolerance, arguments.tensors)
+        sys.exit(1)
+    logger.info("Memory is steady")
+
+
+if __name__ == "__main__":
+    main()
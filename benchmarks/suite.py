@@ -0,0 +1,356 @@
+"""
+Micro-benchmarks of the agents, with a JSON baseline and regression check.
+
+The vision agents (`VisionDeepQ` of breakout, enduro and tetris) are configured as in their
+`config.json`, and play the deterministic stand-in environment of `benchmarks.atari`.
+
+Usage:
+
+    python -m benchmarks.suite run --output baseline.json
+    python -m benchmarks.suite run --output current.json [--filter breakout]
+    python -m benchmarks.suite compare baseline.json current.json [--threshold 0.1]
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import time
+import argparse
+import functools
+import platform
+import statistics
+
+import numpy as np
+import torch
+import gymnasium as gym
+
+from benchmarks import ROOT, load
+from benchmarks.atari import Atari
+from benchmarks.deepq import play
+from help.training import train
+
+GAMES = ("breakout", "enduro", "tetris")
+
+TabularQAgent = load("frozen-lake/Q.py").TabularQAgent
+DeepQ = load("cart-pole/DQN.py").DeepQ
+PolicyGradient = load("cart-pole/REINFORCE.py").PolicyGradient
+CartPole = load("cart-pole/vectorized.py").CartPole
+
+
+def configuration(game):
+    """
+    The settings of `<game>/config.json` (see `help.training.train.configuration`).
+
+    Parameters
+    ----------
+    game : str
+
+    Returns
+    -------
+    dict
+    """
+    return train.configuration(os.path.join(ROOT, game, "config.json"))
+
+
+CONFIGURATIONS = {game: configuration(game) for game in GAMES}
+
+
+def vision(game, **other):
+    """
+    A `VisionDeepQ` agent and stand-in environment, configured as in `<game>/config.json`.
+
+    Returns
+    -------
+    agent : VisionDeepQ
+    environment : benchmarks.atari.Atari
+    states : torch.Tensor
+        Initial (stacked) states.
+    """
+    config = CONFIGURATIONS[game]
+    torch.manual_seed(0)
+    agent = train.agent(config, exploration_rate=0.0, exploration_min=0.0)
+    agent.parameter["rate"] = 0.0
+
+    environment = Atari(actions=config["network"]["outputs"], **other)
+    # Tetris' preprocessing drops the batch and channel dimensions; restored as in training.
+    initial = agent.preprocess(environment.reset(seed=0)[0])
+    states = torch.cat([initial.view(1, 1, *agent.shape["reshape"][2:])]
+                       * agent.shape["reshape"][1], dim=1)
+
+    return agent, environment, states
+
+
+def benchmarks(steps=32):
+    """
+    The benchmarks; a name and a function returning a `(prepare, call)` pair for each.
+
+    `prepare` (untimed, may be `None`) is called before every timed call of `call`.
+
+    Parameters
+    ----------
+    steps : int, optional
+        Number of observations per memorized game of the vision agents.
+
+    Returns
+    -------
+    dict
+    """
+    suite = {}
+    for game in GAMES:
+        for name, benchmark in [("preprocess", _preprocess), ("action", _action),
+                                ("observe", _observe), ("remember-memorize", _memorize),
+                                ("learn", _learn)]:
+            suite[f"{game}.{name}"] = functools.partial(benchmark, game, steps)
+
+    suite.update({
+        "frozen-lake.tabular.learn": _tabular,
+        "cart-pole.deepq.learn": functools.partial(_deepq, fast=False),
+        "cart-pole.deepq.learn-fast": functools.partial(_deepq, fast=True),
+        "cart-pole.reinforce.learn": _reinforce,
+        "cart-pole.reinforce.learn-batched": _batched,
+    })
+
+    return suite
+
+
+def _preprocess(game, _):
+    """`VisionDeepQ.preprocess` of a frame."""
+    agent, environment, _ = vision(game)
+    frame = environment.reset(seed=0)[0]
+    return None, lambda: agent.preprocess(frame)
+
+
+def _action(game, _):
+    """`VisionDeepQ.action` (greedy) of stacked states."""
+    agent, _, states = vision(game)
+    return None, lambda: agent.action(states)
+
+
+def _observe(game, _):
+    """`VisionDeepQ.observe`; an action followed by `SKIP` frames."""
+    agent, environment, states = vision(game, length=10 ** 9)
+    skip = CONFIGURATIONS[game]["skip"]
+    return None, lambda: agent.observe(environment, states, skip)
+
+
+def _played(game, agent, environment, states, steps):
+    """Observe `steps` times; the transitions to remember and the final states."""
+    transitions = []
+    for _ in range(steps):
+        action, new_states, rewards, _ = agent.observe(environment, states,
+                                                       CONFIGURATIONS[game]["skip"])
+        transitions.append((states, action, torch.tensor(rewards)))
+        states = new_states
+    return transitions, states
+
+
+def _memorize(game, steps):
+    """`VisionDeepQ.remember` for each observation of a game, followed by `memorize`."""
+    agent, environment, states = vision(game, length=10 ** 9)
+    transitions, states = _played(game, agent, environment, states, steps)
+
+    def call():
+        for transition in transitions:
+            agent.remember(*transition)
+        agent.memorize(states, steps)
+        agent.memory["game"].clear()
+    return None, call
+
+
+def _learn(game, steps):
+    """`VisionDeepQ.learn` from `minibatch` memorized games, as configured in `config.json`."""
+    agent, environment, states = vision(game, length=10 ** 9)
+    for _ in range(agent.memory["batch_size"]):
+        transitions, states = _played(game, agent, environment, states, steps)
+        for transition in transitions:
+            agent.remember(*transition)
+        agent.memorize(states, steps)
+        agent.memory["game"].clear()
+
+    network = copy.deepcopy(agent)
+    gradients = tuple(CONFIGURATIONS[game]["gradients"])
+    return None, lambda: agent.learn(network=network, clamp=gradients)
+
+
+def _tabular():
+    """`TabularQAgent.learn` on frozen-lake sized tables."""
+    agent = TabularQAgent({"states": 16, "actions": 4}, lr=0.1, gamma=0.95,
+                          exploration={"rate": 1.0, "decay": 0.001, "min": 0.01})
+    transitions = np.random.default_rng(0).integers(0, [16, 4, 2, 16], size=(100, 4))
+
+    def call():
+        for old_state, action, reward, new_state in transitions:
+            agent.learn(old_state, action, reward, new_state)
+    return None, call
+
+
+def _deepq(fast):
+    """`DeepQ.learn` after 200 random games of cart-pole."""
+    torch.manual_seed(0)
+    agent = DeepQ(network={"inputs": 4, "outputs": 2, "nodes": [15, 30]},
+                  optimizer={"optimizer": torch.optim.RMSprop, "lr": 0.0025},
+                  batch_size=64, memory=10 ** 5 if fast else 200, exploration_rate=1.0,
+                  fast=fast)
+    network = copy.deepcopy(agent)
+
+    environment = gym.make("CartPole-v1")
+    environment.reset(seed=0)
+    play(environment, agent, games=200)
+
+    return None, lambda: agent.learn(network=network)
+
+
+def _reinforce():
+    """`PolicyGradient.learn` after a game of 200 steps."""
+    torch.manual_seed(0)
+    agent = PolicyGradient(network={"inputs": 4, "outputs": 2, "nodes": [30, 15]},
+                           optimizer={"optimizer": torch.optim.RMSprop, "lr": 0.00025})
+    states = torch.from_numpy(np.random.default_rng(0).normal(size=(200, 4)).astype(np.float32))
+
+    def prepare():
+        for state in states:
+            _, logarithm = agent.action(state)
+            agent.memorize(logarithm, 1.0)
+    return prepare, agent.learn
+
+
+def _batched():
+    """`PolicyGradient.learn` (batched) after a rollout of 16 games."""
+    torch.manual_seed(0)
+    agent = PolicyGradient(network={"inputs": 4, "outputs": 2, "nodes": [30, 15]},
+                           optimizer={"optimizer": torch.optim.RMSprop, "lr": 0.00025},
+                           batched=True)
+    environment = CartPole(environments=16, seed=0)
+    state = {"states": environment.reset()[0]}
+
+    def prepare():
+        state["states"], _ = agent.rollout(environment, state["states"], games=16)
+    return prepare, agent.learn
+
+
+def measure(prepare, call, rounds=5, duration=0.2):
+    """
+    Seconds per call of `call`; the median over `rounds` rounds of at least `duration` seconds.
+
+    Parameters
+    ----------
+    prepare : callable or None
+    call : callable
+    rounds : int, optional
+    duration : float, optional
+
+    Returns
+    -------
+    seconds : float
+    rounds : list of float
+    """
+    def _round(calls):
+        seconds = 0.0
+        for _ in range(calls):
+            if prepare is not None:
+                prepare()
+            start = time.perf_counter()
+            call()
+            seconds += time.perf_counter() - start
+        return seconds / calls
+
+    # Warm-up, and the number of calls per round.
+    calls = min(max(1, int(duration / max(_round(1), 1e-9))), 10000)
+    results = [_round(calls) for _ in range(rounds)]
+
+    return statistics.median(results), results
+
+
+def run(arguments):
+    """Run the (selected) benchmarks and write the results as JSON."""
+    torch.set_num_threads(arguments.threads)
+    suite = benchmarks(steps=arguments.steps)
+
+    results = {}
+    for name, benchmark in suite.items():
+        if arguments.filter and not re.search(arguments.filter, name):
+            continue
+        prepare, call = benchmark()
+        seconds, rounds = measure(prepare, call, arguments.rounds, arguments.duration)
+        results[name] = {"seconds": seconds, "rounds": rounds}
+        print(f"{name:<40}{seconds * 1e3:>14.3f} ms", flush=True)
+
+    report = {
+        "meta": {
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "torch": torch.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+            "threads": arguments.threads,
+            "cuda": torch.cuda.is_available(),
+            "steps": arguments.steps,
+        },
+        "results": results,
+    }
+    with open(arguments.output, "w", encoding="UTF-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {arguments.output}")
+
+
+def compare(arguments):
+    """
+    Compare two result files; exits with status 1 if any benchmark is slower than the baseline
+    by more than the threshold.
+    """
+    with open(arguments.baseline, encoding="UTF-8") as file:
+        baseline = json.load(file)["results"]
+    with open(arguments.current, encoding="UTF-8") as file:
+        current = json.load(file)["results"]
+
+    print(f"{'benchmark':<40}{'baseline (ms)':>15}{'current (ms)':>15}{'change':>10}")
+    regressions = []
+    for name in sorted(set(baseline) | set(current)):
+        if name not in baseline or name not in current:
+            print(f"{name:<40}  (only in {'current' if name in current else 'baseline'})")
+            continue
+        before, after = baseline[name]["seconds"], current[name]["seconds"]
+        change = after / before - 1
+        flag = "  REGRESSION" if change > arguments.threshold else ""
+        print(f"{name:<40}{before * 1e3:>15.3f}{after * 1e3:>15.3f}{change:>+10.1%}{flag}")
+        if flag:
+            regressions.append(name)
+
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {arguments.threshold:.0%}")
+        sys.exit(1)
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    _run = commands.add_parser("run", help="Run the benchmarks.")
+    _run.add_argument("--output", default="benchmarks.json")
+    _run.add_argument("--filter", default=None, help="Regular expression of benchmark names.")
+    _run.add_argument("--rounds", type=int, default=5)
+    _run.add_argument("--duration", type=float, default=0.2,
+                      help="Minimum number of seconds per round.")
+    _run.add_argument("--steps", type=int, default=32,
+                      help="Observations per memorized game of the vision agents.")
+    _run.add_argument("--threads", type=int, default=1, help="PyTorch threads.")
+    _run.set_defaults(function=run)
+
+    _compare = commands.add_parser("compare", help="Compare results against a baseline.")
+    _compare.add_argument("baseline")
+    _compare.add_argument("current")
+    _compare.add_argument("--threshold", type=float, default=0.1,
+                          help="Relative slowdown that counts as a regression.")
+    _compare.set_defaults(function=compare)
+
+    arguments = parser.parse_args()
+    arguments.function(arguments)
+
+
+if __name__ == "__main__":
+    main()
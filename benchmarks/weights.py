@@ -0,0 +1,73 @@
+"""
+Checkpoints loaded per second; `torch.load` and `load_state_dict` versus memory-mapped,
+weights-only loading (`help.training.checkpoint.load_weights`).
+
+The networks of breakout and tetris are configured as in their `config.json`. Both the loading alone
+and the loading followed by a forward pass are timed, as memory-mapped tensors are only read from
+the file when first used.
+
+Usage: `python -m benchmarks.weights [--checkpoints 100] [--directory /tmp]`
+"""
+
+import os
+import copy
+import argparse
+import functools
+import tempfile
+
+import torch
+
+from benchmarks import timeit
+from benchmarks.suite import vision
+from help.training.checkpoint import load_weights
+
+
+def default(agent, path):
+    """Read and unpickle the whole file, then copy it into the parameters."""
+    agent.load_state_dict(torch.load(path, map_location=agent.device))
+
+
+def mapped(agent, path):
+    """Memory-mapped, weights-only loading; the tensors are assigned without a copy."""
+    load_weights(agent, path, assign=True)
+
+
+def load(agent, paths, method, states=None):
+    """Load each checkpoint into the agent, followed by a forward pass of `states`."""
+    for path in paths:
+        method(agent, path)
+        if states is not None:
+            with torch.no_grad():
+                agent(states)
+
+
+def main():
+    """Time the loading of the checkpoints of breakout and tetris."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--checkpoints", type=int, default=100)
+    parser.add_argument("--directory", default=None,
+                        help="Where the checkpoints are written; defaults to a temporary one.")
+    arguments = parser.parse_args()
+
+    print(f"{'game':<10}{'method':<10}{'load (1/s)':>14}{'load + forward (1/s)':>24}")
+    with tempfile.TemporaryDirectory(dir=arguments.directory) as directory:
+        for game in ("breakout", "tetris"):
+            agent, _, states = vision(game)
+            paths = []
+            for i in range(arguments.checkpoints):
+                paths.append(os.path.join(directory, f"{game}-weights-{i}.pth"))
+                torch.save(agent.state_dict(), paths[-1])
+            print(f"{game:<10}{os.path.getsize(paths[0]) / 2 ** 20:.1f} MB per checkpoint")
+
+            for name, method in [("default", default), ("mmap", mapped)]:
+                # Assigned (memory-mapped) parameters must not leak into the other method.
+                _agent = copy.deepcopy(agent)
+                load_only = timeit(functools.partial(load, _agent, paths, method),
+                                   repeat=3, warmup=1) / len(paths)
+                load_forward = timeit(functools.partial(load, _agent, paths, method, states),
+                                      repeat=3) / len(paths)
+                print(f"{'':<10}{name:<10}{1 / load_only:>14.1f}{1 / load_forward:>24.1f}")
+
+
+if __name__ == "__main__":
+    main()
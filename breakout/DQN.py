@@ -6,6 +6,7 @@ Useful for environments with `rgb` or `grayscale` state spaces (from `gymnasium`
 
 from collections import deque, namedtuple
 import random
+import contextlib
 
 import numpy as np
 import torch
@@ -74,6 +75,9 @@ class VisionDeepQ(torch.nn.Module):
                 --> 1: consider all future rewards equally
             gamma : float, optional
                 Discount factor for Q-learning.
+            timer : callable, optional
+                Per-phase timer (e.g. `help.training.timing.Timer`); `timer(name)` returns a
+                context manager. The phases of `observe` and `learn` are not timed by default.
             shape : dict, optional
                 The dictionary may contain the following keys:
 
@@ -178,6 +182,7 @@ class VisionDeepQ(torch.nn.Module):
             "gamma": other.get("gamma", 0.95),
 
             "convolutions": len(network["channels"]) - 1,
+            "timer": other.get("timer", _untimed),
 
             "optimizer": optimizer["optimizer"](self.parameters(), lr=optimizer["lr"],
                                                 **optimizer.get("hyperparameters", {}))
@@ -261,7 +266,7 @@ class VisionDeepQ(torch.nn.Module):
 
         return state
 
-    def observe(self, environment, states, skip=1):
+    def observe(self, environment, states, skip=1, action=None):
         """
         Observe the environment for n frames.
 
@@ -273,6 +278,9 @@ class VisionDeepQ(torch.nn.Module):
             The states of the environment from the previous step.
         skip : int, optional
             Number of frames to skip between each saved frame.
+        action : torch.Tensor, optional
+            The action to take (e.g. selected for a batch of environments); selected by
+            `action` if not given.
 
         Returns
         -------
@@ -285,7 +293,11 @@ class VisionDeepQ(torch.nn.Module):
         done : bool
             Whether the game is terminated.
         """
-        action = self.action(states)
+        timer = self.parameter["timer"]
+
+        if action is None:
+            with timer("action"):
+                action = self.action(states)
 
         done = False
         rewards = 0.0
@@ -296,11 +308,13 @@ class VisionDeepQ(torch.nn.Module):
             new_states = torch.zeros((1, skip, *self.shape["reshape"][2:4]))
 
             for j in range(skip):
-                new_state, reward, terminated, truncated, _ = environment.step(action.item())
+                with timer("step"):
+                    new_state, reward, terminated, truncated, _ = environment.step(action.item())
                 done = (terminated or truncated) if not done else done
                 rewards += reward
 
-                new_states[0, j] = self.preprocess(new_state)
+                with timer("preprocess"):
+                    new_states[0, j] = self.preprocess(new_state)
 
             states[0, i] = torch.max(new_states, dim=1, keepdim=True).values
 
@@ -328,33 +342,37 @@ class VisionDeepQ(torch.nn.Module):
         expected future rewards. Then, the agent can adjust its predicted action values so that
         this expected reward is maximized.
         """
-        memory = random.sample(self.memory["memory"],
-                               min(self.memory["batch_size"], len(self.memory["memory"])))
+        timer = self.parameter["timer"]
 
-        _steps = [game.steps for game in memory]
-        steps = [sum(_steps[:i + 1]) - 1 for i in range(len(_steps))]
+        with timer("batch"):
+            memory = random.sample(self.memory["memory"],
+                                   min(self.memory["batch_size"], len(self.memory["memory"])))
 
-        states = torch.cat([torch.stack(game.state).squeeze(1) for game in memory])
-        actions = torch.cat([torch.stack(game.action) for game in memory])
-        _states = torch.cat([game.new_state for game in memory])
-        rewards = torch.cat([torch.stack(game.reward).detach() for game in memory])
+            _steps = [game.steps for game in memory]
+            steps = [sum(_steps[:i + 1]) - 1 for i in range(len(_steps))]
 
-        del memory, _steps
+            states = torch.cat([torch.stack(game.state).squeeze(1) for game in memory])
+            actions = torch.cat([torch.stack(game.action) for game in memory])
+            _states = torch.cat([game.new_state for game in memory])
+            rewards = torch.cat([torch.stack(game.reward).detach() for game in memory])
 
-        # EXPECTED FUTURE REWARDS
-        # ------------------------------------------------------------------------------------------
-        # The expected reward given an action is the sum of all future (discounted) rewards. This is
-        # achieved by reversely adding the observed reward and the discounted cumulative future
-        # rewards. The rewards are then standardized.
+            del memory, _steps
+
+            # EXPECTED FUTURE REWARDS
+            # --------------------------------------------------------------------------------------
+            # The expected reward given an action is the sum of all future (discounted) rewards.
+            # This is achieved by reversely adding the observed reward and the discounted
+            # cumulative future rewards. The rewards are then standardized.
 
-        _reward = 0
-        for i in reversed(range(len(rewards))):
-            _reward = self.parameter["punishment"] if i in steps else _reward
-            _reward = (_reward * self.parameter["discount"]
-                       + rewards[i] * self.parameter["incentive"])
-            rewards[i] = _reward
+            _reward = 0
+            for i in reversed(range(len(rewards))):
+                _reward = self.parameter["punishment"] if i in steps else _reward
+                _reward = (_reward * self.parameter["discount"]
+                           + rewards[i] * self.parameter["incentive"])
+                rewards[i] = _reward
 
-        rewards = ((rewards - rewards.mean()) / (rewards.std() + 1e-9)).view(-1, 1).to(self.device)
+            rewards = ((rewards - rewards.mean()) / (rewards.std() + 1e-9)).view(-1, 1)
+            rewards = rewards.to(self.device)
 
         # Q-LEARNING
         # ------------------------------------------------------------------------------------------
@@ -375,7 +393,7 @@ class VisionDeepQ(torch.nn.Module):
         # where Q' is a copy of the agent, which is updated every C steps. In addition,
         # `torch.cuda.amp.autocast()` is used to reduce memory usage and thus speed up training.
 
-        with torch.cuda.amp.autocast():
+        with timer("forward"), torch.cuda.amp.autocast():
             actual = self(states).gather(1, actions)
 
             with torch.no_grad():
@@ -394,17 +412,19 @@ class VisionDeepQ(torch.nn.Module):
 
             loss = torch.nn.functional.mse_loss(actual, optimal)
 
-        self.parameter["optimizer"].zero_grad()
-        loss.backward()
+        with timer("backward"):
+            self.parameter["optimizer"].zero_grad()
+            loss.backward()
 
-        # Clamping gradient (Google DeepMind uses a range of [-1, 1]).
-        if (isinstance(clamp, tuple)
-                and len(clamp) == 2
-                and all(isinstance(i, (int, float)) for i in clamp)):
-            for param in self.parameters():
-                param.grad.data.clamp_(clamp[0], clamp[1])
+            # Clamping gradient (Google DeepMind uses a range of [-1, 1]).
+            if (isinstance(clamp, tuple)
+                    and len(clamp) == 2
+                    and all(isinstance(i, (int, float)) for i in clamp)):
+                for param in self.parameters():
+                    param.grad.data.clamp_(clamp[0], clamp[1])
 
-        self.parameter["optimizer"].step()
+        with timer("optimizer"):
+            self.parameter["optimizer"].step()
 
         # EXPLORATION RATE DECAY
         # ------------------------------------------------------------------------------------------
@@ -441,3 +461,11 @@ class VisionDeepQ(torch.nn.Module):
             Number of steps in the game (i.e., game length).
         """
         self.memory["memory"].append(self.Memory(*zip(*self.memory["game"]), new_state, steps))
+
+
+_UNTIMED = contextlib.nullcontext()
+
+
+def _untimed(_):
+    """Default (disabled) timer of `VisionDeepQ`."""
+    return _UNTIMED
@@ -0,0 +1,211 @@
+"""Advantage actor-critic agent for reinforcement learning."""
+
+import numpy as np
+import torch
+
+from REINFORCE import PolicyGradient
+
+
+class ActorCritic(PolicyGradient):
+    """Advantage actor-critic agent for reinforcement learning."""
+    def __init__(self,
+                 network,
+                 optimizer,
+                 **other):
+        """
+        Advantage actor-critic agent for reinforcement learning.
+
+        Parameters
+        ----------
+        network : dict
+            Contains the architecture for the model (see `PolicyGradient`). The policy and the
+            value of a state share all hidden layers.
+        optimizer : dict
+            Contains the optimizer for the model and its hyperparameters (see `PolicyGradient`).
+        other
+            Additional parameters.
+
+            discount : float, optional
+                Discount factor for future rewards.
+                --> 0: only consider immediate rewards
+                --> 1: consider all future rewards equally
+            segment : int, optional
+                Number of steps (n) observed in each game before learning.
+            value : float, optional
+                Weight of the value loss.
+            entropy : float, optional
+                Weight of the entropy bonus (encourages exploration).
+        """
+        super().__init__(network, optimizer, **other)
+
+        # ARCHITECTURE
+        # ------------------------------------------------------------------------------------------
+        # The value head is added after the policy layers. The optimizer is therefore recreated.
+
+        self.critic = torch.nn.Linear(network["nodes"][-1], 1, dtype=torch.float32)
+
+        self.optimizer = optimizer["optimizer"](self.parameters(), lr=optimizer["lr"],
+                                                **optimizer.get("hyperparameters", {}))
+
+        self.parameter = {
+            "segment": other.get("segment", 5),
+            "value": other.get("value", 0.5),
+            "entropy": other.get("entropy", 0.01),
+        }
+        self.memory = {key: [] for key in ["state", "action", "reward", "terminated",
+                                           "truncated", "final"]}
+
+        self.to(self.device)
+
+    def evaluate(self, state):
+        """
+        Forward pass of both the policy and the value of the state(s).
+
+        Parameters
+        ----------
+        state : torch.Tensor
+            Observed state(s).
+
+        Returns
+        -------
+        output : torch.Tensor
+            Nonmodified policy output.
+        value : torch.Tensor
+            Value of each state.
+        """
+        _output = state.to(self.device)
+        for i in range(len(self._modules) - 2):
+            _output = torch.relu(getattr(self, f"layer_{i}")(_output))
+
+        output = getattr(self, f"layer_{len(self._modules) - 2}")(_output)
+
+        return output, self.critic(_output).view(-1)
+
+    def forward(self, state):
+        """
+        Forward pass with nonmodified (policy) output.
+
+        Parameters
+        ----------
+        state : torch.Tensor
+            Observed state.
+
+        Returns
+        -------
+        output : torch.Tensor
+        """
+        return self.evaluate(state)[0]
+
+    def observe(self, environment, states):
+        """
+        Play a segment of `segment` steps in a vectorized environment (without gradients).
+
+        Parameters
+        ----------
+        environment : vectorized.CartPole
+            Vectorized environment with automatic reset.
+        states : numpy.ndarray
+            Observed states, of shape (environments, inputs).
+
+        Returns
+        -------
+        states : numpy.ndarray
+            Observed states, to continue from in the next segment.
+        steps : list of int
+            Length of each game finished during the segment.
+        """
+        steps = []
+        length = self.memory.get("length", np.zeros(len(states), dtype=np.int64))
+
+        for _ in range(self.parameter["segment"]):
+            with torch.no_grad():
+                actions = torch.softmax(self(torch.from_numpy(states)), dim=-1)
+                actions = torch.multinomial(actions, 1).view(-1).cpu().numpy()
+
+            new_states, rewards, terminated, truncated, info = environment.step(actions)
+
+            for key, value in zip(["state", "action", "reward", "terminated", "truncated", "final"],
+                                  [states, actions, rewards, terminated, truncated,
+                                   info["final_observation"]]):
+                self.memory[key].append(value)
+            states = new_states
+
+            length += 1
+            steps.extend(length[terminated | truncated].tolist())
+            length[terminated | truncated] = 0
+
+        self.memory["state"].append(states)
+        self.memory["length"] = length
+
+        return states, steps
+
+    def _learn(self):
+        """
+        Advantage actor-critic algorithm with respect to the last segment played.
+
+        Returns
+        -------
+        loss : float
+
+        Notes
+        -----
+        Instead of waiting for the end of each game (as REINFORCE), the expected future rewards
+        are estimated by the rewards of the segment, bootstrapped by the value of the last state
+        (n-step returns). The policy is then updated with respect to the advantage of each action,
+        i.e., how much better its expected reward is than the value of the state.
+        """
+        segment = self.parameter["segment"]
+        memory = {key: np.stack(value) for key, value in self.memory.items() if key != "length"}
+
+        states = torch.from_numpy(memory["state"]).to(self.device)
+        rewards = torch.from_numpy(memory["reward"].astype(np.float32)).to(self.device)
+        terminated = torch.from_numpy(memory["terminated"]).to(self.device)
+        truncated = torch.from_numpy(memory["truncated"]).to(self.device)
+
+        output, values = self.evaluate(states.view(-1, states.shape[-1]))
+        values = values.view(segment + 1, -1)
+
+        # EXPECTED FUTURE REWARDS
+        # ------------------------------------------------------------------------------------------
+        # The rewards are discounted backwards from the value of the last state. Terminated games
+        # are not bootstrapped, while truncated games are bootstrapped by the value of their
+        # actual last state (as the next state is the initial state of a new game).
+
+        with torch.no_grad():
+            _, final = self.evaluate(torch.from_numpy(memory["final"]).view(-1, states.shape[-1]))
+            final = final.view(segment, -1)
+
+            returns = torch.zeros_like(rewards)
+            _reward = values[-1].detach()
+            for i in reversed(range(segment)):
+                _reward = torch.where(truncated[i], final[i], _reward)
+                _reward = rewards[i] + self.discount * _reward * ~terminated[i]
+                returns[i] = _reward
+
+        # ADVANTAGE ACTOR-CRITIC
+        # ------------------------------------------------------------------------------------------
+        # The policy gradient is weighted by the advantage (see Notes), while the value of each
+        # state is regressed towards its expected future reward.
+
+        values = values[:-1].reshape(-1)
+        returns = returns.view(-1)
+        advantage = (returns - values).detach()
+
+        logarithms = torch.log_softmax(output.view(segment + 1, -1, output.shape[-1])[:-1], dim=-1)
+        logarithms = logarithms.reshape(-1, output.shape[-1])
+        entropy = -(logarithms.exp() * logarithms).sum(-1).mean()
+
+        actions = torch.from_numpy(memory["action"]).view(-1, 1).to(self.device)
+        loss = (-(logarithms.gather(1, actions).view(-1) * advantage).mean()
+                + self.parameter["value"] * torch.nn.functional.mse_loss(values, returns)
+                - self.parameter["entropy"] * entropy)
+
+        self.optimizer.zero_grad()
+        loss.backward()
+        self.optimizer.step()
+
+        length = self.memory["length"]
+        self.memory = {key: [] for key in self.memory.keys()}
+        self.memory["length"] = length
+
+        return loss.item()
@@ -5,7 +5,10 @@ Useful for environments with discrete state spaces.
 """
 
 from collections import deque, namedtuple
+import os
 import random
+import functools
+import importlib.util
 
 import numpy as np
 import torch
@@ -53,6 +56,11 @@ class DeepQ(torch.nn.Module):
                 Discount factor for future rewards.
                 --> 0: only consider immediate rewards
                 --> 1: consider all future rewards equally
+            memory : int, optional
+                Number of recent games to keep in memory. Number of recent transitions if `fast`.
+            fast : bool, optional
+                High-throughput mode. Transitions are stored in preallocated (contiguous) arrays,
+                and `learn` samples a fixed number of transitions instead of whole games.
         """
         super().__init__()
 
@@ -84,9 +92,34 @@ class DeepQ(torch.nn.Module):
                                                 **optimizer.get("hyperparameters", {}))
 
         self.batch_size = batch_size
-        self.memory = deque(maxlen=other.get("memory", 2500))
+        # The steps of the current game, or the games of a vectorized environment (`experience`).
         self.game = []
 
+        if not other.get("fast", False):
+            self.memory = deque(maxlen=other.get("memory", 2500))
+            return
+
+        # HIGH-THROUGHPUT MEMORY
+        # ------------------------------------------------------------------------------------------
+        # Transitions are written to a circular buffer of preallocated arrays. The discounted
+        # rewards are computed once per game (in `memorize`), instead of for every sampled batch.
+
+        capacity = other.get("memory", 2500)
+        self.memory = {
+            "state": np.zeros((capacity, network["inputs"]), dtype=np.float32),
+            "action": np.zeros(capacity, dtype=np.int64),
+            "new_state": np.zeros((capacity, network["inputs"]), dtype=np.float32),
+            "reward": np.zeros(capacity, dtype=np.float32),
+            "done": np.zeros(capacity, dtype=bool),
+            "position": 0,
+            "size": 0,
+        }
+
+    @property
+    def fast(self):
+        """Whether the agent uses the high-throughput (contiguous) memory."""
+        return isinstance(self.memory, dict)
+
     def forward(self, state):
         """
         Forward pass with nonmodified output.
@@ -116,21 +149,22 @@ class DeepQ(torch.nn.Module):
         Parameters
         ----------
         state : torch.Tensor
-            Observed state.
+            Observed state(s), of shape (games, inputs).
 
         Returns
         -------
-        action : int
-            Selected action.
-        actions : torch.Tensor
-            Q-values for each action.
-        """
-        if np.random.rand() < self.explore["rate"]:
-            action = torch.tensor([np.random.choice(
-                range(next(reversed(self._modules.values())).out_features)
-            )], dtype=torch.long)
-        else:
-            action = self(state).max(1).indices.flatten()
+        action : torch.Tensor
+            Selected action for each game.
+        """
+        explore = np.random.rand(state.shape[0]) < self.explore["rate"]
+        action = torch.from_numpy(np.random.randint(
+            next(reversed(self._modules.values())).out_features, size=state.shape[0]
+        ))
+
+        if not explore.all():
+            with torch.no_grad():
+                greedy = self(state).max(1).indices.flatten()
+            action = torch.where(torch.from_numpy(explore), action, greedy)
 
         return action
 
@@ -159,6 +193,9 @@ class DeepQ(torch.nn.Module):
         expected future rewards. Then, the agent can adjust its predicted action values so that
         this expected reward is maximized.
         """
+        if self.fast:
+            return self._learn(network)
+
         memory = random.sample(self.memory, min(self.batch_size, len(self.memory)))
 
         states = torch.cat([torch.cat(game.state) for game in memory])
@@ -176,8 +213,9 @@ class DeepQ(torch.nn.Module):
         # rewards. The rewards are then standardized.
 
         _reward = 0
+        _steps = set(steps)
         for i in reversed(range(len(rewards))):
-            _reward = 0 if i in steps else _reward
+            _reward = 0 if i in _steps else _reward
             _reward = _reward * self.discount + rewards[i]
             rewards[i] = _reward
         rewards = ((rewards - rewards.mean()) / (rewards.std() + 1e-7)).view(-1, 1)
@@ -202,13 +240,71 @@ class DeepQ(torch.nn.Module):
 
         actual = self(states).gather(1, actions.view(-1, 1))
 
-        optimal = (rewards +
-                   self.gamma * network(new_states).max(1).values.view(-1, 1))
+        with torch.no_grad():
+            optimal = (rewards +
+                       self.gamma * network(new_states).max(1).values.view(-1, 1))
 
         # As Google DeepMind suggests, the optimal Q-value is set to r if the game is over.
-        for step in steps:
-            optimal[step] = rewards[step]
+        optimal[steps] = rewards[steps]
+
+        return (self._backpropagate(actual, optimal) / steps[-1]) * 10000
+
+    def _learn(self, network):
+        """
+        Q-learning algorithm for the high-throughput mode (see `fast`).
+
+        Parameters
+        ----------
+        network : torch.nn.Module
+            Reference network for Q-learning.
+
+        Returns
+        -------
+        loss : float
+            Relative loss.
+
+        Notes
+        -----
+        Identical to `learn`, except that a fixed number of transitions (rather than games) are
+        sampled from the contiguous memory, and that the discounted rewards are precomputed.
+        """
+        index = np.random.randint(0, self.memory["size"], self.batch_size)
+
+        states = torch.from_numpy(self.memory["state"][index])
+        actions = torch.from_numpy(self.memory["action"][index]).view(-1, 1)
+        new_states = torch.from_numpy(self.memory["new_state"][index])
+        rewards = torch.from_numpy(self.memory["reward"][index])
+        done = torch.from_numpy(self.memory["done"][index]).view(-1, 1)
+
+        rewards = ((rewards - rewards.mean()) / (rewards.std() + 1e-7)).view(-1, 1)
+
+        # Q-LEARNING
+        # ------------------------------------------------------------------------------------------
+        # See `learn`. The optimal Q-value is set to r for terminal transitions through masking.
 
+        actual = self(states).gather(1, actions)
+
+        with torch.no_grad():
+            optimal = network(new_states).max(1).values.view(-1, 1)
+            optimal = rewards + self.gamma * optimal.masked_fill(done, 0.0)
+
+        return (self._backpropagate(actual, optimal) / self.batch_size) * 10000
+
+    def _backpropagate(self, actual, optimal):
+        """
+        Update the network and decay the exploration rate.
+
+        Parameters
+        ----------
+        actual : torch.Tensor
+            Predicted Q-values of the actions taken.
+        optimal : torch.Tensor
+            Target Q-values.
+
+        Returns
+        -------
+        loss : float
+        """
         # BACKPROPAGATION
         # ------------------------------------------------------------------------------------------
 
@@ -224,7 +320,7 @@ class DeepQ(torch.nn.Module):
         self.explore["rate"] = max(self.explore["decay"] * self.explore["rate"],
                                    self.explore["min"])
 
-        return (loss.item() / steps[-1]) * 10000
+        return loss.item()
 
     def remember(self, *args):
         """
@@ -246,5 +342,94 @@ class DeepQ(torch.nn.Module):
         steps : int
             Number of steps in the game (i.e., game length).
         """
-        self.memory.append(self.Memory(*zip(*self.game), steps))
+        if not self.fast:
+            self.memory.append(self.Memory(*zip(*self.game), steps))
+            self.game = []
+            return
+
+        state, action, new_state, reward = (
+            np.concatenate([np.asarray(value, dtype=np.float32).reshape(1, -1) for value in column])
+            for column in zip(*self.game)
+        )
         self.game = []
+
+        # The discounted rewards are computed once per game, as in `learn`.
+        _reward = 0.0
+        reward = reward.reshape(-1)
+        for i in reversed(range(steps)):
+            _reward = _reward * self.discount + reward[i]
+            reward[i] = _reward
+
+        done = np.zeros(steps, dtype=bool)
+        done[-1] = True
+
+        self._store(state, action.reshape(-1), new_state, reward, done)
+
+    def experience(self, state, action, new_state, reward, done):
+        """
+        Memorize one step of a vectorized environment (e.g. `vectorized.CartPole`).
+
+        Only available in the high-throughput mode (see `fast`). Finished games are memorized as
+        in `memorize`, while unfinished games are kept until they are done.
+
+        Parameters
+        ----------
+        state : numpy.ndarray
+            Observed states, of shape (games, inputs).
+        action : numpy.ndarray
+        new_state : numpy.ndarray
+            New states before any automatic reset (i.e., `info["final_observation"]`).
+        reward : numpy.ndarray
+        done : numpy.ndarray
+            Whether each game is terminated or truncated.
+        """
+        if isinstance(self.game, list):
+            self.game = _vectorized().Games(len(done))
+        step = tuple(np.asarray(value, dtype=np.float32)
+                     for value in (state, action, new_state, reward))
+
+        for states, actions, new_states, rewards in self.game.record(step, done):
+            steps = len(rewards)
+
+            _reward = 0.0
+            for i in reversed(range(steps)):
+                _reward = _reward * self.discount + rewards[i]
+                rewards[i] = _reward
+
+            self._store(states, actions, new_states, rewards, np.arange(steps) == steps - 1)
+
+    def _store(self, state, action, new_state, reward, done):
+        """
+        Write transitions to the circular high-throughput memory (see `fast`).
+
+        Parameters
+        ----------
+        state : numpy.ndarray
+        action : numpy.ndarray
+        new_state : numpy.ndarray
+        reward : numpy.ndarray
+            Discounted rewards.
+        done : numpy.ndarray
+            Whether the transition ended its game.
+        """
+        capacity = self.memory["done"].shape[0]
+        index = (self.memory["position"] + np.arange(len(done))) % capacity
+
+        self.memory["state"][index] = state
+        self.memory["action"][index] = action
+        self.memory["new_state"][index] = new_state
+        self.memory["reward"][index] = reward
+        self.memory["done"][index] = done
+
+        self.memory["position"] = int(index[-1] + 1) % capacity
+        self.memory["size"] = min(self.memory["size"] + len(done), capacity)
+
+
+@functools.cache
+def _vectorized():
+    """The `vectorized` module next to this one; only loaded by the batched code paths."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vectorized.py")
+    spec = importlib.util.spec_from_file_location("vectorized", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
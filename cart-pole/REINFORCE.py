@@ -1,5 +1,9 @@
 """Policy-based agent for reinforcement learning."""
 
+import os
+import functools
+import importlib.util
+
 import numpy as np
 import torch
 
@@ -42,6 +46,10 @@ class PolicyGradient(torch.nn.Module):
                 Discount factor for future rewards.
                 --> 0: only consider immediate rewards
                 --> 1: consider all future rewards equally
+            batched : bool, optional
+                Batched mode. Games are played in a vectorized environment through `rollout`
+                (without gradients), and only the states and actions are memorized. `learn` then
+                recomputes the logarithms of all memorized games in a single forward pass.
         """
         super().__init__()
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -65,10 +73,19 @@ class PolicyGradient(torch.nn.Module):
         self.optimizer = optimizer["optimizer"](self.parameters(), lr=optimizer["lr"],
                                                 **optimizer.get("hyperparameters", {}))
 
-        self.memory = {key: [] for key in ["logarithm", "reward"]}
+        self.memory = {key: [] for key in (["state", "action", "reward"]
+                                           if other.get("batched", False)
+                                           else ["logarithm", "reward"])}
+        # Unfinished games of a vectorized environment (see `rollout`).
+        self.games = None
 
         self.to(self.device)
 
+    @property
+    def batched(self):
+        """Whether the agent learns from batched rollouts (see `rollout`)."""
+        return "state" in self.memory
+
     def forward(self, state):
         """
         Forward pass with nonmodified output.
@@ -134,6 +151,9 @@ class PolicyGradient(torch.nn.Module):
          https://medium.com/@thechrisyoon/deriving-policy-gradients-and-implementing-reinforce
          -f887949bd63
         """
+        if self.batched:
+            return self._learn()
+
         rewards = torch.tensor(self.memory["reward"], dtype=torch.float32).to(self.device)
 
         # EXPECTED FUTURE REWARDS
@@ -173,6 +193,113 @@ class PolicyGradient(torch.nn.Module):
 
         return gradient.item()
 
+    def _learn(self):
+        """
+        REINFORCE algorithm with respect to all games memorized through `rollout`.
+
+        Returns
+        -------
+        gradient : float
+            Average gradient per game.
+
+        Notes
+        -----
+        Identical to `learn`, except that the logarithms of the selected action probabilities are
+        recomputed in one forward pass, and that the gradients of all games are averaged.
+        """
+        games = len(self.memory["reward"])
+
+        states = torch.from_numpy(np.concatenate(self.memory["state"])).to(self.device)
+        actions = torch.from_numpy(np.concatenate(self.memory["action"])).to(self.device)
+        rewards = torch.from_numpy(np.concatenate(self.memory["reward"])).to(self.device)
+
+        logarithms = torch.log_softmax(self(states), dim=-1).gather(1, actions.view(-1, 1))
+        gradient = (-logarithms.view(-1) * rewards).sum() / games
+
+        self.optimizer.zero_grad()
+        gradient.backward()
+        self.optimizer.step()
+
+        # Unfinished games (`games`) are kept.
+        for key in ["state", "action", "reward"]:
+            self.memory[key] = []
+
+        return gradient.item()
+
+    def rollout(self, environment, states, games=1):
+        """
+        Play in a vectorized environment (without gradients) until `games` games are finished.
+
+        Parameters
+        ----------
+        environment : vectorized.CartPole
+            Vectorized environment with automatic reset.
+        states : numpy.ndarray
+            Observed states, of shape (environments, inputs).
+        games : int, optional
+            Minimum number of games to finish.
+
+        Returns
+        -------
+        states : numpy.ndarray
+            Observed states, to continue from in the next `rollout`.
+        steps : list of int
+            Length of each finished game.
+
+        Notes
+        -----
+        Unfinished games are kept in memory, and are continued in the next `rollout`. The rewards
+        of each finished game are discounted and standardized as in `learn`.
+        """
+        if self.games is None:
+            self.games = _vectorized().Games(len(states))
+
+        steps = []
+        while len(steps) < games:
+            with torch.no_grad():
+                actions = torch.softmax(self(torch.from_numpy(states)), dim=-1)
+                actions = torch.multinomial(actions, 1).view(-1).cpu().numpy()
+
+            new_states, rewards, terminated, truncated, _ = environment.step(actions)
+            finished = self.games.record((states, actions, rewards.astype(np.float32)),
+                                         terminated | truncated)
+            states = new_states
+
+            steps.extend(self._finish(finished))
+
+        return states, steps
+
+    def _finish(self, games):
+        """
+        Memorize the finished games of a vectorized environment (see `rollout`).
+
+        Parameters
+        ----------
+        games : list of tuple of numpy.ndarray
+            The states, actions and rewards of each finished game (see `vectorized.Games`).
+
+        Returns
+        -------
+        steps : list of int
+            Length of each finished game.
+        """
+        steps = []
+        for states, actions, rewards in games:
+            steps.append(len(rewards))
+
+            _reward = 0.0
+            for j in reversed(range(steps[-1])):
+                _reward = _reward * self.discount + rewards[j]
+                rewards[j] = _reward
+
+            self.memory["state"].append(states)
+            self.memory["action"].append(actions)
+            self.memory["reward"].append(
+                (rewards - rewards.mean()) / (rewards.std(ddof=1) + 1e-7)
+            )
+
+        return steps
+
     def memorize(self, *args):
         """
         Append state, action and reward to agent memory.
@@ -186,3 +313,13 @@ class PolicyGradient(torch.nn.Module):
 
         self.memory["logarithm"].append(logarithm)
         self.memory["reward"].append(reward)
+
+
+@functools.cache
+def _vectorized():
+    """The `vectorized` module next to this one; only loaded by the batched code paths."""
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "vectorized.py")
+    spec = importlib.util.spec_from_file_location("vectorized", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,175 @@
+"""
+Ensemble of value-based agents trained simultaneously in one process.
+
+The parameters of K independent `DeepQ` agents are stacked, and the forward and backward passes
+of all agents are computed at once (through `torch.func.vmap`). This replaces K tiny matrix
+multiplications with one larger, which makes seed and hyperparameter studies far cheaper.
+"""
+
+import numpy as np
+import torch
+from torch.func import functional_call, stack_module_state, vmap
+
+
+class Ensemble:
+    """Ensemble of value-based agents."""
+    def __init__(self, agents):
+        """
+        Ensemble of value-based agents.
+
+        Parameters
+        ----------
+        agents : list of DQN.DeepQ
+            Agents in the high-throughput mode (see `DeepQ`), with identical architectures.
+            Each agent keeps its own memory, exploration rate, `discount` and `gamma`.
+
+            The stacked parameters are optimized by one optimizer, of the same class and
+            settings (e.g. learning rate) as those of the agents, which must therefore agree. The
+            state of element-wise optimizers (e.g. `RMSprop` or `Adam`) is still independent for
+            each agent, but starts anew.
+
+        Raises
+        ------
+        ValueError
+            If the optimizers of the agents differ in class or settings.
+        """
+        optimizers = {(type(agent.optimizer), repr(_settings(agent.optimizer)))
+                      for agent in agents}
+        if len(optimizers) > 1:
+            raise ValueError("The optimizers of the agents differ in class or settings: "
+                             + "; ".join(f"{optimizer.__name__}{settings}"
+                                         for optimizer, settings in sorted(optimizers, key=str)))
+
+        self.agents = agents
+
+        self.parameters, _ = stack_module_state(agents)
+        self.target = {name: parameter.detach().clone()
+                       for name, parameter in self.parameters.items()}
+
+        self.gamma = torch.tensor([agent.gamma for agent in agents]).view(-1, 1)
+        self.optimizer = type(agents[0].optimizer)(self.parameters.values(),
+                                                   **_settings(agents[0].optimizer))
+
+    def __len__(self):
+        return len(self.agents)
+
+    def forward(self, parameters, state):
+        """
+        Forward pass of every agent with nonmodified output.
+
+        Parameters
+        ----------
+        parameters : dict
+            Stacked parameters, e.g. `self.parameters` or `self.target`.
+        state : torch.Tensor
+            Observed states of shape (agents, games, inputs).
+
+        Returns
+        -------
+        output : torch.Tensor
+            Output of shape (agents, games, outputs).
+        """
+        return vmap(lambda _parameters, _state: functional_call(
+            self.agents[0], _parameters, (_state,)
+        ))(parameters, state)
+
+    def action(self, state):
+        """
+        Greedy action selection with stochastic exploration, for every agent.
+
+        Parameters
+        ----------
+        state : torch.Tensor
+            Observed states of shape (agents, games, inputs).
+
+        Returns
+        -------
+        action : torch.Tensor
+            Selected actions of shape (agents, games).
+        """
+        rate = np.array([agent.explore["rate"] for agent in self.agents]).reshape(-1, 1)
+        explore = np.random.rand(*state.shape[:2]) < rate
+
+        with torch.no_grad():
+            output = self.forward(self.parameters, state)
+
+        action = torch.from_numpy(np.random.randint(output.shape[-1], size=state.shape[:2]))
+        return torch.where(torch.from_numpy(explore), action, output.argmax(2))
+
+    def experience(self, state, action, new_state, reward, done):
+        """
+        Memorize one step of a vectorized environment for every agent (see `DeepQ.experience`).
+
+        Parameters
+        ----------
+        state : numpy.ndarray
+            Observed states of shape (agents, games, inputs).
+        action : numpy.ndarray
+        new_state : numpy.ndarray
+        reward : numpy.ndarray
+        done : numpy.ndarray
+        """
+        for i, agent in enumerate(self.agents):
+            agent.experience(state[i], action[i], new_state[i], reward[i], done[i])
+
+    def learn(self):
+        """
+        Q-learning algorithm (see `DeepQ.learn`) for every agent at once.
+
+        Returns
+        -------
+        loss : numpy.ndarray
+            Relative loss of each agent.
+        """
+        batch_size = self.agents[0].batch_size
+        index = [np.random.randint(0, agent.memory["size"], batch_size) for agent in self.agents]
+
+        states, actions, new_states, rewards, done = (
+            torch.from_numpy(np.stack([agent.memory[key][i]
+                                       for agent, i in zip(self.agents, index)]))
+            for key in ["state", "action", "new_state", "reward", "done"]
+        )
+        rewards = ((rewards - rewards.mean(1, keepdim=True))
+                   / (rewards.std(1, keepdim=True) + 1e-7))
+
+        # Q-LEARNING
+        # ------------------------------------------------------------------------------------------
+        # See `DeepQ.learn`. As the agents are independent, the gradient of the summed loss equals
+        # the gradient of each agent's loss with respect to its own parameters.
+
+        actual = self.forward(self.parameters, states).gather(2, actions.unsqueeze(2)).squeeze(2)
+
+        with torch.no_grad():
+            optimal = self.forward(self.target, new_states).max(2).values
+            optimal = rewards + self.gamma * optimal.masked_fill(done, 0.0)
+
+        loss = ((actual - optimal) ** 2).mean(1)
+
+        self.optimizer.zero_grad()
+        loss.sum().backward()
+        self.optimizer.step()
+
+        # EXPLORATION RATE DECAY
+        # ------------------------------------------------------------------------------------------
+
+        for agent in self.agents:
+            agent.explore["rate"] = max(agent.explore["decay"] * agent.explore["rate"],
+                                        agent.explore["min"])
+
+        return loss.detach().numpy() / batch_size * 10000
+
+    def reset(self):
+        """Update the reference (target) networks with the current parameters."""
+        for name, parameter in self.parameters.items():
+            self.target[name].copy_(parameter.detach())
+
+    def synchronize(self):
+        """Copy the stacked parameters back to the individual agents (e.g. before saving)."""
+        for i, agent in enumerate(self.agents):
+            agent.load_state_dict({name: parameter[i].detach()
+                                   for name, parameter in self.parameters.items()})
+
+
+def _settings(optimizer):
+    """Settings (e.g. learning rate) of the parameters of an optimizer, without the parameters."""
+    return {key: value for key, value in optimizer.param_groups[0].items() if key != "params"}
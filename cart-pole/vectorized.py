@@ -0,0 +1,189 @@
+"""
+Vectorized cart-pole environment using NumPy.
+
+Simulates any number of cart-pole games in parallel, following the equations, termination and
+truncation rules of `gymnasium`'s "CartPole-v1".
+"""
+
+import math
+
+import numpy as np
+
+
+class CartPole:
+    """Vectorized cart-pole environment."""
+    gravity = 9.8
+    masscart = 1.0
+    masspole = 0.1
+    total_mass = masspole + masscart
+    length = 0.5
+    polemass_length = masspole * length
+    force_mag = 10.0
+    tau = 0.02
+
+    theta_threshold = 12 * 2 * math.pi / 360
+    x_threshold = 2.4
+
+    def __init__(self, environments=1, max_steps=500, seed=None):
+        """
+        Vectorized cart-pole environment.
+
+        Parameters
+        ----------
+        environments : int, optional
+            Number of parallel games.
+        max_steps : int, optional
+            Number of steps before a game is truncated (500 for "CartPole-v1").
+        seed : int, optional
+            Seed for the random initial states.
+
+        Notes
+        -----
+        Finished games are reset automatically in the same step (i.e., the returned observation
+        is the initial state of the next game). The actual last observation of each game is
+        available through `info["final_observation"]`.
+        """
+        self.num_envs = environments
+        self.max_steps = max_steps
+
+        self.random = np.random.default_rng(seed)
+
+        self.state = np.zeros((environments, 4), dtype=np.float64)
+        self.steps = np.zeros(environments, dtype=np.int64)
+
+    def reset(self, seed=None):
+        """
+        Reset all games.
+
+        Parameters
+        ----------
+        seed : int, optional
+            Reseeds the random initial states.
+
+        Returns
+        -------
+        observation : numpy.ndarray
+            Initial states of shape (environments, 4).
+        info : dict
+        """
+        if seed is not None:
+            self.random = np.random.default_rng(seed)
+
+        self.state = self.random.uniform(-0.05, 0.05, size=(self.num_envs, 4))
+        self.steps[:] = 0
+
+        return self.state.astype(np.float32), {}
+
+    def step(self, actions):
+        """
+        Advance all games by one step.
+
+        Parameters
+        ----------
+        actions : numpy.ndarray or torch.Tensor
+            Action (0: push left, 1: push right) for each game.
+
+        Returns
+        -------
+        observation : numpy.ndarray
+            New states of shape (environments, 4). Initial states for finished games.
+        reward : numpy.ndarray
+        terminated : numpy.ndarray
+        truncated : numpy.ndarray
+        info : dict
+            final_observation : numpy.ndarray
+                New states, without the resets of finished games.
+        """
+        x, x_dot, theta, theta_dot = self.state.T
+
+        force = np.where(np.asarray(actions).reshape(-1) == 1, self.force_mag, -self.force_mag)
+        costheta = np.cos(theta)
+        sintheta = np.sin(theta)
+
+        # DYNAMICS
+        # ------------------------------------------------------------------------------------------
+        # Identical to `gymnasium.envs.classic_control.CartPoleEnv` (Euler integration), see
+        # https://coneural.org/florian/papers/05_cart_pole.pdf
+
+        temp = (force + self.polemass_length * np.square(theta_dot) * sintheta) / self.total_mass
+        thetaacc = (self.gravity * sintheta - costheta * temp) / (
+            self.length * (4.0 / 3.0 - self.masspole * np.square(costheta) / self.total_mass)
+        )
+        xacc = temp - self.polemass_length * thetaacc * costheta / self.total_mass
+
+        self.state = np.stack([x + self.tau * x_dot,
+                               x_dot + self.tau * xacc,
+                               theta + self.tau * theta_dot,
+                               theta_dot + self.tau * thetaacc], axis=1)
+        self.steps += 1
+
+        terminated = ((np.abs(self.state[:, 0]) > self.x_threshold)
+                      | (np.abs(self.state[:, 2]) > self.theta_threshold))
+        truncated = self.steps >= self.max_steps
+        reward = np.ones(self.num_envs, dtype=np.float32)
+
+        # AUTOMATIC RESET
+        # ------------------------------------------------------------------------------------------
+
+        observation = self.state.astype(np.float32)
+        info = {"final_observation": observation.copy()}
+
+        done = terminated | truncated
+        if done.any():
+            self.state[done] = self.random.uniform(-0.05, 0.05, size=(done.sum(), 4))
+            self.steps[done] = 0
+            observation[done] = self.state[done]
+
+        return observation, reward, terminated, truncated, info
+
+
+class Games:
+    """The steps of the games of a vectorized environment, kept until each game is finished."""
+    def __init__(self, environments):
+        """
+        The steps of the games of a vectorized environment, kept until each game is finished.
+
+        Parameters
+        ----------
+        environments : int
+            Number of parallel games.
+        """
+        self.steps = []
+
+        # The first step of each unfinished game, counted from the first step ever recorded, and
+        # the number of steps forgotten since.
+        self.start = np.zeros(environments, dtype=np.int64)
+        self.offset = 0
+
+    def record(self, step, done):
+        """
+        Record a step of all games, and split off the games it finished.
+
+        Parameters
+        ----------
+        step : tuple of numpy.ndarray
+            Arrays over the games, e.g. the states, actions and rewards.
+        done : numpy.ndarray
+            Whether each game finished with the step.
+
+        Returns
+        -------
+        list of tuple of numpy.ndarray
+            Each finished game; the arrays of its steps, stacked.
+        """
+        self.steps.append(step)
+
+        games = []
+        for i in np.flatnonzero(done):
+            steps = self.offset + len(self.steps) - self.start[i]
+            games.append(tuple(np.stack([_step[j][i] for _step in self.steps[-steps:]])
+                               for j in range(len(step))))
+            self.start[i] = self.offset + len(self.steps)
+
+        # Steps that are no longer part of an unfinished game are forgotten.
+        forget = self.start.min() - self.offset
+        if forget > 0:
+            del self.steps[:forget]
+            self.offset += forget
+
+        return games
@@ -0,0 +1,256 @@
+"""
+Greedy evaluation of many checkpoints (e.g. `weights-*.pth`) in parallel.
+
+Usage (from the root of the repository), for the vision agents of a training configuration:
+
+    python -m help.evaluation.evaluate breakout/config.json
+    python -m help.evaluation.evaluate tetris/config.json --games 100 --processes 8
+"""
+
+import os
+import re
+import csv
+import sys
+import copy
+import glob
+import json
+import math
+import time
+import argparse
+import importlib
+import multiprocessing
+
+import numpy as np
+import torch
+import gymnasium as gym
+
+from help.training import train
+from help.training.checkpoint import load_weights
+
+PERCENTILES = (5, 25, 75, 95)
+
+
+def evaluate(pattern, agent, parameters, environment, output="./evaluation.csv", **other):
+    """
+    Play `games` greedy games with each checkpoint in a pool of processes, and summarise the
+    rewards and lengths of the games.
+
+    Every worker plays a chunk of games of one checkpoint at once; the games are stepped together
+    and the actions of all unfinished games are selected in one (batched) forward pass.
+
+    Vision agents step each game through their own `observe` (e.g. with the preprocessing and
+    reward shaping of tetris), so the rewards are those reported in training.
+
+    Parameters
+    ----------
+    pattern : str
+        Glob pattern of the checkpoints, e.g. "./output/weights-*.pth".
+    agent : type
+        Agent class, e.g. `VisionDeepQ` from `breakout/DQN.py`, or `DeepQ` and `PolicyGradient`
+        from `cart-pole/`. Agents with a `preprocess` method are treated as vision agents.
+    parameters : dict
+        Keyword arguments for the agent, e.g. `{"network": ..., "optimizer": ..., "shape": ...}`.
+    environment : dict
+        Keyword arguments for `gymnasium.make`, e.g. `{"id": "ALE/Breakout-v5",
+        "obs_type": "grayscale", "frameskip": 1, "repeat_action_probability": 0.0}`.
+    output : str, optional
+        Path of the results (csv); one row per checkpoint.
+    other
+        Additional parameters.
+
+        games : int, optional
+            Number of games per checkpoint.
+        processes : int, optional
+            Number of workers. Defaults to the number of CPUs.
+        skip : int, optional
+            Number of frames to skip between each observation (see `VisionDeepQ.observe`).
+        steps : int, optional
+            Maximum number of observations per game (in case the agent never loses).
+        seed : int, optional
+            Seed of the first game; game i is seeded with `seed + i`.
+
+    Returns
+    -------
+    results : list of dict
+        Summary of each checkpoint (see `PERCENTILES`).
+    """
+    checkpoints = sorted(glob.glob(pattern), key=lambda file: int(
+        re.search(r'weights-(\d+).pth', file).group(1)
+    ) if re.search(r'weights-(\d+).pth', file) else 0)
+
+    # The games of each checkpoint are split into chunks, so that all workers are kept busy even
+    # when there are fewer checkpoints than workers.
+    processes = other.get("processes", os.cpu_count())
+    games = other.get("games", 30)
+    chunks = min(games, max(1, math.ceil(processes / max(len(checkpoints), 1))))
+    bounds = np.linspace(0, games, chunks + 1).astype(int)
+
+    tasks = [(checkpoint, agent, parameters, environment, (start, end), other)
+             for checkpoint in checkpoints
+             for start, end in zip(bounds[:-1], bounds[1:])]
+
+    with multiprocessing.Pool(processes, initializer=_initialise, initargs=(sys.path,)) as pool:
+        played = pool.map(_play, tasks)
+
+    results = []
+    for i, checkpoint in enumerate(checkpoints):
+        rewards, steps, seconds = (np.concatenate([chunk[key] for chunk in
+                                                   played[i * chunks:(i + 1) * chunks]])
+                                   for key in ["rewards", "steps", "seconds"])
+        results.append({
+            "checkpoint": checkpoint,
+            "games": len(rewards),
+            "mean": rewards.mean(),
+            "std": rewards.std(),
+            "median": np.median(rewards),
+            **{f"p{percentile}": np.percentile(rewards, percentile)
+               for percentile in PERCENTILES},
+            "min": rewards.min(),
+            "max": rewards.max(),
+            "steps": steps.mean(),
+            "seconds": seconds.sum(),
+        })
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", newline="", encoding="UTF-8") as file:
+        writer = csv.DictWriter(file, fieldnames=list(results[0]) if results else ["checkpoint"])
+        writer.writeheader()
+        writer.writerows(results)
+
+    return results
+
+
+def _initialise(path):
+    """Worker initialisation; the agent class must be importable from the worker."""
+    sys.path[:] = path
+    torch.set_num_threads(1)
+
+
+def _observe(agent, environments, active, action, skip):
+    """
+    Step the unfinished games with the selected actions.
+
+    Vision agents observe each game with their own `observe`, given the action (the previous
+    states are therefore not needed).
+
+    Returns
+    -------
+    states : torch.Tensor
+        New states of the unfinished games.
+    rewards : numpy.ndarray
+    done : numpy.ndarray
+    """
+    rewards = np.zeros(len(active))
+    done = np.zeros(len(active), dtype=bool)
+
+    if not hasattr(agent, "preprocess"):
+        states = []
+        for i, game in enumerate(active):
+            state, reward, terminated, truncated, _ = environments[game].step(action[i])
+            states.append(state)
+            rewards[i], done[i] = reward, terminated or truncated
+        return torch.tensor(np.array(states), dtype=torch.float32), rewards, done
+
+    states = torch.zeros((len(active), *agent.shape["reshape"][1:]))
+    for i, game in enumerate(active):
+        _, state, rewards[i], done[i] = agent.observe(
+            environments[game], None, skip, action=torch.tensor([action[i]], dtype=torch.long)
+        )
+        states[i] = state[0]
+
+    return states, rewards, done
+
+
+def _play(task):
+    """
+    Play a chunk of greedy games with a checkpoint (see `evaluate`).
+
+    Parameters
+    ----------
+    task : tuple
+        Checkpoint, agent class, agent parameters, environment parameters, range of the games
+        and the additional parameters of `evaluate`.
+
+    Returns
+    -------
+    result : dict
+        Rewards and lengths of the games, and the time spent.
+    """
+    checkpoint, agent, parameters, environment, (first, last), other = task
+
+    agent = agent(**copy.deepcopy(parameters))
+    load_weights(agent, checkpoint, assign=True).eval()
+
+    start = time.perf_counter()
+
+    environments = [gym.make(**environment) for _ in range(first, last)]
+    states = [environments[i].reset(seed=other.get("seed", 0) + game)[0]
+              for i, game in enumerate(range(first, last))]
+    if hasattr(agent, "preprocess"):
+        # Tetris' preprocessing drops the batch and channel dimensions; restored as in training.
+        reshape = agent.shape["reshape"]
+        states = torch.cat([torch.cat([agent.preprocess(state).view(1, 1, *reshape[2:])]
+                                      * reshape[1], dim=1)
+                            for state in states])
+    else:
+        states = torch.tensor(np.array(states), dtype=torch.float32)
+
+    rewards = np.zeros(len(environments))
+    steps = np.zeros(len(environments), dtype=int)
+    active = np.arange(len(environments))
+    while active.size and steps.max() < other.get("steps", 10000):
+        with torch.no_grad():
+            action = agent(states).argmax(1).cpu().numpy()
+
+        states, _rewards, done = _observe(agent, environments, active, action,
+                                          other.get("skip", 1))
+        rewards[active] += _rewards
+        steps[active] += 1
+
+        active, states = active[~done], states[torch.from_numpy(~done)]
+
+    for _environment in environments:
+        _environment.close()
+
+    return {"rewards": rewards, "steps": steps,
+            "seconds": np.array([time.perf_counter() - start])}
+
+
+def main(argv=None):
+    """Evaluate the checkpoints of a training configuration, as given by the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("config", help="JSON configuration, e.g. breakout/config.json.")
+    parser.add_argument("--pattern", default=None,
+                        help="Glob pattern of the checkpoints (default: weights-*.pth of the "
+                             "output directory of the configuration).")
+    parser.add_argument("--output", default="./evaluation.csv")
+    parser.add_argument("--games", type=int, default=30, help="Games per checkpoint.")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--steps", type=int, default=10000, help="Most observations per game.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a setting, e.g. skip=2 (repeatable).")
+    arguments = parser.parse_args(argv)
+
+    config = train.configuration(arguments.config, arguments.set)
+
+    # Imported by name (rather than from its path, as in training) for the workers to unpickle.
+    sys.path.insert(0, os.path.dirname(config["agent"]))
+    agent = importlib.import_module(
+        os.path.splitext(os.path.basename(config["agent"]))[0]
+    ).VisionDeepQ
+
+    results = evaluate(
+        arguments.pattern or os.path.join(config["output"], "weights-*.pth"),
+        agent, train.parameters(config), config["environment"], arguments.output,
+        games=arguments.games, processes=arguments.processes or os.cpu_count(),
+        skip=config["skip"], steps=arguments.steps, seed=arguments.seed,
+    )
+    for row in results:
+        print(json.dumps(row, default=float))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,9 @@
 #SBATCH --gres=gpu:1
 #SBATCH --mem=64G
 #SBATCH --output=./output/print.out
+#SBATCH --open-mode=append
+#SBATCH --requeue
+#SBATCH --signal=B:USR2@300              ##   Seconds before the time limit to stop (see below).
 
 ## Script commands
 module load singularity
@@ -13,7 +16,31 @@ module load singularity
 SIFFILE="/path/to/singularity.sif"       ##  !!! ENTER PATH HERE !!!
 
 ## Executing the script.
+##
+## Slurm sends SIGUSR2 to this script `--signal` seconds before the time limit, which is forwarded
+## to `train.py`. The training then finishes the current game, checkpoints and exits with status 3,
+## upon which the job is requeued, and resumes from the checkpoint. Override the lead time with
+## e.g. `sbatch --signal=B:USR2@600 train.sh`; it should exceed the duration of a game and a
+## checkpoint. SIGTERM (e.g. `scancel --signal=TERM`) is handled in the same way by `train.py`.
 
-singularity exec --nv $SIFFILE python train.py
+singularity exec --nv $SIFFILE python train.py &
+PID=$!
+
+trap 'kill -USR2 $PID' USR2
+trap '' TERM
+
+## `wait` returns early when a trapped signal arrives; wait until `train.py` has exited.
+wait $PID
+STATUS=$?
+while kill -0 $PID 2>/dev/null; do
+    wait $PID
+    STATUS=$?
+done
+
+if [ $STATUS -eq 3 ]; then
+    scontrol requeue $SLURM_JOB_ID
+fi
+
+exit $STATUS
 
 ## Execute with: sbatch train.sh
@@ -0,0 +1,374 @@
+"""Asynchronous, atomic checkpoints of the full training state, indexed by a manifest."""
+
+import io
+import os
+import json
+import time
+import queue
+import random
+import hashlib
+import threading
+
+import numpy as np
+import torch
+
+
+class Checkpointer:
+    """Writes checkpoints of the full training state on a background thread."""
+    def __init__(self, directory="./output", logger=None, **other):
+        """
+        Writes checkpoints of the full training state on a background thread.
+
+        `save` copies the state to CPU memory on the calling thread, which takes milliseconds,
+        and the copy is written to disk by a background thread; to a temporary file which is then
+        renamed, so that a checkpoint is either complete or absent (e.g. if the job is killed
+        while writing).
+
+        Each checkpoint consists of two files in `directory`:
+
+            weights-{game}.pth
+                The weights of the agent (`state_dict`), as loaded by the evaluation scripts.
+            checkpoint-{game}.pth
+                The full training state, from which training is resumed exactly (see `restore`);
+                the weights of the agent and target network, the state of the optimizer, the
+                exploration rate, the states of the random number generators (Python, NumPy,
+                PyTorch, CUDA and the environment) and the game number.
+
+        The checkpoints are indexed by `manifest.json` in `directory`, which is rewritten
+        atomically after each checkpoint is written. Each entry holds the game number, the file
+        names, the metrics given to `save` and the SHA-256 of the files. The most recent
+        checkpoint is thereby found without searching the file system.
+
+        Parameters
+        ----------
+        directory : str, optional
+        logger : logging.Logger, optional
+        other
+            Additional parameters.
+
+            last : int or None, optional
+                Number of most recent checkpoints to keep; `None` keeps all.
+            best : int, optional
+                Number of checkpoints with the highest `metric` to keep in addition.
+            metric : str, optional
+                Name of the metric (see `save`) that ranks the checkpoints, e.g. "reward".
+        """
+        self.directory = directory
+        self.logger = logger
+        self.parameter = {
+            "last": other.get("last"),
+            "best": other.get("best", 0),
+            "metric": other.get("metric", "reward"),
+            "closed": False,
+            "errors": [],
+        }
+
+        # At most one checkpoint waits while another is written; bounds the memory of snapshots.
+        self.queue = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = _read(os.path.join(directory, "manifest.json"))
+
+    def save(self, game, agent, target=None, **other):
+        """
+        Snapshot the training state, and write it on the background thread.
+
+        Parameters
+        ----------
+        game : int
+            Number of the last game played.
+        agent : torch.nn.Module
+            With its optimizer and exploration rate in `agent.parameter`.
+        target : torch.nn.Module, optional
+            Target network.
+        other
+            Additional parameters.
+
+            environment : gymnasium.Env, optional
+                Whose random number generator is saved.
+            metrics : dict, optional
+                Recorded in the manifest, e.g. `{"reward": 12.5}`; ranks the checkpoints kept by
+                `best`.
+        """
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+        environment = other.get("environment")
+
+        state = {
+            "game": game,
+            "agent": _cpu(agent.state_dict()),
+            "target": _cpu(target.state_dict()) if target is not None else None,
+            "optimizer": _cpu(agent.parameter["optimizer"].state_dict()),
+            "rate": agent.parameter["rate"],
+            "random": {
+                "python": random.getstate(),
+                "numpy": np.random.get_state(),
+                "torch": torch.get_rng_state(),
+                "cuda": torch.cuda.get_rng_state_all() if torch.cuda.is_available() else [],
+                "environment": (environment.unwrapped.np_random.bit_generator.state
+                                if environment is not None else None),
+            },
+            "metrics": dict(other.get("metrics") or {}),
+        }
+        self.queue.put(state)
+
+    def wait(self):
+        """Block until the queued checkpoints are written."""
+        self.queue.join()
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+    def close(self):
+        """Write the queued checkpoints and stop the background thread."""
+        if self.parameter["closed"]:
+            return
+        self.parameter["closed"] = True
+
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+    def latest(self):
+        """
+        The path of the most recent checkpoint in the manifest.
+
+        Returns
+        -------
+        str or None
+        """
+        entries = self.manifest["checkpoints"]
+        return os.path.join(self.directory, entries[-1]["checkpoint"]) if entries else None
+
+    def path(self, kind, game):
+        """
+        The path of a checkpoint file.
+
+        Parameters
+        ----------
+        kind : str
+            "weights" or "checkpoint".
+        game : int
+
+        Returns
+        -------
+        str
+        """
+        return os.path.join(self.directory, f"{kind}-{game}.pth")
+
+    def restore(self, agent, target=None, environment=None):
+        """
+        Resume the training state from the most recent valid checkpoint in the manifest.
+
+        Checkpoints whose files do not match the hash in the manifest, or which cannot be loaded
+        (e.g. a different architecture), are logged and skipped in favour of older ones.
+
+        Parameters
+        ----------
+        agent : torch.nn.Module
+        target : torch.nn.Module, optional
+        environment : gymnasium.Env, optional
+
+        Returns
+        -------
+        int
+            Number of the last game played, or zero if there is no checkpoint to resume from.
+        """
+        for entry in reversed(self.manifest["checkpoints"]):
+            path = os.path.join(self.directory, entry["checkpoint"])
+            try:
+                if _hash(path) != entry["sha256"]["checkpoint"]:
+                    raise ValueError("the file does not match the hash in the manifest")
+                _load(torch.load(path, map_location="cpu", weights_only=False),
+                      agent, target, environment)
+            except (OSError, RuntimeError, ValueError, KeyError) as error:
+                if self.logger is not None:
+                    self.logger.error("Failed to resume from %s due to error: %s", path, error)
+                continue
+
+            self._log("Resumed from %s (game %s)", path, entry["game"])
+            return entry["game"]
+
+        return 0
+
+    def _write(self):
+        """Background thread; write the queued checkpoints until closed."""
+        while True:
+            state = self.queue.get()
+            try:
+                if state is None:
+                    return
+                self._checkpoint(state)
+            except (OSError, RuntimeError) as error:
+                self.parameter["errors"].append(error)
+            finally:
+                self.queue.task_done()
+
+    def _checkpoint(self, state):
+        """Write the files of a checkpoint, add it to the manifest and apply the retention."""
+        game = state["game"]
+        entry = {
+            "game": game,
+            "checkpoint": os.path.basename(self.path("checkpoint", game)),
+            "weights": os.path.basename(self.path("weights", game)),
+            "metrics": state["metrics"],
+            "sha256": {
+                "weights": _atomic(state["agent"], self.path("weights", game)),
+                "checkpoint": _atomic(state, self.path("checkpoint", game)),
+            },
+            "time": time.time(),
+        }
+
+        entries = [_entry for _entry in self.manifest["checkpoints"] if _entry["game"] != game]
+        entries.append(entry)
+        entries.sort(key=lambda _entry: _entry["game"])
+
+        keep = self._retained(entries)
+        removed = [_entry for _entry in entries if _entry["game"] not in keep]
+        self.manifest = {"checkpoints": [_entry for _entry in entries
+                                         if _entry["game"] in keep]}
+
+        # The manifest is updated before the files are removed, so it never refers to missing files.
+        path = os.path.join(self.directory, "manifest.json")
+        with open(path + ".tmp", "w", encoding="UTF-8") as file:
+            json.dump(self.manifest, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+
+        for _entry in removed:
+            for name in (_entry["checkpoint"], _entry["weights"]):
+                if os.path.exists(os.path.join(self.directory, name)):
+                    os.remove(os.path.join(self.directory, name))
+
+        self._log("Checkpoint of game %s written to %s", game, self.directory)
+
+    def _retained(self, entries):
+        """Games of the `last` most recent checkpoints and of the `best` by `metric`."""
+        if self.parameter["last"] is None:
+            return {entry["game"] for entry in entries}
+
+        keep = {entry["game"] for entry in entries[len(entries) - self.parameter["last"]:]}
+
+        metric = self.parameter["metric"]
+        ranked = sorted((entry for entry in entries if entry["metrics"].get(metric) is not None),
+                        key=lambda entry: entry["metrics"][metric], reverse=True)
+        keep.update(entry["game"] for entry in ranked[:self.parameter["best"]])
+
+        return keep
+
+    def _log(self, message, *arguments):
+        """Log if a logger is given."""
+        if self.logger is not None:
+            self.logger.info(message, *arguments)
+
+
+def load_weights(module, path, assign=False):
+    """
+    Load weights (e.g. `weights-{game}.pth`) into a module, without reading the file up front.
+
+    The file is memory-mapped and unpickled with `weights_only=True`, so the tensors are paged in
+    from the file (or page cache) when they are first read, and no executable objects are
+    unpickled. With `assign`, the mapped tensors replace the parameters of a module on the CPU
+    without an extra copy.
+
+    Parameters
+    ----------
+    module : torch.nn.Module
+    path : str
+    assign : bool, optional
+        Assign the loaded tensors instead of copying them into the existing parameters. Only for
+        inference (e.g. evaluation), as an optimizer would still refer to the replaced
+        parameters. Ignored for modules on a GPU, where the tensors are copied to the device
+        anyway.
+
+    Returns
+    -------
+    torch.nn.Module
+    """
+    device = torch.device(getattr(module, "device", "cpu"))
+    try:
+        state = torch.load(path, map_location="cpu", mmap=True, weights_only=True)
+    except RuntimeError:
+        # Files in the legacy (non-zip) serialization format cannot be memory-mapped.
+        state = torch.load(path, map_location="cpu", weights_only=True)
+
+    module.load_state_dict(state, assign=assign and device.type == "cpu")
+    return module
+
+
+def _load(state, agent, target, environment):
+    """Load a full checkpoint into the agent, target network and random number generators."""
+    device = getattr(agent, "device", "cpu")
+
+    agent.load_state_dict(state["agent"])
+    if target is not None and state["target"] is not None:
+        target.load_state_dict(state["target"])
+
+    # The optimizer's state is moved to the device of the parameters by `load_state_dict`.
+    agent.parameter["optimizer"].load_state_dict(state["optimizer"])
+    agent.parameter["rate"] = state["rate"]
+
+    random.setstate(state["random"]["python"])
+    np.random.set_state(state["random"]["numpy"])
+    torch.set_rng_state(state["random"]["torch"])
+    if torch.cuda.is_available() and state["random"]["cuda"]:
+        torch.cuda.set_rng_state_all(state["random"]["cuda"])
+    if environment is not None and state["random"]["environment"] is not None:
+        environment.unwrapped.np_random.bit_generator.state = state["random"]["environment"]
+
+    agent.to(device)
+
+
+def _read(path):
+    """The manifest at `path`; empty if it does not exist."""
+    if not os.path.exists(path):
+        return {"checkpoints": []}
+    with open(path, encoding="UTF-8") as file:
+        return json.load(file)
+
+
+def _hash(path):
+    """SHA-256 of a file."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(2 ** 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cpu(obj):
+    """Copy the tensors of a (nested) state to CPU memory."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to("cpu", copy=True)
+    if isinstance(obj, dict):
+        return {key: _cpu(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_cpu(value) for value in obj)
+    return obj
+
+
+def _atomic(obj, path):
+    """
+    Save to a temporary file, flushed to disk, which then replaces `path`.
+
+    Returns
+    -------
+    str
+        SHA-256 of the file.
+    """
+    buffer = io.BytesIO()
+    torch.save(obj, buffer)
+    data = buffer.getbuffer()
+
+    with open(path + ".tmp", "wb") as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(path + ".tmp", path)
+
+    return hashlib.sha256(data).hexdigest()
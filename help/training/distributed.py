@@ -0,0 +1,186 @@
+"""Data-parallel training of `VisionDeepQ` over processes, with `torch.distributed` (gloo)."""
+
+import os
+import sys
+import socket
+import signal
+import multiprocessing
+
+import torch
+import torch.distributed as dist
+
+
+class Distributed:
+    """The process group of a data-parallel run; a no-op for a single process."""
+    def __init__(self, rank=None, world=None, address="env://"):
+        """
+        The process group of a data-parallel run; a no-op for a single process.
+
+        Each rank plays its own environments and keeps its own replay memory (a shard), and
+        learns from its own minibatches. The gradients are averaged over the ranks before each
+        optimizer step (see `wrap`), so that the agents of all ranks stay identical; the
+        effective minibatch is thereby `minibatch * world`.
+
+        The ranks must make the same collective calls in the same order; each rank plays the
+        same number of games, and the ranks agree after each game (see `any`) on whether to
+        start training and whether to stop (e.g. when one of them is preempted).
+
+        Parameters
+        ----------
+        rank : int, optional
+            Defaults to `RANK` of the environment (e.g. set by `torchrun`), or 0.
+        world : int, optional
+            Number of ranks; defaults to `WORLD_SIZE` of the environment, or 1.
+        address : str, optional
+            `init_method` of `torch.distributed.init_process_group`, e.g. "tcp://host:port".
+            The default reads `MASTER_ADDR` and `MASTER_PORT` of the environment.
+        """
+        self.rank = int(os.environ.get("RANK", 0)) if rank is None else rank
+        self.world = int(os.environ.get("WORLD_SIZE", 1)) if world is None else world
+        self.buffer = None
+
+        if self.world > 1:
+            dist.init_process_group("gloo", init_method=address,
+                                    rank=self.rank, world_size=self.world)
+
+    def broadcast(self, module):
+        """Copy the parameters and buffers of rank 0 to the module of every rank."""
+        if self.world == 1:
+            return
+        with torch.no_grad():
+            for tensor in module.state_dict().values():
+                dist.broadcast(tensor, src=0)
+
+    def wrap(self, agent):
+        """
+        Average the gradients of the agent over the ranks before each optimizer step.
+
+        The gradients are all-reduced as a single (flattened) tensor, after the clamping of
+        `VisionDeepQ.learn`.
+
+        Parameters
+        ----------
+        agent : VisionDeepQ
+        """
+        if self.world == 1:
+            return
+
+        optimizer = agent.parameter["optimizer"]
+        step = optimizer.step
+        parameters = [parameter for parameter in agent.parameters() if parameter.requires_grad]
+
+        def _step(*arguments, **other):
+            gradients = [parameter.grad for parameter in parameters]
+            if self.buffer is None:
+                self.buffer = torch.empty(sum(gradient.numel() for gradient in gradients),
+                                          dtype=gradients[0].dtype, device=gradients[0].device)
+            torch.cat([gradient.reshape(-1) for gradient in gradients], out=self.buffer)
+
+            dist.all_reduce(self.buffer)
+            self.buffer.div_(self.world)
+
+            offset = 0
+            for gradient in gradients:
+                gradient.copy_(self.buffer[offset:offset + gradient.numel()].view_as(gradient))
+                offset += gradient.numel()
+
+            return step(*arguments, **other)
+
+        optimizer.step = _step
+
+    def any(self, *flags):
+        """
+        Whether any rank raised each of the flags.
+
+        Parameters
+        ----------
+        flags : bool
+
+        Returns
+        -------
+        tuple of bool
+        """
+        if self.world == 1:
+            return tuple(bool(flag) for flag in flags)
+        tensor = torch.tensor([float(flag) for flag in flags])
+        dist.all_reduce(tensor, op=dist.ReduceOp.MAX)
+        return tuple(bool(flag) for flag in tensor.tolist())
+
+    def sum(self, *values):
+        """
+        The sum of each of the values over the ranks.
+
+        Parameters
+        ----------
+        values : float
+
+        Returns
+        -------
+        tuple of float
+        """
+        if self.world == 1:
+            return values
+        tensor = torch.tensor(values, dtype=torch.float64)
+        dist.all_reduce(tensor)
+        return tuple(tensor.tolist())
+
+    def close(self):
+        """Leave the process group."""
+        if self.world > 1 and dist.is_initialized():
+            dist.destroy_process_group()
+
+
+def launch(function, ranks, *arguments):
+    """
+    Run `function(distributed, *arguments)` in `ranks` local processes, as a data-parallel run.
+
+    `SIGTERM` and `SIGUSR2` are forwarded to the ranks (see `help.training.preemption`).
+
+    Parameters
+    ----------
+    function : callable
+        Module-level function (it is pickled), returning the exit status of the rank.
+    ranks : int
+    arguments
+        Additional (picklable) arguments of `function`.
+
+    Returns
+    -------
+    int
+        The highest exit status of the ranks.
+    """
+    with socket.socket() as _socket:
+        _socket.bind(("127.0.0.1", 0))
+        address = f"tcp://127.0.0.1:{_socket.getsockname()[1]}"
+
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=_rank, args=(function, rank, ranks, address, arguments))
+                 for rank in range(ranks)]
+    for process in processes:
+        process.start()
+
+    def _forward(signum, _):
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signum)
+
+    previous = {signum: signal.signal(signum, _forward)
+                for signum in (signal.SIGTERM, signal.SIGUSR2)}
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+
+    return max(process.exitcode for process in processes)
+
+
+def _rank(function, rank, world, address, arguments):
+    """A process of `launch`."""
+    distributed = Distributed(rank, world, address)
+    try:
+        status = function(distributed, *arguments)
+    finally:
+        distributed.close()
+    sys.exit(status)
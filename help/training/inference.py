@@ -0,0 +1,339 @@
+"""Batched action selection for many actor processes, by a separate inference process."""
+
+import math
+import time
+from collections import deque
+from multiprocessing import get_context, shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+import torch
+
+from help.training import train
+from help.training.shared import attach
+
+# Alignment (bytes) of the tensors within the shared memory block.
+_ALIGN = 64
+
+
+class InferenceServer:
+    """A process holding the policy, that answers the action requests of many actors in batches."""
+    def __init__(self, agent, config, actors=1, batch=None, latency=0.002, **other):
+        """
+        A process holding the policy, that answers the action requests of many actors in batches.
+
+        Each actor selects its greedy actions through its own `Client` instead of its own copy of
+        the agent. The client writes the state to its slot of a `multiprocessing.shared_memory`
+        block and signals the server through a pipe. The server collects requests until `batch`
+        are pending, or until `latency` seconds have passed since the first one, then selects the
+        actions of all pending states with a single forward pass and replies through the pipes.
+
+        The weights are kept in the same block, and published by the learner (see `publish`).
+        The server loads the most recently published weights before each forward pass, without
+        restarting. A version counter guards against reading partly written weights (a seqlock:
+        odd while they are being written).
+
+        Usage (learner):
+
+            server = InferenceServer(agent, config, actors=16, batch=16)
+            # Start the actors, passing `server.clients[i]` to actor `i`.
+            ...
+            server.publish(agent)  # e.g. after each `agent.learn`.
+            ...
+            statistics = server.close()  # After the actors have stopped.
+
+        Parameters
+        ----------
+        agent : VisionDeepQ
+            Of the learner; its shape and (initial) weights.
+        config : dict
+            See `help.training.train.configuration`; the server builds its own agent from it.
+        actors : int, optional
+            Number of clients.
+        batch : int, optional
+            Largest number of states per forward pass; defaults to `actors`.
+        latency : float, optional
+            Seconds to wait for more requests after the first pending one.
+        other
+            Additional parameters.
+
+            threads : int, optional
+                `torch.set_num_threads` of the server; defaults to 1.
+        """
+        layout = [("state", torch.float32, (actors, *agent.shape["reshape"][1:])),
+                  ("version", torch.int64, (1,))]
+        layout += [(f"weights.{name}", tensor.dtype, tuple(tensor.shape))
+                   for name, tensor in agent.state_dict().items()]
+        size = sum(_size(dtype, shape) for _, dtype, shape in layout)
+
+        self.memory = shared_memory.SharedMemory(create=True, size=size)
+        self.spec = {"name": self.memory.name, "layout": layout,
+                     "outputs": config["network"]["outputs"]}
+        self.tensors = _tensors(self.memory, layout)
+        self.publish(agent)
+
+        context = get_context("spawn")
+        pipes = [context.Pipe() for _ in range(actors)]
+        self.control, control = context.Pipe()
+        self.clients = [Client(pipe[0], self.spec, actor) for actor, pipe in enumerate(pipes)]
+
+        self.process = context.Process(
+            target=_serve, daemon=True,
+            args=(config, self.spec, [pipe[1] for pipe in pipes], control,
+                  {"batch": batch or actors, "latency": latency,
+                   "threads": other.get("threads", 1)}),
+        )
+        self.process.start()
+        for pipe in pipes:
+            pipe[1].close()
+        control.close()
+
+    def publish(self, agent):
+        """
+        Publish the weights of the agent; the server uses them from its next forward pass.
+
+        Parameters
+        ----------
+        agent : VisionDeepQ
+        """
+        version = self.tensors["version"]
+        version += 1
+        with torch.no_grad():
+            for name, tensor in agent.state_dict().items():
+                self.tensors[f"weights.{name}"].copy_(tensor)
+        version += 1
+
+    def close(self):
+        """
+        Stop the server, and remove the shared memory block. The actors must have stopped.
+
+        Returns
+        -------
+        dict
+            Number of `requests`, `batches` (forward passes) and `updates` (published weights
+            loaded, including the initial) of the server, and the `seconds` it ran.
+        """
+        self.control.send("stop")
+        statistics = self.control.recv()
+        self.process.join()
+        self.control.close()
+
+        self.tensors = {}
+        self.memory.close()
+        self.memory.unlink()
+        return statistics
+
+
+class Client:
+    """The connection of an actor to an `InferenceServer`."""
+    def __init__(self, connection, spec, actor):
+        """
+        The connection of an actor to an `InferenceServer`.
+
+        Passed to the actor process as an argument of `multiprocessing.Process`; it attaches to
+        the shared memory when first used (see `help.training.shared.attach`).
+
+        Parameters
+        ----------
+        connection : multiprocessing.connection.Connection
+        spec : dict
+            `InferenceServer.spec`.
+        actor : int
+            The slot of the client.
+        """
+        self.connection = connection
+        self.spec = spec
+        self.actor = actor
+
+        self.memory = None
+        self.tensors = {}
+        # Seconds from each request until its reply.
+        self.latencies = deque(maxlen=2 ** 16)
+
+    def __getstate__(self):
+        return {"connection": self.connection, "spec": self.spec, "actor": self.actor}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def action(self, state, rate=0.0):
+        """
+        Greedy action selection by the server, with stochastic exploration.
+
+        Usage (actor):
+
+            action, states, rewards, done = agent.observe(
+                environment, states, skip, action=client.action(states, rate)
+            )
+
+        Parameters
+        ----------
+        state : torch.Tensor
+            Observed (stacked) state, of `agent.shape["reshape"]`.
+        rate : float, optional
+            Probability of a random action, selected without a request.
+
+        Returns
+        -------
+        action : torch.Tensor
+            Selected action.
+
+        Raises
+        ------
+        EOFError
+            If the server has stopped.
+        """
+        if np.random.rand() < rate:
+            return torch.tensor([np.random.randint(self.spec["outputs"])], dtype=torch.long)
+
+        if self.memory is None:
+            self.memory = attach(self.spec["name"])
+            self.tensors = _tensors(self.memory, self.spec["layout"])
+
+        start = time.perf_counter()
+        self.tensors["state"][self.actor] = state.reshape(self.tensors["state"].shape[1:])
+        self.connection.send_bytes(b"")
+        action = self.connection.recv()
+        self.latencies.append(time.perf_counter() - start)
+
+        return torch.tensor([action], dtype=torch.long)
+
+    def close(self):
+        """Detach from the server."""
+        self.tensors = {}
+        if self.memory is not None:
+            self.memory.close()
+        self.connection.close()
+
+
+def _size(dtype, shape):
+    """Bytes of a tensor within the shared memory block, aligned."""
+    return math.ceil(torch.empty((), dtype=dtype).element_size() * math.prod(shape)
+                     / _ALIGN) * _ALIGN
+
+
+def _tensors(memory, layout):
+    """Tensors of the layout, as views of the shared memory block."""
+    tensors, offset = {}, 0
+    for name, dtype, shape in layout:
+        tensors[name] = torch.frombuffer(memory.buf, dtype=dtype, count=math.prod(shape),
+                                         offset=offset).view(shape)
+        offset += _size(dtype, shape)
+    return tensors
+
+
+def _reload(policy, tensors, loaded):
+    """Load the published weights into the policy if they changed; their version."""
+    version = int(tensors["version"])
+    if version == loaded or version % 2:
+        return loaded
+
+    state = {name[len("weights."):]: tensor.clone()
+             for name, tensor in tensors.items() if name.startswith("weights.")}
+    if int(tensors["version"]) != version:
+        # Published again while being copied; loaded before the next forward pass instead.
+        return loaded
+
+    policy.load_state_dict(state)
+    return version
+
+
+def _collect(control, idle, actors, batch, latency):
+    """
+    The pending requests; until `batch` are pending, or `latency` seconds after the first.
+
+    Parameters
+    ----------
+    control : multiprocessing.connection.Connection
+    idle : dict
+        Connections of the clients without a pending request, by actor; the pending are removed.
+    actors : dict
+        Actor of each connection.
+    batch : int
+    latency : float
+
+    Returns
+    -------
+    pending : list of int
+        Actors with a pending request.
+    stop : bool
+        Whether the server was stopped.
+    """
+    pending, deadline = [], None
+    while len(pending) < batch:
+        timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+        ready = wait([control, *idle.values()], timeout)
+        if not ready:
+            break
+
+        # Requests that arrived along with the stop are answered as well.
+        stop = control in ready
+        clients = [connection for connection in ready if connection is not control]
+        for connection in clients if stop else clients[:batch - len(pending)]:
+            actor = actors[connection]
+            del idle[actor]
+            try:
+                connection.recv_bytes()
+            except EOFError:
+                # The actor has stopped.
+                continue
+            pending.append(actor)
+
+        if stop:
+            control.recv()
+            return pending, True
+        if deadline is None and pending:
+            deadline = time.perf_counter() + latency
+
+    return pending, False
+
+
+def _serve(config, spec, connections, control, options):
+    """The process of `InferenceServer`; answers the requests until stopped."""
+    torch.set_num_threads(options["threads"])
+    policy = train.agent(config)
+    policy.eval()
+
+    memory = attach(spec["name"])
+    tensors = _tensors(memory, spec["layout"])
+
+    # The initial weights are loaded before the first request, waiting while being published.
+    loaded = _reload(policy, tensors, -1)
+    while loaded < 0:
+        time.sleep(0.001)
+        loaded = _reload(policy, tensors, -1)
+
+    statistics = {"requests": 0, "batches": 0, "updates": 1}
+    start = time.perf_counter()
+
+    # Each client has at most one pending request; the others are waited for.
+    idle = dict(enumerate(connections))
+    actors = {connection: actor for actor, connection in idle.items()}
+    stop = False
+    while not stop:
+        pending, stop = _collect(control, idle, actors, options["batch"], options["latency"])
+        if not pending:
+            continue
+
+        version = _reload(policy, tensors, loaded)
+        statistics["updates"] += version != loaded
+        loaded = version
+
+        with torch.no_grad():
+            actions = policy(tensors["state"][torch.tensor(pending)]).argmax(1).tolist()
+        for actor, action in zip(pending, actions):
+            connections[actor].send(action)
+            idle[actor] = connections[actor]
+
+        statistics["requests"] += len(pending)
+        statistics["batches"] += 1
+
+    statistics["seconds"] = time.perf_counter() - start
+    control.send(statistics)
+
+    # Any later request fails (`EOFError`) rather than waiting for a reply.
+    for connection in connections:
+        connection.close()
+
+    tensors = {}
+    memory.close()
@@ -0,0 +1,235 @@
+"""Memory accounting of training runs; replay size, live tensors, allocator and resident memory."""
+
+import gc
+import os
+import sys
+import warnings
+import resource
+
+import numpy as np
+import torch
+
+
+def replay(memory):
+    """
+    Bytes of the replay memory of an agent, by component.
+
+    Parameters
+    ----------
+    memory : collections.deque
+        Memorized games, e.g. `agent.memory["memory"]` of `VisionDeepQ`; named tuples of
+        (lists of) tensors, and integers.
+
+    Returns
+    -------
+    dict
+        Bytes per (tensor) component (e.g. "state", "action", "reward"), and the number of games.
+    """
+    components = {"games": len(memory)}
+    for game in list(memory):
+        for name, value in game._asdict().items():
+            if isinstance(value, (int, float)):
+                continue
+            components[name] = components.get(name, 0) + _bytes(value)
+    return components
+
+
+def _bytes(value):
+    """Bytes of the elements of a tensor, or a list or tuple of tensors."""
+    if isinstance(value, torch.Tensor):
+        return value.element_size() * value.nelement()
+    if isinstance(value, (list, tuple)):
+        return sum(_bytes(item) for item in value)
+    return 0
+
+
+def tensors():
+    """
+    Live tensors, as tracked by the garbage collector.
+
+    Returns
+    -------
+    dict
+        The number of tensors and the bytes of their elements, per device.
+    """
+    live = {}
+    with warnings.catch_warnings():
+        # Inspecting some (deprecated) objects warns, e.g. `torch.distributed.reduce_op`.
+        warnings.simplefilter("ignore")
+        objects = [obj for obj in gc.get_objects() if _tensor(obj)]
+
+    for obj in objects:
+        device = live.setdefault(str(obj.device), {"tensors": 0, "bytes": 0})
+        device["tensors"] += 1
+        device["bytes"] += obj.element_size() * obj.nelement()
+    return live
+
+
+def _tensor(obj):
+    """Whether an object is a tensor; dead weak proxies are not."""
+    try:
+        return isinstance(obj, torch.Tensor)
+    except ReferenceError:
+        return False
+
+
+def allocator():
+    """
+    Statistics of the CUDA caching allocator; empty when CUDA is unavailable.
+
+    Returns
+    -------
+    dict
+        Allocated, reserved and peak allocated bytes, and the number of allocation retries (which
+        indicate fragmentation).
+    """
+    if not torch.cuda.is_available():
+        return {}
+    stats = torch.cuda.memory_stats()
+    return {
+        "allocated": torch.cuda.memory_allocated(),
+        "reserved": torch.cuda.memory_reserved(),
+        "peak": torch.cuda.max_memory_allocated(),
+        "retries": stats.get("num_alloc_retries", 0),
+    }
+
+
+def rss():
+    """
+    Resident memory of the process in bytes.
+
+    The current value is read from `/proc` on Linux; elsewhere, the peak is returned.
+
+    Returns
+    -------
+    int
+    """
+    try:
+        with open("/proc/self/statm", encoding="UTF-8") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Telemetry:
+    """Periodic memory reports, and detection of steadily growing memory."""
+    def __init__(self, logger=None, enabled=True, live=True):
+        """
+        Periodic memory reports, and detection of steadily growing memory.
+
+        Parameters
+        ----------
+        logger : logging.Logger, optional
+        enabled : bool, optional
+        live : bool, optional
+            Whether to count the live tensors; walks every object tracked by the garbage
+            collector, i.e. about a second for large heaps.
+        """
+        self.logger = logger
+        self.enabled = enabled
+        self.live = live
+        self.samples = []
+
+    def sample(self, memory=None):
+        """
+        Measure the memory of the process.
+
+        Parameters
+        ----------
+        memory : collections.deque, optional
+            Replay memory of the agent (see `replay`).
+
+        Returns
+        -------
+        dict
+            With keys "rss", "replay", "tensors" and "allocator".
+        """
+        return {
+            "rss": rss(),
+            "replay": replay(memory) if memory is not None else {},
+            "tensors": tensors() if self.live else {},
+            "allocator": allocator(),
+        }
+
+    def report(self, memory=None):
+        """
+        Measure and log the memory of the process, and keep the sample for `growth`.
+
+        Parameters
+        ----------
+        memory : collections.deque, optional
+            Replay memory of the agent (see `replay`).
+
+        Returns
+        -------
+        dict or None
+            The sample (see `sample`), or None if disabled.
+        """
+        if not self.enabled:
+            return None
+
+        sample = self.sample(memory)
+        self.samples.append(sample)
+
+        if self.logger is not None:
+            self.logger.info(" > Memory: RSS %.1f MB", sample["rss"] / 2 ** 20)
+            if sample["replay"]:
+                self.logger.info("   replay %s games; %s", sample["replay"]["games"],
+                                 ", ".join(f"{name} {size / 2 ** 20:.1f} MB"
+                                           for name, size in sample["replay"].items()
+                                           if name != "games"))
+            for device, live in sample["tensors"].items():
+                self.logger.info("   tensors (%s) %d; %.1f MB",
+                                 device, live["tensors"], live["bytes"] / 2 ** 20)
+            if sample["allocator"]:
+                self.logger.info("   allocator %s",
+                                 ", ".join(f"{name} {value / 2 ** 20:.1f} MB"
+                                           if name != "retries" else f"{name} {value}"
+                                           for name, value in sample["allocator"].items()))
+
+        return sample
+
+    def series(self, key):
+        """
+        A measurement across the samples.
+
+        Parameters
+        ----------
+        key : str
+            "rss", "tensors" (live tensors on all devices), or "allocated" (CUDA).
+
+        Returns
+        -------
+        numpy.ndarray
+        """
+        values = {
+            "rss": lambda sample: sample["rss"],
+            "tensors": lambda sample: sum(live["tensors"] for live in sample["tensors"].values()),
+            "allocated": lambda sample: sample["allocator"].get("allocated", 0),
+        }[key]
+        return np.array([values(sample) for sample in self.samples], dtype=np.float64)
+
+    def growth(self, key, start=0.5):
+        """
+        Fitted (least squares) growth of a measurement over the latter samples.
+
+        Parameters
+        ----------
+        key : str
+            See `series`.
+        start : float, optional
+            Fraction of the samples skipped, e.g. while the replay memory fills up.
+
+        Returns
+        -------
+        float
+            Increase of the fitted line from the first to the last of the latter samples; zero
+            for fewer than three samples.
+        """
+        values = self.series(key)
+        values = values[int(len(values) * start):]
+        if len(values) < 3:
+            return 0.0
+        slope = np.polyfit(np.arange(len(values)), values, 1)[0]
+        return float(slope * (len(values) - 1))
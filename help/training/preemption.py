@@ -0,0 +1,55 @@
+"""Graceful stopping of training jobs on preemption (e.g. the Slurm time limit)."""
+
+import signal
+import threading
+
+# Exit status of a preempted run; `help/orion-hpc/train.sh` requeues the job on this status.
+REQUEUE = 3
+
+
+class Preemption:
+    """Records termination signals, for the training loop to stop gracefully."""
+    def __init__(self, signals=(signal.SIGTERM, signal.SIGUSR2), logger=None):
+        """
+        Records termination signals, for the training loop to stop gracefully.
+
+        The handlers only set a flag; the training loop checks `requested` after each game, and
+        then checkpoints, flushes the metrics and exits with `status` (see `REQUEUE`). Further
+        signals are ignored, as Slurm may deliver the same signal to both the job script and the
+        Python process.
+
+        `SIGUSR1` starts profiling (see `help.training.profiling`), hence the default warning
+        signal of `help/orion-hpc/train.sh` is `SIGUSR2`. The handlers replace those installed
+        before, e.g. the `SIGTERM` handler of `help.training.sink.Sink`.
+
+        Parameters
+        ----------
+        signals : tuple of int, optional
+        logger : logging.Logger, optional
+        """
+        self.logger = logger
+        self.parameter = {"signal": None}
+
+        if threading.current_thread() is threading.main_thread():
+            for signum in signals:
+                signal.signal(signum, self._request)
+
+    @property
+    def requested(self):
+        """Whether a termination signal has been received."""
+        return self.parameter["signal"] is not None
+
+    @property
+    def status(self):
+        """Exit status; `REQUEUE` if a termination signal has been received, otherwise zero."""
+        return REQUEUE if self.requested else 0
+
+    def _request(self, signum, _):
+        """Signal handler; record the (first) signal."""
+        if self.requested:
+            return
+        self.parameter["signal"] = signum
+
+        if self.logger is not None:
+            self.logger.warning("Received %s; stopping after the current game",
+                                signal.Signals(signum).name)
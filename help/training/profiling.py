@@ -0,0 +1,146 @@
+"""On-demand `torch.profiler` windows of training loops."""
+
+import os
+import signal
+import contextlib
+import threading
+
+import torch
+from torch.profiler import ProfilerActivity, profile, record_function
+
+_UNPROFILED = contextlib.nullcontext()
+
+
+class Profiler:
+    """Profiles windows of games with `torch.profiler`."""
+    def __init__(self, windows=(), directory="./output", **other):
+        """
+        Profiles windows of games with `torch.profiler`.
+
+        A window starts at the beginning of a game (see `step`), either because the game is
+        within one of the configured `windows`, or because the process received `SIGUSR1` (e.g.
+        `kill -USR1 <pid>` on the node). At the end of a window, a Chrome trace
+        (`trace-{first}-{last}.json`, open with `chrome://tracing` or https://ui.perfetto.dev)
+        and a summary of the most expensive operators (`profile-{first}-{last}.txt`) are written
+        to `directory`.
+
+        Parameters
+        ----------
+        windows : list of tuple of int, optional
+            Games to profile, e.g. `[(1000, 1010)]` for games 1000 to 1010 (inclusive).
+        directory : str, optional
+            Where the traces and summaries are written.
+        other
+            Additional parameters.
+
+            games : int, optional
+                Number of games profiled after a signal.
+            signal : int or None, optional
+                Signal that starts a window; `None` disables signalling. Defaults to `SIGUSR1`.
+            rows : int, optional
+                Number of operators in the summary.
+            logger : logging.Logger, optional
+        """
+        self.windows = [tuple(window) for window in windows]
+        self.directory = directory
+        self.parameter = {
+            "games": other.get("games", 10),
+            "rows": other.get("rows", 30),
+            "logger": other.get("logger"),
+            "requested": False,
+        }
+        self.state = {"profile": None, "first": None, "last": None, "game": None}
+
+        signum = other.get("signal", signal.SIGUSR1)
+        if signum is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signum, self._request)
+
+    @property
+    def active(self):
+        """Whether a window is being profiled."""
+        return self.state["profile"] is not None
+
+    def step(self, game):
+        """
+        Start or stop profiling at the beginning of a game.
+
+        Parameters
+        ----------
+        game : int
+            Number of the game about to be played.
+        """
+        self.state["game"] = game
+
+        if self.active and game > self.state["last"]:
+            self.stop()
+
+        if not self.active:
+            window = next((window for window in self.windows if window[0] <= game <= window[1]),
+                          None)
+            if window is None and self.parameter["requested"]:
+                window = (game, game + self.parameter["games"] - 1)
+            if window is not None:
+                self.parameter["requested"] = False
+                self._start(game, window[1])
+
+    def record(self, name):
+        """
+        Label a region (e.g. "observe" or "learn") in the trace.
+
+        Parameters
+        ----------
+        name : str
+
+        Returns
+        -------
+        context manager
+            A no-op when no window is being profiled.
+        """
+        return record_function(name) if self.active else _UNPROFILED
+
+    def stop(self):
+        """Stop profiling, and write the trace and summary."""
+        if not self.active:
+            return
+
+        profiler, first, last = (self.state[key] for key in ["profile", "first", "last"])
+        last = min(last, self.state["game"])
+        self.state["profile"] = None
+        profiler.stop()
+
+        os.makedirs(self.directory, exist_ok=True)
+        trace = os.path.join(self.directory, f"trace-{first}-{last}.json")
+        profiler.export_chrome_trace(trace)
+
+        sort = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+        summary = os.path.join(self.directory, f"profile-{first}-{last}.txt")
+        with open(summary, "w", encoding="UTF-8") as file:
+            file.write(profiler.key_averages().table(sort_by=sort,
+                                                     row_limit=self.parameter["rows"]))
+
+        self._log("Profile of games %s-%s written to %s and %s", first, last, trace, summary)
+
+    def close(self):
+        """Stop profiling (e.g. when training ends within a window)."""
+        self.stop()
+
+    def _start(self, game, last):
+        """Start profiling games `game` to `last`."""
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+
+        profiler = profile(activities=activities)
+        profiler.start()
+        self.state.update(profile=profiler, first=game, last=last)
+
+        self._log("Profiling games %s-%s", game, last)
+
+    def _request(self, *_):
+        """Signal handler; profile the following games."""
+        self.parameter["requested"] = True
+
+    def _log(self, message, *arguments):
+        """Log if a logger is given."""
+        if self.parameter["logger"] is not None:
+            self.parameter["logger"].info(message, *arguments)
@@ -0,0 +1,244 @@
+"""Incremental, compressed persistence of the replay memory of `VisionDeepQ`."""
+
+import os
+import json
+import queue
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+
+class Replay:
+    """Persists the replay memory of an agent as compressed chunks, on a background thread."""
+    def __init__(self, directory="./output/replay", logger=None, **other):
+        """
+        Persists the replay memory of an agent as compressed chunks, on a background thread.
+
+        Each `save` writes the games memorized since the previous one (in chunks of `games`),
+        and removes the chunks whose games have since been forgotten by the agent. The index of
+        the chunks, `replay.json`, is rewritten atomically after the chunks are written.
+
+        The states are stored as `uint8` (i.e., `round(255 * state)`), as the preprocessed
+        states of `VisionDeepQ` are within [0, 1]. This is lossless for binary states (tetris)
+        and exact to within 0.5 / 255 otherwise (area-interpolated states of breakout and enduro).
+
+        Parameters
+        ----------
+        directory : str, optional
+        logger : logging.Logger, optional
+        other
+            Additional parameters.
+
+            games : int, optional
+                Number of games per chunk.
+            level : int, optional
+                Compression level (zlib) of the chunks; 1 favours speed.
+            workers : int, optional
+                Number of chunks read in parallel by `restore`.
+        """
+        self.directory = directory
+        self.logger = logger
+        self.parameter = {
+            "games": other.get("games", 100),
+            "level": other.get("level", 1),
+            "workers": other.get("workers", min(8, os.cpu_count() or 1)),
+            "closed": False,
+            "errors": [],
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "replay.json")
+        if os.path.exists(path):
+            with open(path, encoding="UTF-8") as file:
+                index = json.load(file)
+        else:
+            index = {"games": 0, "chunks": []}
+
+        # The last game written; the games after it in the agent's memory are new.
+        self.state = {"index": index, "last": None}
+
+        self.queue = queue.Queue(maxsize=1)
+        self.thread = threading.Thread(target=self._write, daemon=True)
+        self.thread.start()
+
+    def save(self, agent, game=None):
+        """
+        Write the games memorized since the previous save, on the background thread.
+
+        Only references to the new games are taken on the calling thread.
+
+        Parameters
+        ----------
+        agent : VisionDeepQ
+        game : int, optional
+            Number of the last game played, for the index.
+        """
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+        memory = agent.memory["memory"]
+        new = []
+        for _game in reversed(memory):
+            if _game is self.state["last"]:
+                break
+            new.append(_game)
+        new.reverse()
+
+        if new:
+            self.state["last"] = new[-1]
+        self.queue.put((new, len(memory), game))
+
+    def wait(self):
+        """Block until the queued games are written."""
+        self.queue.join()
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+    def close(self):
+        """Write the queued games and stop the background thread."""
+        if self.parameter["closed"]:
+            return
+        self.parameter["closed"] = True
+
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+    def restore(self, agent):
+        """
+        Append the persisted games to the (empty) replay memory of the agent.
+
+        The chunks are read and decompressed in parallel. The actions are moved to the device of
+        the agent, as those selected by `VisionDeepQ.action`; the states and rewards are kept on
+        the CPU, as when played.
+
+        Parameters
+        ----------
+        agent : VisionDeepQ
+
+        Returns
+        -------
+        int
+            Number of games restored.
+        """
+        chunks = self.state["index"]["chunks"]
+        if not chunks:
+            return 0
+
+        with ThreadPoolExecutor(self.parameter["workers"]) as pool:
+            games = [game for _games in pool.map(
+                lambda chunk: _read(os.path.join(self.directory, chunk["file"]), agent.Memory,
+                                    agent.device),
+                chunks
+            ) for game in _games]
+
+        memory = agent.memory["memory"]
+        memory.extend(games)
+        self.state["last"] = memory[-1] if memory else None
+
+        if self.logger is not None:
+            self.logger.info("Replay memory of %s games restored from %s (game %s)",
+                             len(memory), self.directory, self.state["index"].get("game"))
+
+        return len(memory)
+
+    def _write(self):
+        """Background thread; write the queued games until closed."""
+        while True:
+            task = self.queue.get()
+            try:
+                if task is None:
+                    return
+                self._chunks(*task)
+            except (OSError, ValueError, RuntimeError) as error:
+                self.parameter["errors"].append(error)
+            finally:
+                self.queue.task_done()
+
+    def _chunks(self, new, length, game):
+        """Write the new games in chunks, update the index and remove forgotten chunks."""
+        index = self.state["index"]
+        chunks = list(index["chunks"])
+
+        for start in range(0, len(new), self.parameter["games"]):
+            games = new[start:start + self.parameter["games"]]
+            first = index["games"] + start + 1
+            last = first + len(games) - 1
+
+            name = f"chunk-{first}-{last}.npz"
+            _save(os.path.join(self.directory, name), _arrays(games), self.parameter["level"])
+            chunks.append({"file": name, "first": first, "last": last})
+
+        total = index["games"] + len(new)
+        # The agent's memory holds the `length` most recently written games.
+        removed = [chunk for chunk in chunks if chunk["last"] <= total - length]
+        chunks = [chunk for chunk in chunks if chunk["last"] > total - length]
+
+        self.state["index"] = {"games": total, "game": game, "chunks": chunks}
+
+        path = os.path.join(self.directory, "replay.json")
+        with open(path + ".tmp", "w", encoding="UTF-8") as file:
+            json.dump(self.state["index"], file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(path + ".tmp", path)
+
+        for chunk in removed:
+            if os.path.exists(os.path.join(self.directory, chunk["file"])):
+                os.remove(os.path.join(self.directory, chunk["file"]))
+
+        if self.logger is not None and new:
+            self.logger.info("Replay memory saved; %s new games, %s chunks",
+                             len(new), len(chunks))
+
+
+def _arrays(games):
+    """The games as flat arrays; states as `uint8`."""
+    def _frames(states):
+        return (states.cpu() * 255).round_().clamp_(0, 255).to(torch.uint8).numpy()
+
+    return {
+        "state": _frames(torch.cat([torch.cat(game.state) for game in games])),
+        "action": torch.cat([torch.stack(game.action) for game in games]).cpu().numpy(),
+        "reward": torch.cat([torch.stack(game.reward) for game in games]).cpu().numpy(),
+        "new_state": _frames(torch.cat([game.new_state for game in games])),
+        "steps": np.array([game.steps for game in games], dtype=np.int64),
+    }
+
+
+def _save(path, arrays, level):
+    """Write arrays to a compressed `.npz` file; through a temporary file that is then renamed."""
+    with zipfile.ZipFile(path + ".tmp", "w", compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=level) as archive:
+        for name, array in arrays.items():
+            with archive.open(f"{name}.npy", "w", force_zip64=True) as file:
+                np.lib.format.write_array(file, np.ascontiguousarray(array), allow_pickle=False)
+    os.replace(path + ".tmp", path)
+
+
+def _read(path, memory, device="cpu"):
+    """The games of a chunk, as `memory` (named tuples) of tensors; the actions on `device`."""
+    with np.load(path) as arrays:
+        states = torch.from_numpy(arrays["state"]).float().div_(255)
+        new_states = torch.from_numpy(arrays["new_state"]).float().div_(255)
+        actions = torch.from_numpy(arrays["action"]).to(device)
+        rewards = torch.from_numpy(arrays["reward"])
+        steps = np.asarray(arrays["steps"]).tolist()
+
+    games = []
+    offset = 0
+    for i, _steps in enumerate(steps):
+        games.append(memory(
+            states[offset:offset + _steps].split(1),
+            actions[offset:offset + _steps].unbind(),
+            rewards[offset:offset + _steps].unbind(),
+            new_states[i:i + 1],
+            _steps,
+        ))
+        offset += _steps
+    return games
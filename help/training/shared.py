@@ -0,0 +1,288 @@
+"""Replay memory in shared memory, written by several actor processes and read by a learner."""
+
+import sys
+import math
+from collections import deque
+from collections.abc import Sequence
+from multiprocessing import shared_memory
+
+import numpy as np
+import torch
+
+# Alignment (bytes) of the arrays within the shared memory block.
+_ALIGN = 64
+
+
+def attach(name):
+    """
+    Attach to an existing shared memory block, which only its creator unlinks.
+
+    Before Python 3.13, attaching registers the block with the resource tracker. Processes
+    spawned (or forked) by the creator share its tracker, for which this is a no-op; the block is
+    thereby still unlinked at exit if the creator fails to. Other processes would have the block
+    unlinked by their own tracker when they exit.
+
+    Parameters
+    ----------
+    name : str
+
+    Returns
+    -------
+    multiprocessing.shared_memory.SharedMemory
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(  # pylint: disable=unexpected-keyword-arg
+            name=name, track=False
+        )
+    return shared_memory.SharedMemory(name=name)
+
+
+class SharedReplay:
+    """Ring buffers of transitions in shared memory; one per actor process."""
+    def __init__(self, shape, capacity=2 ** 15, actors=1, **other):
+        """
+        Ring buffers of transitions in shared memory; one per actor process.
+
+        The states, actions, rewards and done flags are arrays in a single
+        `multiprocessing.shared_memory` block. Each actor writes to its own partition of
+        `capacity // actors` transitions, and then publishes them by advancing its cursor (the
+        number of transitions it has written). Each cursor thereby has a single writer, and no
+        locks are needed; the learner only reads the transitions before the cursors.
+
+        The learner samples complete games (see `games`) or transitions (see `sample`). The
+        games are views of the shared memory, and are read by `VisionDeepQ.learn` without a copy
+        (with `float32` states). A game is only sampled while at least `margin` transitions of
+        its partition remain to be written before it is overwritten.
+
+        The process that creates the buffer must `close` and `unlink` it; other processes
+        attach with `SharedReplay(**replay.spec)`, and `close` it (see `attach`).
+
+        Parameters
+        ----------
+        shape : tuple of int
+            Shape of a (stacked) state, e.g. `agent.shape["reshape"]`.
+        capacity : int, optional
+            Number of transitions, over all actors.
+        actors : int, optional
+            Number of partitions (writing processes).
+        other
+            Additional parameters.
+
+            dtype : str, optional
+                Of the states; "float32" (default) or "uint8" (`round(255 * state)`, a quarter of
+                the memory, but converted to `float32` when sampled).
+            margin : int, optional
+                Defaults to a quarter of a partition.
+            name : str, optional
+                Of the shared memory block to attach to; a new block is created if not given.
+        """
+        self.spec = {
+            "shape": tuple(shape), "capacity": capacity, "actors": actors,
+            "dtype": other.get("dtype", "float32"),
+            "margin": other.get("margin", capacity // actors // 4),
+        }
+        partition = capacity // actors
+        layout = [
+            ("state", self.spec["dtype"], (actors, partition, *shape)),
+            ("action", "int64", (actors, partition, 1)),
+            ("reward", "float32", (actors, partition)),
+            ("done", "uint8", (actors, partition)),
+            ("cursor", "int64", (actors,)),
+        ]
+        offsets, size = [], 0
+        for _, dtype, _shape in layout:
+            offsets.append(size)
+            size += math.ceil(np.dtype(dtype).itemsize * math.prod(_shape) / _ALIGN) * _ALIGN
+
+        if other.get("name") is None:
+            self.memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.memory = attach(other["name"])
+        self.spec["name"] = self.memory.name
+
+        self.arrays = {
+            name: np.ndarray(_shape, dtype=dtype, buffer=self.memory.buf, offset=offset)
+            for (name, dtype, _shape), offset in zip(layout, offsets)
+        }
+        self.tensors = {name: torch.from_numpy(array) for name, array in self.arrays.items()}
+
+        # Of the learner; the complete games of each partition (first and last transition, as
+        # cursor values), the first transition of the current games and the cursors up to which
+        # the done flags have been read.
+        self.state = {"games": [deque() for _ in range(actors)],
+                      "first": [0] * actors, "read": [0] * actors}
+
+    @property
+    def partition(self):
+        """Number of transitions per actor."""
+        return self.spec["capacity"] // self.spec["actors"]
+
+    def write(self, actor, state, action, reward, done):
+        """
+        Write a transition to the partition of an actor, and publish it.
+
+        Parameters
+        ----------
+        actor : int
+            Partition of the calling process; each partition must have a single writer.
+        state : torch.Tensor
+            Stacked state of the transition (before the action), of `shape`.
+        action : torch.Tensor or int
+        reward : float
+        done : bool
+            Whether the game ended with the transition.
+        """
+        cursor = int(self.arrays["cursor"][actor])
+        slot = cursor % self.partition
+
+        if self.spec["dtype"] == "uint8":
+            self.tensors["state"][actor, slot] = (state * 255).round_().clamp_(0, 255)
+        else:
+            self.tensors["state"][actor, slot] = state
+        self.arrays["action"][actor, slot, 0] = int(action)
+        self.arrays["reward"][actor, slot] = reward
+        self.arrays["done"][actor, slot] = done
+
+        # Published after the transition is written (an aligned 64-bit store).
+        self.arrays["cursor"][actor] = cursor + 1
+
+    def written(self):
+        """Number of transitions written by each actor."""
+        return self.arrays["cursor"].tolist()
+
+    def games(self, memory):
+        """
+        The complete games in the buffer, as a sequence of `memory` (named tuples) of views.
+
+        Usage (learner):
+
+            value_agent.memory["memory"] = replay.games(value_agent.Memory)
+            value_agent.learn(network=target)
+
+        The last state of a game also serves as its `new_state`, which `VisionDeepQ.learn`
+        does not use for the final transition (its target is the reward).
+
+        Parameters
+        ----------
+        memory : type
+            `VisionDeepQ.Memory`, i.e. a named tuple of (state, action, reward, new_state, steps).
+
+        Returns
+        -------
+        Games
+        """
+        self._scan()
+        return Games(self, memory, [(actor, first, last)
+                                    for actor, games in enumerate(self.state["games"])
+                                    for first, last in games])
+
+    def sample(self, batch, generator=None):
+        """
+        Uniformly sampled transitions; copies (gathered) of the states and new states (as
+        `float32`), actions, rewards and done flags.
+
+        This is a convenience for learners sampling transitions rather than games, and copies
+        the minibatch; `games` is the path without copies.
+
+        Parameters
+        ----------
+        batch : int
+        generator : numpy.random.Generator, optional
+
+        Returns
+        -------
+        dict of torch.Tensor
+            Keys "state", "action", "reward", "new_state" and "done". The new state of a final
+            transition (`done`) is zero, as its target is the reward.
+        """
+        generator = generator or np.random.default_rng()
+        cursors = np.asarray(self.written())
+        # The new state of a transition is in the next slot, which must have been written.
+        valid = np.minimum(cursors, self.partition - self.spec["margin"]) - 1
+        valid = np.maximum(valid, 0)
+        if valid.sum() <= 0:
+            raise ValueError("No complete transitions have been written")
+
+        actors = generator.choice(len(valid), size=batch, p=valid / valid.sum())
+        slots = (cursors[actors] - 2 - generator.integers(0, valid[actors])) % self.partition
+
+        actors, slots = torch.from_numpy(actors), torch.from_numpy(slots)
+        transitions = {name: self.tensors[name][actors, slots]
+                       for name in ("state", "action", "reward", "done")}
+        transitions["new_state"] = self.tensors["state"][actors, (slots + 1) % self.partition]
+        transitions["new_state"][transitions["done"].bool()] = 0
+        for name in ("state", "new_state"):
+            if transitions[name].dtype == torch.uint8:
+                transitions[name] = transitions[name].float().div_(255)
+        return transitions
+
+    def close(self):
+        """Detach from the shared memory; the arrays must no longer be used."""
+        self.arrays = self.tensors = {}
+        self.memory.close()
+
+    def unlink(self):
+        """Remove the shared memory block (by the creating process, after `close`)."""
+        self.memory.unlink()
+
+    def _scan(self):
+        """Record the games completed since the previous scan, and forget the overwritten."""
+        for actor, cursor in enumerate(self.written()):
+            games, first = self.state["games"][actor], self.state["first"][actor]
+            oldest = cursor - self.partition + self.spec["margin"]
+
+            # Games (partly) overwritten before they were read are skipped.
+            start = max(self.state["read"][actor], cursor - self.partition)
+            dones = self.arrays["done"][actor, np.arange(start, cursor) % self.partition]
+            for last in (start + np.flatnonzero(dones)).tolist():
+                if first >= oldest:
+                    games.append((first, last))
+                first = last + 1
+            self.state["first"][actor], self.state["read"][actor] = first, cursor
+
+            while games and games[0][0] < oldest:
+                games.popleft()
+
+
+class Games(Sequence):
+    """Complete games of a `SharedReplay`, as named tuples of views of the shared memory."""
+    def __init__(self, replay, memory, games):
+        """
+        Complete games of a `SharedReplay`, as named tuples of views of the shared memory.
+
+        Parameters
+        ----------
+        replay : SharedReplay
+        memory : type
+            Named tuple of (state, action, reward, new_state, steps).
+        games : list of tuple of int
+            Actor (partition), first and last transition (cursor values) of each game.
+        """
+        self.replay = replay
+        self.memory = memory
+        self.index = games
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        actor, first, last = self.index[i]
+        slots = np.arange(first, last + 1) % self.replay.partition
+        if slots[0] <= slots[-1]:
+            # Contiguous; views of the shared memory.
+            slots = slice(int(slots[0]), int(slots[-1]) + 1)
+        else:
+            slots = torch.from_numpy(slots)
+
+        tensors = self.replay.tensors
+        states = tensors["state"][actor, slots]
+        if states.dtype == torch.uint8:
+            states = states.float().div_(255)
+
+        return self.memory(
+            states.unbind(),
+            tensors["action"][actor, slots].unbind(),
+            tensors["reward"][actor, slots].unbind(),
+            states[-1],
+            last - first + 1,
+        )
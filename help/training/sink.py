@@ -0,0 +1,185 @@
+"""Buffered metrics writer; rows are written to disk in batches on a background thread."""
+
+import os
+import csv
+import signal
+import atexit
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class Sink:
+    """Buffered metrics writer."""
+    def __init__(self, path, columns, every=100, interval=30.0, **other):
+        """
+        Buffered metrics writer.
+
+        Rows are kept in memory and written by a background thread whenever `every` rows are
+        buffered or `interval` seconds have passed, whichever comes first. The file is thereby
+        opened once per batch instead of once per row. Buffered rows are written on `close`, at
+        interpreter exit and on `SIGTERM` (e.g. when a Slurm job is cancelled).
+
+        Parameters
+        ----------
+        path : str
+            The path of the metrics. A ".csv" file is written as text; any other path is a
+            directory with one binary (float64) file per column, `<path>/<column>.f64`, which is
+            read by `help.visualisation.metrics.load`.
+        columns : list of str
+            Names of the columns, e.g. `["game", "steps", "loss", "exploration", "reward"]`.
+            The file is created (or truncated) with these columns.
+        every : int, optional
+            Number of buffered rows that triggers a write.
+        interval : float, optional
+            Maximum number of seconds between writes.
+        other
+            Additional parameters.
+
+            append : bool, optional
+                Append to existing metrics instead of truncating them, e.g. when training is
+                resumed from a checkpoint.
+            game : int, optional
+                With `append`, the existing rows of this and later games (the first column) are
+                removed first, e.g. those written after the checkpoint that training is resumed
+                from. A partly written last row is removed as well.
+        """
+        self.path = path
+        self.columns = list(columns)
+        self.parameter = {
+            "every": every,
+            "interval": interval,
+            "rows": deque(),
+            "closed": False,
+            "errors": [],
+        }
+
+        if not (other.get("append", False) and os.path.exists(path)):
+            self._create()
+        elif other.get("game") is not None:
+            self._truncate(other["game"])
+
+        self.event = threading.Event()
+        self.thread = threading.Thread(target=self._flush, daemon=True)
+        self.thread.start()
+
+        atexit.register(self.close)
+        if threading.current_thread() is threading.main_thread():
+            self.parameter["signal"] = signal.signal(signal.SIGTERM, self._terminate)
+
+    def _create(self):
+        """Create (or truncate) the file(s), with the header of a ".csv" file."""
+        if self.csv:
+            with open(self.path, "w", newline="", encoding="UTF-8") as file:
+                csv.writer(file).writerow(self.columns)
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            for column in self.columns:
+                with open(os.path.join(self.path, f"{column}.f64"), "wb"):
+                    pass
+
+    def _truncate(self, game):
+        """Remove the rows of `game` and later; the rows are in the order of the games."""
+        if self.csv:
+            with open(self.path, "rb+") as file:
+                offset = len(file.readline())
+                for line in file:
+                    try:
+                        if not line.endswith(b"\n") or float(line.split(b",")[0]) >= game:
+                            break
+                    except ValueError:
+                        break
+                    offset += len(line)
+                file.truncate(offset)
+            return
+
+        paths = [os.path.join(self.path, f"{column}.f64") for column in self.columns]
+        games = np.fromfile(paths[0], dtype=np.float64)
+        later = np.flatnonzero(games >= game)
+        rows = min([later[0] if later.size else games.size]
+                   + [os.path.getsize(path) // 8 for path in paths])
+        for path in paths:
+            os.truncate(path, rows * 8)
+
+    @property
+    def csv(self):
+        """Whether the metrics are written as text."""
+        return self.path.lower().endswith(".csv")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def write(self, row):
+        """
+        Buffer a row; the row is written to disk later.
+
+        Parameters
+        ----------
+        row : list
+            One value per column. `None` is written as an empty field (".csv") or NaN.
+        """
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+        # Appending to (and popping from) a deque is thread-safe; no lock is needed, which also
+        # makes it safe to close the sink from a signal handler.
+        self.parameter["rows"].append(row)
+        if len(self.parameter["rows"]) >= self.parameter["every"]:
+            self.event.set()
+
+    def _write(self):
+        """Append the buffered rows to the file(s)."""
+        rows = []
+        while self.parameter["rows"]:
+            rows.append(self.parameter["rows"].popleft())
+        if not rows:
+            return
+
+        if self.csv:
+            with open(self.path, "a", newline="", encoding="UTF-8") as file:
+                csv.writer(file).writerows(rows)
+        else:
+            values = np.array([[np.nan if value is None else value for value in row]
+                               for row in rows], dtype=np.float64)
+            for i, column in enumerate(self.columns):
+                with open(os.path.join(self.path, f"{column}.f64"), "ab") as file:
+                    file.write(values[:, i].tobytes())
+
+    def close(self):
+        """Stop the background thread and write the remaining rows."""
+        if self.parameter["closed"]:
+            return
+        self.parameter["closed"] = True
+
+        self.event.set()
+        self.thread.join()
+        atexit.unregister(self.close)
+
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+    def _flush(self):
+        """Background thread; write the buffered rows by count or time until closed."""
+        try:
+            while not self.parameter["closed"]:
+                self.event.wait(self.parameter["interval"])
+                self.event.clear()
+                self._write()
+            self._write()
+        except (OSError, ValueError) as error:
+            self.parameter["errors"].append(error)
+
+    def _terminate(self, signum, frame):
+        """Write the buffered rows before the previous `SIGTERM` handler is called."""
+        self.close()
+
+        previous = self.parameter["signal"]
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            signal.signal(signum, previous or signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
@@ -0,0 +1,455 @@
+"""
+Hyperparameter sweeps of `help.training.train`, with successive halving or ASHA early stopping.
+
+Each trial is a training run with some settings overridden (e.g. `optimizer.lr`), written to its
+own directory. The trials run as local processes (each pinned to its own cores) or as Slurm jobs.
+Their metrics are read while they train. At each rung, i.e. after `min_games * eta ** k` games,
+the trials are compared by their average reward over the last `min_games` games, and only the
+best `1 / eta` continue:
+
+    asha : Trials run to `max_games`, and are stopped as soon as they fall below the best
+           `1 / eta` of the trials that reached the same rung before them (asynchronous).
+    halving : All trials play to the rung, and only the best `1 / eta` are resumed from their
+              checkpoint to the next rung (synchronous).
+
+The trials are ranked in `summary.json` and `summary.csv` of the sweep directory.
+
+Usage (from the root of the repository):
+
+    python -m help.training.sweep breakout/config.json --directory ./sweep \\
+        --space optimizer.lr=[0.0001,0.000065] --space minibatch=[32,64] \\
+        --space discount=[0.95,0.99] --space gamma=[0.99] --space reset_q_every=[5,10] \\
+        --workers 4 --min-games 1000 --max-games 27000 --eta 3 --scheduler asha
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import signal
+import argparse
+import itertools
+import functools
+import subprocess
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def trials(space, samples=None, seed=0):
+    """
+    The settings of each trial; the grid of `space`, or a random sample of it.
+
+    Parameters
+    ----------
+    space : dict
+        Values of each setting, e.g. `{"optimizer.lr": [0.0001, 0.000065], "minibatch": [32]}`.
+    samples : int, optional
+        Number of trials sampled (without replacement) from the grid.
+    seed : int, optional
+
+    Returns
+    -------
+    list of dict
+    """
+    keys = list(space)
+    grid = [dict(zip(keys, values)) for values in itertools.product(*space.values())]
+    if samples is not None and samples < len(grid):
+        grid = random.Random(seed).sample(grid, samples)
+    return grid
+
+
+class Local:
+    """Runs trials as local processes, each pinned to its own cores."""
+    def __init__(self, workers=1, cores=None):
+        """
+        Runs trials as local processes, each pinned to its own cores.
+
+        The cores available to this process are split into `workers` disjoint sets; a trial
+        is pinned to a free set (`os.sched_setaffinity`, before PyTorch starts its threads), and
+        uses as many PyTorch threads.
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of trials run at the same time.
+        cores : int, optional
+            Number of cores per trial; defaults to the available cores divided by `workers`.
+        """
+        available = sorted(os.sched_getaffinity(0))
+        cores = cores or max(1, len(available) // workers)
+        self.free = [{available[(i * cores + j) % len(available)] for j in range(cores)}
+                     for i in range(workers)]
+        self.processes = {}
+
+    @property
+    def slots(self):
+        """Number of trials that can be started."""
+        return len(self.free)
+
+    def start(self, name, command, directory):
+        """
+        Start a trial.
+
+        Parameters
+        ----------
+        name : str
+        command : list of str
+            The command, except for the number of threads (appended).
+        directory : str
+            Where the output of the process (`print.out`) is written.
+        """
+        cores = self.free.pop(0)
+        # The sweep is single-threaded, so `preexec_fn` is safe.
+        # pylint: disable=subprocess-popen-preexec-fn
+        with open(os.path.join(directory, "print.out"), "a", encoding="UTF-8") as output:
+            process = subprocess.Popen(  # pylint: disable=consider-using-with
+                [*command, "--threads", str(len(cores))], cwd=ROOT,
+                stdout=output, stderr=subprocess.STDOUT,
+                env={**os.environ, "OMP_NUM_THREADS": str(len(cores))},
+                # Pinned in the child, before it executes the command.
+                preexec_fn=functools.partial(os.sched_setaffinity, 0, cores),
+            )
+        self.processes[name] = (process, cores)
+
+    def poll(self, name):
+        """The exit status of a trial, or `None` if it is running."""
+        process, cores = self.processes[name]
+        status = process.poll()
+        if status is not None:
+            del self.processes[name]
+            self.free.append(cores)
+        return status
+
+    def stop(self, name):
+        """Stop a trial gracefully (`SIGTERM`; see `help.training.preemption`)."""
+        self.processes[name][0].send_signal(signal.SIGTERM)
+
+
+class Slurm:
+    """Runs trials as Slurm jobs (`sbatch`)."""
+    def __init__(self, workers=1, cores=None, arguments=()):
+        """
+        Runs trials as Slurm jobs (`sbatch`).
+
+        Parameters
+        ----------
+        workers : int, optional
+            Number of jobs queued or running at the same time.
+        cores : int, optional
+            Number of cores per job (`--cpus-per-task`).
+        arguments : list of str, optional
+            Additional arguments of `sbatch`, e.g. `["--partition=gpu", "--gres=gpu:1"]`.
+        """
+        self.parameter = {"workers": workers, "cores": cores or 1, "arguments": list(arguments)}
+        self.jobs = {}
+
+    @property
+    def slots(self):
+        """Number of trials that can be started."""
+        return self.parameter["workers"] - len(self.jobs)
+
+    def start(self, name, command, directory):
+        """Submit a trial; see `Local.start`."""
+        cores = self.parameter["cores"]
+        command = [*command, "--threads", str(cores)]
+        job = subprocess.run(
+            ["sbatch", "--parsable", f"--job-name={name}", f"--cpus-per-task={cores}",
+             f"--output={os.path.join(directory, 'print.out')}", "--open-mode=append",
+             f"--chdir={ROOT}", *self.parameter["arguments"],
+             "--wrap", " ".join(_quote(part) for part in command)],
+            check=True, capture_output=True, text=True,
+        ).stdout.strip().split(";")[0]
+        self.jobs[name] = job
+
+    def poll(self, name):
+        """The exit status of a trial, or `None` if it is queued or running (`sacct`)."""
+        lines = subprocess.run(
+            ["sacct", "-n", "-X", "-P", "-o", "State,ExitCode", "-j", self.jobs[name]],
+            check=True, capture_output=True, text=True,
+        ).stdout.splitlines()
+        if not lines:
+            return None
+        # E.g. "CANCELLED by 1000|0:15"; only the first word of the state is compared.
+        state, code = lines[0].split("|")
+        if state.split()[0] in ("PENDING", "RUNNING", "REQUEUED",
+                                "CONFIGURING", "COMPLETING", "SUSPENDED"):
+            return None
+        del self.jobs[name]
+        # The exit code and signal; a job killed by a signal exits with 128 + signal (as a shell).
+        code, signum = (int(part) for part in code.split(":"))
+        return code or (128 + signum if signum else 0)
+
+    def stop(self, name):
+        """Stop a trial gracefully (`SIGTERM` to the batch step; see `help.training.preemption`)."""
+        subprocess.run(["scancel", "--full", "--signal=TERM", self.jobs[name]], check=True)
+
+
+class Sweep:
+    """Schedules the trials of a sweep, with successive halving or ASHA early stopping."""
+    def __init__(self, config, settings, directory="./sweep", backend=None, **other):
+        """
+        Schedules the trials of a sweep, with successive halving or ASHA early stopping.
+
+        Parameters
+        ----------
+        config : str
+            Configuration of `help.training.train`, e.g. "breakout/config.json".
+        settings : list of dict
+            Overridden settings of each trial, see `trials`.
+        directory : str, optional
+            Directory of the sweep; each trial writes to `<directory>/<trial>/`.
+        backend : Local or Slurm, optional
+            Defaults to one local worker.
+        other
+            Additional parameters.
+
+            scheduler : str, optional
+                "asha" (default) or "halving".
+            min_games : int, optional
+                Games played before the first rung, and the number of games averaged.
+            max_games : int, optional
+                Games played by the trials that are not stopped.
+            eta : int, optional
+                Reduction factor; the best `1 / eta` of the trials continue at each rung.
+            overrides : list of str, optional
+                Settings common to all trials, e.g. `["envs=4"]` (see `train.main`).
+            interval : float, optional
+                Seconds between polls of the trials.
+        """
+        self.config = os.path.abspath(config)
+        self.directory = os.path.abspath(directory)
+        self.backend = backend or Local()
+        self.parameter = {
+            "scheduler": other.get("scheduler", "asha"),
+            "min_games": other.get("min_games", 100),
+            "max_games": other.get("max_games", 1000),
+            "eta": other.get("eta", 3),
+            "overrides": list(other.get("overrides", [])),
+            "interval": other.get("interval", 1.0),
+        }
+
+        rungs, games = [], self.parameter["min_games"]
+        while games < self.parameter["max_games"]:
+            rungs.append(games)
+            games *= self.parameter["eta"]
+        self.rungs = rungs + [self.parameter["max_games"]]
+
+        self.trials = [{
+            "name": f"trial-{i}", "settings": setting, "status": "pending",
+            "games": 0, "rewards": [], "offset": 0, "rungs": {},
+        } for i, setting in enumerate(settings)]
+
+        os.makedirs(self.directory, exist_ok=True)
+        for trial in self.trials:
+            os.makedirs(os.path.join(self.directory, trial["name"]), exist_ok=True)
+
+    def run(self):
+        """
+        Run the sweep, and write the summary.
+
+        Returns
+        -------
+        list of dict
+            The trials, ranked; see `summary`.
+        """
+        if self.parameter["scheduler"] == "halving":
+            for rung in self.rungs:
+                self._play([trial for trial in self.trials if trial["status"] == "pending"], rung)
+                self._halve(rung)
+        else:
+            self._play(self.trials, self.parameter["max_games"])
+
+        return self.summary()
+
+    def summary(self):
+        """
+        Rank the trials, and write `summary.json` and `summary.csv` to the sweep directory.
+
+        The trials are ranked by the highest rung reached, then by the average reward at it.
+
+        Returns
+        -------
+        list of dict
+        """
+        ranked = sorted(self.trials, key=lambda trial: (
+            max(trial["rungs"], default=0), trial["rungs"].get(max(trial["rungs"], default=0), 0)
+        ), reverse=True)
+
+        rows = [{
+            "rank": rank, "trial": trial["name"], "status": trial["status"],
+            "games": trial["games"], "rung": max(trial["rungs"], default=None),
+            "reward": trial["rungs"].get(max(trial["rungs"], default=0)),
+            **trial["settings"],
+        } for rank, trial in enumerate(ranked, start=1)]
+
+        with open(os.path.join(self.directory, "summary.json"), "w", encoding="UTF-8") as file:
+            json.dump([{**row, "rungs": trial["rungs"]} for row, trial in zip(rows, ranked)],
+                      file, indent=2)
+        with open(os.path.join(self.directory, "summary.csv"), "w", newline="",
+                  encoding="UTF-8") as file:
+            writer = csv.DictWriter(file, fieldnames=list(rows[0]) if rows else [])
+            writer.writeheader()
+            writer.writerows(rows)
+
+        return rows
+
+    def _play(self, queue, games):
+        """Run the trials to `games` games (or until stopped), as workers become free."""
+        queue, running = list(queue), []
+        while queue or running:
+            while queue and self.backend.slots > 0:
+                trial = queue.pop(0)
+                self._start(trial, games)
+                running.append(trial)
+
+            time.sleep(self.parameter["interval"])
+            for trial in list(running):
+                self._stream(trial)
+                status = self.backend.poll(trial["name"])
+                if status is not None:
+                    self._stream(trial)
+                    self._finish(trial, status, games)
+                    running.remove(trial)
+                elif trial["status"] == "running" and self._stopping(trial):
+                    trial["status"] = "stopping"
+                    self.backend.stop(trial["name"])
+
+    def _start(self, trial, games):
+        """Start (or resume) a trial, to `games` games."""
+        directory = os.path.join(self.directory, trial["name"])
+        command = [
+            sys.executable, "-m", "help.training.train", self.config, "--games", str(games),
+            "--set", f"output={json.dumps(directory)}",
+            "--set", f"metrics={json.dumps(os.path.join(directory, 'metrics.csv'))}",
+            "--set", f"replay={json.dumps(os.path.join(directory, 'replay'))}",
+            # Checkpoints at every rung, from which `halving` resumes the trials.
+            "--set", f"checkpoint={self.parameter['min_games']}",
+            # Metrics written often enough for the trials to be stopped promptly.
+            "--set", f"flush={5 * self.parameter['interval']}",
+        ]
+        for override in self.parameter["overrides"]:
+            command += ["--set", override]
+        for key, value in trial["settings"].items():
+            command += ["--set", f"{key}={json.dumps(value)}"]
+
+        self.backend.start(trial["name"], command, directory)
+        trial["status"] = "running"
+        print(f"{trial['name']} started ({games} games): {trial['settings']}", flush=True)
+
+    def _stream(self, trial):
+        """Read the new metrics of a trial, and record its average reward at the rungs reached."""
+        path = os.path.join(self.directory, trial["name"], "metrics.csv")
+        if not os.path.exists(path):
+            return
+        with open(path, "rb") as file:
+            # Re-read from the start if the metrics were truncated on resuming (see
+            # `help.training.sink.Sink`), i.e. the offset is no longer at the end of a line.
+            if trial["offset"]:
+                file.seek(trial["offset"] - 1)
+                if file.read(1) != b"\n":
+                    trial["offset"] = 0
+            file.seek(trial["offset"])
+            text = file.read()
+        # Only complete lines; a batch may be partially written.
+        text = text[:text.rfind(b"\n") + 1]
+        trial["offset"] += len(text)
+
+        for row in csv.reader(text.decode("UTF-8").splitlines()):
+            if not row or row[0] == "game":
+                continue
+            game, reward = int(float(row[0])), float(row[-1])
+            trial["games"] = game
+            del trial["rewards"][game - 1:]
+            trial["rewards"].append(reward)
+            if game in self.rungs:
+                window = trial["rewards"][-self.parameter["min_games"]:]
+                trial["rungs"][game] = float(np.mean(window))
+
+    def _stopping(self, trial):
+        """Whether to stop a trial early (ASHA); it is below the cutoff of its latest rung."""
+        if self.parameter["scheduler"] != "asha" or not trial["rungs"]:
+            return False
+        rung = max(trial["rungs"])
+        if rung == self.parameter["max_games"]:
+            return False
+        rewards = [_trial["rungs"][rung] for _trial in self.trials if rung in _trial["rungs"]]
+        cutoff = np.quantile(rewards, 1 - 1 / self.parameter["eta"])
+        return trial["rungs"][rung] < cutoff
+
+    def _finish(self, trial, status, games):
+        """Record the outcome of a trial that exited."""
+        if trial["status"] == "stopping":
+            trial["status"] = "stopped"
+        elif status != 0:
+            trial["status"] = "failed"
+        else:
+            trial["status"] = "completed" if games == self.parameter["max_games"] else "pending"
+        print(f"{trial['name']} {trial['status']} after {trial['games']} games "
+              f"(status {status}): {trial['rungs']}", flush=True)
+
+    def _halve(self, rung):
+        """Stop all but the best `1 / eta` of the trials that reached the rung (halving)."""
+        alive = [trial for trial in self.trials
+                 if trial["status"] == "pending" and rung in trial["rungs"]]
+        alive.sort(key=lambda trial: trial["rungs"][rung], reverse=True)
+        keep = max(1, int(np.ceil(len(alive) / self.parameter["eta"])))
+        for trial in alive[keep:]:
+            trial["status"] = "stopped"
+        # Trials that did not reach the rung (e.g. no checkpoint to resume from) are stopped too.
+        for trial in self.trials:
+            if trial["status"] == "pending" and rung not in trial["rungs"]:
+                trial["status"] = "stopped"
+
+
+def _quote(part):
+    """Quote a part of a shell command."""
+    return "'" + part.replace("'", "'\"'\"'") + "'"
+
+
+def main(argv=None):
+    """Run a sweep as configured by the command line."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("config", help="JSON configuration, e.g. breakout/config.json.")
+    parser.add_argument("--directory", default="./sweep")
+    parser.add_argument("--space", action="append", default=[], metavar="KEY=[VALUES]",
+                        help="Values of a setting, e.g. optimizer.lr=[0.0001,0.000065].")
+    parser.add_argument("--samples", type=int, default=None,
+                        help="Number of trials sampled from the grid (default: all).")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Setting common to all trials, e.g. envs=4.")
+    parser.add_argument("--scheduler", choices=("asha", "halving"), default="asha")
+    parser.add_argument("--min-games", type=int, default=100)
+    parser.add_argument("--max-games", type=int, default=1000)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cores", type=int, default=None, help="Cores per trial.")
+    parser.add_argument("--backend", choices=("local", "slurm"), default="local")
+    parser.add_argument("--sbatch", action="append", default=[],
+                        help="Argument of sbatch (slurm backend), e.g. --sbatch=--partition=gpu.")
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args(argv)
+
+    space = {}
+    for _space in arguments.space:
+        key, _, values = _space.partition("=")
+        space[key.strip()] = json.loads(values)
+
+    backend = (Slurm(arguments.workers, arguments.cores, arguments.sbatch)
+               if arguments.backend == "slurm" else Local(arguments.workers, arguments.cores))
+    sweep = Sweep(arguments.config, trials(space, arguments.samples, arguments.seed),
+                  arguments.directory, backend,
+                  scheduler=arguments.scheduler, eta=arguments.eta, overrides=arguments.set,
+                  min_games=arguments.min_games, max_games=arguments.max_games)
+
+    for row in sweep.run():
+        print(json.dumps(row))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""Low-overhead per-phase timing of training loops."""
+
+import time
+import contextlib
+
+import numpy as np
+import torch
+
+# Histogram buckets are powers of two in nanoseconds; 2 ** 40 ns is about 18 minutes.
+BUCKETS = 41
+
+_DISABLED = contextlib.nullcontext()
+
+
+class Timer:
+    """Per-phase timer with aggregated histograms."""
+    def __init__(self, enabled=True, synchronize=False):
+        """
+        Per-phase timer with aggregated histograms.
+
+        Usage:
+
+            timer = Timer()
+            with timer("step"):
+                environment.step(action)
+            timer.report(logger, frames=...)
+
+        When disabled, `timer(name)` returns a shared no-op context manager and nothing is
+        recorded.
+
+        Parameters
+        ----------
+        enabled : bool, optional
+        synchronize : bool, optional
+            Wait for queued CUDA kernels before reading the clock, so that GPU time is
+            attributed to the phase that launched it (instead of to the next synchronising call).
+            Only relevant when CUDA is available, and slows down training somewhat.
+        """
+        self.enabled = enabled
+        self.synchronize = synchronize and torch.cuda.is_available()
+        self.phases = {}
+        self.start = time.perf_counter()
+
+    def __call__(self, name):
+        """
+        Time a phase.
+
+        Parameters
+        ----------
+        name : str
+            Name of the phase, e.g. "step", "preprocess" or "forward".
+
+        Returns
+        -------
+        context manager
+        """
+        return _Phase(self, name) if self.enabled else _DISABLED
+
+    def __deepcopy__(self, memo):
+        # Copies of an agent (e.g. the target network) share its timer.
+        return self
+
+    def add(self, name, nanoseconds):
+        """
+        Record the duration of a phase.
+
+        Parameters
+        ----------
+        name : str
+        nanoseconds : int
+        """
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = {"calls": 0, "nanoseconds": 0,
+                                         "histogram": [0] * BUCKETS}
+        phase["calls"] += 1
+        phase["nanoseconds"] += nanoseconds
+        phase["histogram"][min(max(nanoseconds, 1).bit_length() - 1, BUCKETS - 1)] += 1
+
+    def summary(self):
+        """
+        Summary of the phases since the last reset.
+
+        Returns
+        -------
+        summary : dict
+            For each phase; the number of calls, total seconds, share of the wall time, mean
+            duration and the (approximate) median and 99th percentile durations in seconds.
+        """
+        wall = time.perf_counter() - self.start
+        summary = {}
+        for name, phase in sorted(self.phases.items(), key=lambda item: -item[1]["nanoseconds"]):
+            seconds = phase["nanoseconds"] / 1e9
+            cumulative = np.cumsum(phase["histogram"]) / phase["calls"]
+            summary[name] = {
+                "calls": phase["calls"],
+                "seconds": seconds,
+                "share": seconds / wall if wall > 0 else 0.0,
+                "mean": seconds / phase["calls"],
+                # Upper bound of the bucket containing the percentile.
+                "p50": 2.0 ** (np.searchsorted(cumulative, 0.50) + 1) / 1e9,
+                "p99": 2.0 ** (np.searchsorted(cumulative, 0.99) + 1) / 1e9,
+            }
+        return summary
+
+    def report(self, logger, frames=None):
+        """
+        Log the per-phase breakdown (and frames per second), and reset the timer.
+
+        Parameters
+        ----------
+        logger : logging.Logger
+        frames : int, optional
+            Number of environment frames since the last reset.
+        """
+        if not self.enabled:
+            return
+
+        wall = time.perf_counter() - self.start
+        logger.info(" > Timing (%.1f seconds%s)", wall,
+                    f", {frames / wall:.1f} frames/s" if frames and wall > 0 else "")
+        for name, phase in self.summary().items():
+            logger.info("   %-12s %5.1f %%  %9.3f s  %8d calls  mean %9.1f us  "
+                        "p50 < %9.1f us  p99 < %9.1f us",
+                        name, phase["share"] * 100, phase["seconds"], phase["calls"],
+                        phase["mean"] * 1e6, phase["p50"] * 1e6, phase["p99"] * 1e6)
+
+        untimed = wall - sum(phase["nanoseconds"] for phase in self.phases.values()) / 1e9
+        logger.info("   %-12s %5.1f %%  %9.3f s", "(untimed)",
+                    untimed / wall * 100 if wall > 0 else 0.0, untimed)
+
+        self.reset()
+
+    def reset(self):
+        """Forget the recorded phases."""
+        self.phases = {}
+        self.start = time.perf_counter()
+
+
+class _Phase:
+    """Context manager timing one call of a phase."""
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = 0
+
+    def __enter__(self):
+        if self.timer.synchronize:
+            torch.cuda.synchronize()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *_):
+        if self.timer.synchronize:
+            torch.cuda.synchronize()
+        self.timer.add(self.name, time.perf_counter_ns() - self.start)
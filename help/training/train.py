@@ -0,0 +1,584 @@
+"""
+Training of the value-based vision agents from a configuration file.
+
+The agents are the `VisionDeepQ` of breakout, enduro and tetris. The settings (e.g. the
+environment, `shape`, `network`, `optimizer`, replay memory and schedule) are read from a JSON
+file, see `breakout/config.json`, and can be overridden on the command line. Relative paths in
+the configuration are relative to its directory.
+
+Usage (from the root of the repository, or `python train.py` from within a game directory):
+
+    python -m help.training.train breakout/config.json
+    python -m help.training.train breakout/config.json --threads 4 --envs 8 --device cuda
+    python -m help.training.train tetris/config.json --set games=100 --set optimizer.lr=0.0001
+    python -m help.training.train breakout/config.json --ranks 4
+    torchrun --nnodes 2 --nproc-per-node 8 ... -m help.training.train breakout/config.json
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import random
+import logging
+import argparse
+import importlib.util
+from collections import deque
+
+import numpy as np
+import torch
+import gymnasium as gym
+
+from help.training.sink import Sink
+from help.training.timing import Timer
+from help.training.profiling import Profiler
+from help.training.memory import Telemetry
+from help.training.checkpoint import Checkpointer, load_weights
+from help.training.replay import Replay
+from help.training.preemption import REQUEUE, Preemption
+from help.training.distributed import Distributed, launch
+
+# Settings
+# --------------------------------------------------------------------------------------------------
+# environment : Keyword arguments of `gymnasium.make`, e.g. `{"id": "ALE/Breakout-v5", ...}`.
+# agent : Path of the module of `VisionDeepQ`, e.g. "DQN.py".
+# games : The total number of games to be played.
+# skip : The number of frames to skip between each saved frame.
+# checkpoint : The interval at which checkpoints are saved during the training process.
+# shape : The shape of the original image, and the `[start, stop]` of the height and width.
+# discount : The discount rate for rewards in the Q-learning algorithm.
+# gamma : The discount rate for future rewards in the Q-learning algorithm.
+# gradients : The range within which gradients are clamped.
+# punishment : The punishment value for losing a game.
+# incentive : The incentive value for winning a game.
+# minibatch : The size of the minibatch used in training.
+# train_every : The interval at which the network is trained.
+# start_training_at : The game number at which the training starts; `None` starts as soon as a
+#                     game is memorized.
+# exploration : The initial (`rate`) and minimum (`min`) exploration rate, and the number of games
+#               (`steps`) over which the rate decays.
+# memorize : A game is memorized if its reward exceeds `min(slope * game, maximum)` of
+#            `min_reward`, with probability `probability` regardless of the reward, and if it is
+#            the `first` game.
+# memory : The size of the agent's internal memory.
+# reset_q_every : The interval at which the target network is updated.
+# network : A dictionary defining the architecture of the neural network.
+# optimizer : The optimizer (name in `torch.optim`), learning rate and other hyperparameters.
+# output : The directory of the log (`info.txt`), checkpoints and profiles.
+# metrics : The file path where the metrics are saved.
+# flush : The maximum number of seconds between writes of the (buffered) metrics.
+# timing : Whether to log the time spent in each phase (e.g. `step`, `forward`), and the frames
+#          per second, every `checkpoint // 2` games.
+# profile : Windows of games to profile with `torch.profiler`, e.g. `[[1000, 1010]]`. Sending
+#           `SIGUSR1` to the process profiles the following 10 games as well.
+# telemetry : Whether to log the memory use every `checkpoint // 2` games.
+# weights : Path of the initial weights (e.g. "./weights-5000.pth"), unless training is resumed.
+# keep_last : The number of most recent checkpoints to keep (`None` keeps all).
+# keep_best : The number of checkpoints with the highest average reward to keep in addition.
+# replay : The directory where the replay memory is saved (incrementally) with each checkpoint.
+# threads : The number of threads of PyTorch (`torch.set_num_threads`); `None` keeps the default.
+# envs : The number of environments played in lockstep, with one (batched) forward pass for the
+#        actions of all. Games are numbered in the order they finish. Tetris keeps the state of
+#        the game in the agent, and is therefore limited to one environment.
+# ranks : The number of local processes of a data-parallel run (see
+#         `help.training.distributed`); each plays `games` games with its own environments and
+#         replay memory, and the gradients are averaged over the ranks. Each rank writes to
+#         `rank-{rank}` of the `output` (and `metrics` and `replay`) directory. Runs over several
+#         nodes are started with `torchrun` instead, which sets the rank of each process.
+# device : The device of the agent, e.g. "cpu" or "cuda"; `None` uses CUDA if available.
+
+DEFAULTS = {
+    "agent": "DQN.py",
+    "skip": 4,
+    "gradients": [-10, 10],
+    "punishment": -1,
+    "incentive": 1,
+    "minibatch": 32,
+    "train_every": 1,
+    "start_training_at": None,
+    "exploration": {"rate": 1.0, "min": 0.1, "steps": 1000},
+    "memorize": {"min_reward": [0, 0], "probability": 0.0, "first": False},
+    "reset_q_every": 5,
+    "output": "./output",
+    "metrics": "./output/metrics.csv",
+    "flush": 30.0,
+    "timing": False,
+    "profile": [],
+    "telemetry": True,
+    "weights": None,
+    "keep_last": None,
+    "keep_best": 3,
+    "replay": "./output/replay",
+    "threads": None,
+    "envs": 1,
+    "ranks": 1,
+    "device": None,
+}
+
+PATHS = ("agent", "output", "metrics", "weights", "replay")
+
+logger = logging.getLogger(__name__)
+
+
+def configuration(path, overrides=()):
+    """
+    The settings of `path`, on top of `DEFAULTS`, with the `overrides` applied.
+
+    Parameters
+    ----------
+    path : str
+        JSON file, e.g. "breakout/config.json".
+    overrides : iterable of str, optional
+        Settings as "key=value", where nested keys are separated by dots (e.g. "optimizer.lr")
+        and the value is JSON (e.g. "null", "[1, 2]"), or else a string.
+
+    Returns
+    -------
+    dict
+    """
+    with open(path, encoding="UTF-8") as file:
+        config = {**copy.deepcopy(DEFAULTS), **json.load(file)}
+
+    for override in overrides:
+        key, _, value = override.partition("=")
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            pass
+
+        *parents, key = key.strip().split(".")
+        setting = config
+        for parent in parents:
+            setting = setting.setdefault(parent, {})
+        setting[key] = value
+
+    directory = os.path.dirname(os.path.abspath(path))
+    for key in PATHS:
+        if isinstance(config[key], str):
+            config[key] = os.path.normpath(os.path.join(directory, config[key]))
+
+    return config
+
+
+def agent(config, **other):
+    """
+    The `VisionDeepQ` agent of a configuration.
+
+    Parameters
+    ----------
+    config : dict
+        See `configuration`.
+    other
+        Additional keyword arguments of `VisionDeepQ` (e.g. `timer`), or overrides.
+
+    Returns
+    -------
+    VisionDeepQ
+    """
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(os.path.basename(config["agent"]))[0], config["agent"]
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    value_agent = module.VisionDeepQ(**parameters(config, **other))
+    if config["device"] is not None:
+        value_agent.device = torch.device(config["device"])
+        value_agent.to(value_agent.device)
+
+    return value_agent
+
+
+def parameters(config, **other):
+    """
+    The keyword arguments of the `VisionDeepQ` agent of a configuration.
+
+    Parameters
+    ----------
+    config : dict
+        See `configuration`.
+    other
+        Additional keyword arguments of `VisionDeepQ`, or overrides.
+
+    Returns
+    -------
+    dict
+    """
+    shape = copy.deepcopy(config["shape"])
+    shape["original"] = tuple(shape["original"])
+    for key in ("height", "width"):
+        shape[key] = slice(*shape[key])
+
+    optimizer = copy.deepcopy(config["optimizer"])
+    optimizer["optimizer"] = getattr(torch.optim, optimizer["optimizer"])
+
+    exploration = config["exploration"]
+    return {
+        "network": copy.deepcopy(config["network"]), "optimizer": optimizer, "shape": shape,
+        "batch_size": config["minibatch"], "memory": config["memory"],
+        "discount": config["discount"], "gamma": config["gamma"],
+        "punishment": config["punishment"], "incentive": config["incentive"],
+        "exploration_rate": exploration["rate"],
+        "exploration_steps": exploration["steps"] // config["train_every"],
+        "exploration_min": exploration["min"],
+        **other,
+    }
+
+
+class Trainer:
+    """Trains a `VisionDeepQ` agent as configured."""
+    def __init__(self, config, distributed=None):
+        """
+        Trains a `VisionDeepQ` agent as configured.
+
+        Loads the initial weights from `weights`, if given. Training is resumed from the most
+        recent checkpoint in the manifest of `output` instead, if any (see
+        `help.training.checkpoint`), along with the replay memory (see `help.training.replay`).
+
+        Parameters
+        ----------
+        config : dict
+            See `configuration`.
+        distributed : help.training.distributed.Distributed, optional
+            The process group of a data-parallel run; defaults to a single process.
+
+        Raises
+        ------
+        ValueError
+            If the agent keeps the state of the game (tetris), and `envs` is greater than one.
+        """
+        self.config = config
+
+        if config["threads"] is not None:
+            torch.set_num_threads(config["threads"])
+
+        self.environments = []
+        for _ in range(config["envs"]):
+            environment = gym.make(**config["environment"])
+            environment.metadata["render_fps"] = 30
+            self.environments.append(environment)
+
+        logger.debug("Initialising agent")
+        self.tools = {
+            "timer": Timer(enabled=config["timing"]),
+            "profiler": Profiler([tuple(window) for window in config["profile"]],
+                                 directory=config["output"], logger=logger),
+            "telemetry": Telemetry(logger, enabled=config["telemetry"]),
+            "checkpointer": Checkpointer(config["output"], logger=logger,
+                                         last=config["keep_last"], best=config["keep_best"],
+                                         metric="reward"),
+            "replay": Replay(config["replay"], logger=logger),
+            "distributed": distributed or Distributed(0, 1),
+        }
+
+        self.agent = agent(config, timer=self.tools["timer"])
+        logger.info(self.agent.eval())
+
+        # Tetris keeps the state of the game (`new`) in the agent, shared by all environments.
+        if config["envs"] > 1 and "new" in self.agent.parameter:
+            raise ValueError(f"{config['agent']} keeps the state of the game in the agent, and "
+                             f"is limited to one environment (envs={config['envs']})")
+
+        if config["weights"]:
+            load_weights(self.agent, config["weights"])
+            logger.info("Weights loaded from %s", config["weights"])
+
+        # The ranks of a data-parallel run start from the weights of rank 0, and average their
+        # gradients before each optimizer step.
+        self.tools["distributed"].broadcast(self.agent)
+        self.tools["distributed"].wrap(self.agent)
+
+        self.target = copy.deepcopy(self.agent)
+
+        # Resumes the full training state (e.g. optimizer, exploration rate and random number
+        # generators) and the replay memory from the most recent checkpoint, if any.
+        first = self.tools["checkpointer"].restore(self.agent, self.target,
+                                                   self.environments[0]) + 1
+        if first > 1:
+            self.tools["replay"].restore(self.agent)
+
+        # The metrics of the games after the checkpoint (played before a hard kill or requeue)
+        # are removed, as those games are played again.
+        self.tools["metrics"] = Sink(config["metrics"],
+                                     ["game", "steps", "loss", "exploration", "reward"],
+                                     interval=config["flush"], append=first > 1, game=first)
+
+        # On `SIGTERM` or `SIGUSR2` (e.g. ahead of the Slurm time limit), the current game is
+        # finished, the training state is checkpointed and `run` returns a status that requeues
+        # the job. Installed after `metrics`, as it replaces its `SIGTERM` handler.
+        self.tools["preemption"] = Preemption(logger=logger)
+
+        self.state = {
+            "game": first, "training": False, "first": config["memorize"]["first"],
+            "rate": self.agent.parameter["rate"], "mean": None,
+            "steps": 0, "loss": 0, "reward": 0, "samples": 0, "clock": time.perf_counter(),
+            "preempted": False, "stopped": False,
+        }
+
+    def run(self):
+        """
+        Play and learn until `games` games are played, or until the game after a preemption
+        request is finished.
+
+        Returns
+        -------
+        int
+            Exit status; `help.training.preemption.REQUEUE` if preempted, otherwise zero.
+        """
+        tools = self.tools
+
+        logger.info("Started playing")
+        start = time.time()
+        tools["timer"].reset()
+        self.state["clock"] = time.perf_counter()
+
+        tools["profiler"].step(self.state["game"])
+        games = [self._reset(environment) for environment in self.environments]
+        while self._playing():
+            actions = self._actions(games)
+            for i, environment in enumerate(self.environments):
+                if self._observe(environment, games[i], actions[i]):
+                    self._finish(games[i])
+                    if not self._playing():
+                        break
+                    tools["profiler"].step(self.state["game"])
+                    games[i] = self._reset(environment)
+
+        self.close()
+        logger.info("Total training time: %s seconds", round(time.time() - start, 2))
+        logger.debug("Metrics saved to %s", self.config["metrics"])
+
+        return REQUEUE if self.state["preempted"] else 0
+
+    def close(self):
+        """Flush and close the profiler, checkpoints, replay memory and metrics."""
+        for tool in ("profiler", "checkpointer", "replay", "metrics"):
+            self.tools[tool].close()
+
+    def _playing(self):
+        """Whether to continue playing."""
+        return self.state["game"] <= self.config["games"] and not self.state["stopped"]
+
+    def _reset(self, environment):
+        """A new game of the environment; its states and own (unmemorized) transitions."""
+        reshape = self.agent.shape["reshape"]
+        initial = self.agent.preprocess(environment.reset()[0])
+        return {
+            "states": torch.cat([initial.view(1, 1, *reshape[2:])] * reshape[1], dim=1),
+            "transitions": deque(),
+            "steps": 0, "rewards": 0,
+        }
+
+    def _actions(self, games):
+        """
+        The actions of all games; a single forward pass for the greedy actions. With one
+        environment, the agent selects the action itself (see `VisionDeepQ.action`).
+        """
+        if len(games) == 1:
+            return [None]
+
+        value_agent = self.agent
+        with self.tools["timer"]("action"):
+            with torch.no_grad():
+                actions = value_agent(torch.cat([game["states"] for game in games])).argmax(1)
+
+            explore = torch.from_numpy(np.random.rand(len(games)) < value_agent.parameter["rate"])
+            if explore.any():
+                choices = torch.from_numpy(
+                    np.random.randint(self.config["network"]["outputs"], size=len(games))
+                ).to(actions.device)
+                actions = torch.where(explore.to(actions.device), choices, actions)
+
+        return list(actions.split(1))
+
+    def _observe(self, environment, game, action):
+        """Step the game of an environment, and remember the transition. Whether it is done."""
+        # The agent remembers the transitions of the game of the environment being stepped.
+        self.agent.memory["game"] = game["transitions"]
+
+        with self.tools["profiler"].record("observe"):
+            action, states, rewards, done = self.agent.observe(
+                environment, game["states"], self.config["skip"], action=action
+            )
+        with self.tools["timer"]("remember"):
+            self.agent.remember(game["states"], action, torch.tensor(rewards))
+
+        game["states"] = states
+        game["rewards"] += rewards
+        game["steps"] += 1
+
+        return done
+
+    def _finish(self, game):
+        """Memorize the finished game, learn, and log and checkpoint."""
+        config, state, timer = self.config, self.state, self.tools["timer"]
+        value_agent = self.agent
+        number = state["game"]
+
+        ready = state["training"] or (
+            len(value_agent.memory["memory"]) > 0 if config["start_training_at"] is None
+            else number >= config["start_training_at"]
+        )
+        # The ranks of a data-parallel run start training, and stop, together.
+        waiting, state["preempted"] = self.tools["distributed"].any(
+            not ready, self.tools["preemption"].requested
+        )
+        state["training"] = not waiting
+
+        value_agent.memory["game"] = game["transitions"]
+        if self._memorize(number, game["rewards"]):
+            logger.debug("  %s --> (%s) %s", number, int(game["steps"]), int(game["rewards"]))
+            with timer("memorize"):
+                value_agent.memorize(game["states"], game["steps"])
+        value_agent.memory["game"].clear()
+
+        loss = None
+        if number % config["train_every"] == 0 and state["training"]:
+            with self.tools["profiler"].record("learn"):
+                loss = value_agent.learn(network=self.target, clamp=tuple(config["gradients"]))
+            state["rate"] = value_agent.parameter["rate"]
+            state["loss"] += loss
+            state["samples"] += min(config["minibatch"], len(value_agent.memory["memory"]))
+        state["reward"] += game["rewards"]
+        state["steps"] += game["steps"]
+
+        if number % config["reset_q_every"] == 0 and state["training"]:
+            logger.info(" Resetting target-network")
+            with timer("target"):
+                self.target.load_state_dict(value_agent.state_dict())
+
+        # Saves the metrics to a CSV file (buffered, and written in batches by a background
+        # thread). Logs the progress of the training and checkpoints the training state every
+        # `checkpoint` games.
+        self.tools["metrics"].write([number, game["steps"], loss, state["rate"],
+                                     int(game["rewards"])])
+
+        if number % (config["checkpoint"] // 2) == 0 or number == config["games"]:
+            self._log(number)
+
+        if (state["training"] and number % config["checkpoint"] == 0) or state["preempted"]:
+            self._checkpoint(number)
+
+        state["game"] += 1
+
+    def _memorize(self, game, rewards):
+        """Whether to memorize a game; see `memorize` of the configuration."""
+        memorize = self.config["memorize"]
+        if self.state["first"]:
+            self.state["first"] = False
+            return True
+        if memorize["probability"] > 0 and random.random() < memorize["probability"]:
+            return True
+        slope, maximum = memorize["min_reward"]
+        return rewards > min(slope * game, maximum)
+
+    def _log(self, game):
+        """Log the progress of the training since the previous log."""
+        config, state = self.config, self.state
+        every = config["checkpoint"] // 2
+
+        logger.info("Game %s (progress %s %%, random %s %%)",
+                    game, int(game * 100 / config["games"]), round(state["rate"] * 100, 2))
+        logger.info(" > Average steps: %s", int(state["steps"] / every))
+        logger.info(" > Average loss:  %s", state["loss"] / (every / config["train_every"]))
+        logger.info(" > Rewards:       %s", state["reward"])
+        state["mean"] = state["reward"] / every
+        self.tools["timer"].report(
+            logger, frames=state["steps"] * config["skip"] * self.agent.shape["reshape"][1]
+        )
+        self.tools["telemetry"].report(self.agent.memory["memory"])
+
+        distributed = self.tools["distributed"]
+        if distributed.world > 1:
+            frames, samples = distributed.sum(
+                state["steps"] * config["skip"] * self.agent.shape["reshape"][1], state["samples"]
+            )
+            seconds = time.perf_counter() - state["clock"]
+            logger.info(" > Ranks (%s):     %.1f frames/s, %.1f samples (games) learned/s",
+                        distributed.world, frames / seconds, samples / seconds)
+        state["steps"] = state["loss"] = state["reward"] = state["samples"] = 0
+        state["clock"] = time.perf_counter()
+
+    def _checkpoint(self, game):
+        """Checkpoint the training state and replay memory; stop if preemption is requested."""
+        logger.info("Saving model")
+        with self.tools["timer"]("checkpoint"):
+            self.tools["checkpointer"].save(
+                game, self.agent, self.target, environment=self.environments[0],
+                metrics=({"reward": self.state["mean"]}
+                         if game % self.config["checkpoint"] == 0 else {})
+            )
+            self.tools["replay"].save(self.agent, game)
+
+        if self.state["preempted"]:
+            logger.info("Stopping after game %s; the job is requeued, and resumes from here", game)
+            self.state["stopped"] = True
+
+
+def train(distributed, config):
+    """
+    Train as configured, as a rank of a (data-parallel) run.
+
+    Parameters
+    ----------
+    distributed : help.training.distributed.Distributed
+    config : dict
+        See `configuration`.
+
+    Returns
+    -------
+    int
+        Exit status; see `Trainer.run`.
+    """
+    if distributed.world > 1:
+        config = {
+            **config,
+            "output": os.path.join(config["output"], f"rank-{distributed.rank}"),
+            **{key: os.path.join(os.path.dirname(config[key]), f"rank-{distributed.rank}",
+                                 os.path.basename(config[key])) for key in ("metrics", "replay")},
+        }
+
+    os.makedirs(config["output"], exist_ok=True)
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.FileHandler(os.path.join(config["output"], "info.txt")))
+
+    return Trainer(config, distributed).run()
+
+
+def main(argv=None):
+    """Train as configured by the command line; returns the exit status."""
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("config", help="JSON configuration, e.g. breakout/config.json.")
+    parser.add_argument("--threads", type=int, default=None, help="torch.set_num_threads")
+    parser.add_argument("--envs", type=int, default=None, help="Environments played in lockstep.")
+    parser.add_argument("--device", default=None, help="Device of the agent, e.g. cpu or cuda.")
+    parser.add_argument("--games", type=int, default=None, help="Total number of games.")
+    parser.add_argument("--ranks", type=int, default=None, help="Local data-parallel processes.")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Override a setting, e.g. optimizer.lr=0.0001 (repeatable).")
+    arguments = parser.parse_args(argv)
+
+    config = configuration(arguments.config, arguments.set)
+    for key in ("threads", "envs", "device", "games", "ranks"):
+        if getattr(arguments, key) is not None:
+            config[key] = getattr(arguments, key)
+
+    # Started by `torchrun` (e.g. over several nodes), which sets the rank of each process.
+    if int(os.environ.get("WORLD_SIZE", 1)) > 1:
+        distributed = Distributed()
+        try:
+            return train(distributed, config)
+        finally:
+            distributed.close()
+
+    if config["ranks"] > 1:
+        if config["threads"] is None:
+            config["threads"] = max(1, len(os.sched_getaffinity(0)) // config["ranks"])
+        return launch(train, config["ranks"], config)
+
+    return train(Distributed(0, 1), config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
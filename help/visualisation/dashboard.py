@@ -0,0 +1,303 @@
+"""
+Live training dashboard; tails the metrics of a running job.
+
+Only the rows appended since the last update are read, and the statistics are updated online
+(exponential moving averages of bounded resolution), so that the cost is constant per new row.
+
+Usage (from the root of the repository):
+
+    python -m help.visualisation.dashboard ./breakout/output/metrics.csv --port 8000
+    python -m help.visualisation.dashboard ./breakout/output/metrics.csv --html dashboard.html
+"""
+
+import os
+import csv
+import math
+import time
+import argparse
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+
+COLORS = {"steps": "black", "loss": "black", "exploration": "orange", "reward": "orange"}
+
+
+class Tail:
+    """Incremental reader and online statistics of a metrics file."""
+    def __init__(self, path, window=50, points=1000):
+        """
+        Incremental reader and online statistics of a metrics file.
+
+        Parameters
+        ----------
+        path : str
+            The metrics; a CSV file (e.g. `./output/metrics.csv`), or a directory of binary
+            columns (see `help.training.sink.Sink`).
+        window : int, optional
+            Span of the exponential moving averages, i.e. `alpha = 2 / (window + 1)`.
+        points : int, optional
+            Resolution of the stored history of each column. When the history reaches twice
+            this size, every other point is discarded and the stride between points is doubled.
+        """
+        self.path = path
+        self.parameter = {"alpha": 2 / (window + 1), "window": window, "points": points}
+        self.reset()
+
+    def reset(self):
+        """Forget everything read so far (e.g. when the metrics file is truncated)."""
+        self.state = {"offset": 0, "columns": None, "rows": 0, "stride": 1, "last": b"",
+                      "series": {}, "updated": time.time(), "rate": 0.0}
+
+    def update(self):
+        """
+        Read the new rows and update the statistics.
+
+        Returns
+        -------
+        rows : int
+            Number of new rows.
+        """
+        rows = self._binary() if os.path.isdir(self.path) else self._csv()
+
+        for row in rows:
+            self._row(row)
+
+        # The rate is unknown for the rows that were already written before the first update.
+        now = time.time()
+        if rows and self.state["rows"] > len(rows):
+            self.state["rate"] = len(rows) / max(now - self.state["updated"], 1e-9)
+        self.state["updated"] = now
+
+        return len(rows)
+
+    def _csv(self):
+        """New complete lines of a CSV file."""
+        if not os.path.exists(self.path):
+            return []
+
+        with open(self.path, "rb") as file:
+            # The metrics were truncated or rewritten (e.g. on resuming, or by a new run) if the
+            # last line read is no longer before the offset.
+            last = self.state["last"]
+            file.seek(max(self.state["offset"] - len(last), 0))
+            if file.read(len(last)) != last:
+                self.reset()
+            file.seek(self.state["offset"])
+            data = file.read()
+
+        # A partially written line is left for the next update.
+        data = data[:data.rfind(b"\n") + 1]
+        self.state["offset"] += len(data)
+        if data:
+            self.state["last"] = data[data.rfind(b"\n", 0, -1) + 1:]
+
+        lines = list(csv.reader(data.decode("UTF-8").splitlines()))
+        if self.state["columns"] is None and lines:
+            self.state["columns"] = lines.pop(0)
+
+        return [[float(value) if value else math.nan for value in line] for line in lines if line]
+
+    def _binary(self):
+        """New rows of a directory of binary columns."""
+        files = sorted(file for file in os.listdir(self.path) if file.endswith(".f64"))
+        if not files:
+            return []
+        self.state["columns"] = [file[:-4] for file in files]
+
+        length = min(os.path.getsize(os.path.join(self.path, file)) for file in files) // 8
+        if length < self.state["offset"] or self._rewritten(files):
+            self.reset()
+            self.state["columns"] = [file[:-4] for file in files]
+
+        columns = []
+        for file in files:
+            with open(os.path.join(self.path, file), "rb") as _file:
+                _file.seek(self.state["offset"] * 8)
+                columns.append(np.frombuffer(
+                    _file.read((length - self.state["offset"]) * 8), dtype=np.float64
+                ))
+        self.state["offset"] = length
+        if columns[0].size:
+            self.state["last"] = b"".join(column[-1:].tobytes() for column in columns)
+
+        return np.stack(columns, axis=1).tolist() if columns[0].size else []
+
+    def _rewritten(self, files):
+        """Whether the last row read is no longer before the offset of the binary columns."""
+        if not self.state["offset"]:
+            return False
+        last = b""
+        for file in files:
+            with open(os.path.join(self.path, file), "rb") as _file:
+                _file.seek((self.state["offset"] - 1) * 8)
+                last += _file.read(8)
+        return last != self.state["last"]
+
+    def _row(self, row):
+        """Update the moving averages and history with one row; constant cost."""
+        columns = self.state["columns"] or []
+        game = row[columns.index("game")] if "game" in columns else self.state["rows"] + 1
+        alpha = self.parameter["alpha"]
+        sample = self.state["rows"] % self.state["stride"] == 0
+
+        for name, value in zip(columns, row):
+            if name == "game":
+                continue
+            if name not in self.state["series"]:
+                self.state["series"][name] = {"ema": math.nan, "last": math.nan,
+                                              "min": math.inf, "max": -math.inf, "history": []}
+            series = self.state["series"][name]
+
+            if value == value:  # pylint: disable=comparison-with-itself
+                series["ema"] = (series["ema"] + alpha * (value - series["ema"])
+                                 if series["ema"] == series["ema"] else value)
+                series["last"] = value
+                series["min"] = min(series["min"], value)
+                series["max"] = max(series["max"], value)
+
+            if sample:
+                series["history"].append((game, series["ema"]))
+
+        self.state["rows"] += 1
+
+        # Halving the history keeps its size (and the cost of rendering it) bounded.
+        if sample and any(len(series["history"]) >= 2 * self.parameter["points"]
+                          for series in self.state["series"].values()):
+            for series in self.state["series"].values():
+                series["history"] = series["history"][::2]
+            self.state["stride"] *= 2
+
+    def html(self, refresh=5):
+        """
+        Render the statistics as a self-refreshing HTML page with one SVG chart per column.
+
+        Parameters
+        ----------
+        refresh : int, optional
+            Seconds between page reloads.
+
+        Returns
+        -------
+        str
+        """
+        charts = "".join(_chart(name, series) for name, series in self.state["series"].items())
+        return (
+            "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+            f"<meta http-equiv='refresh' content='{refresh}'>"
+            f"<title>{os.path.basename(os.path.abspath(self.path))}</title>"
+            "<style>body{font-family:sans-serif;margin:2em}"
+            "svg{border:1px solid #ccc;margin:0.5em 0}</style></head><body>"
+            f"<h2>{os.path.abspath(self.path)}</h2>"
+            f"<p>{self.state['rows']} games, {self.state['rate']:.1f} games/s, "
+            f"EMA window {self.parameter['window']}, "
+            f"updated {time.strftime('%H:%M:%S', time.localtime(self.state['updated']))}</p>"
+            f"{charts}</body></html>"
+        )
+
+
+def _chart(name, series, width=900, height=160):
+    """SVG line chart of the moving average of a column."""
+    history = np.array([point for point in series["history"] if not np.isnan(point[1])])
+    title = (f"<text x='4' y='14' font-size='12'>{name}: EMA {series['ema']:.4g}, "
+             f"last {series['last']:.4g}, min {series['min']:.4g}, max {series['max']:.4g}</text>")
+    if len(history) < 2:
+        return f"<svg width='{width}' height='{height}'>{title}</svg>"
+
+    x, y = history[:, 0], history[:, 1]
+    logarithmic = name == "loss" and (y > 0).all()
+    if logarithmic:
+        y = np.log10(y)
+
+    x = (x - x.min()) / max(x.max() - x.min(), 1e-12) * (width - 10) + 5
+    y = height - 5 - (y - y.min()) / max(y.max() - y.min(), 1e-12) * (height - 30)
+    points = " ".join(f"{_x:.1f},{_y:.1f}" for _x, _y in zip(x, y))
+
+    return (f"<svg width='{width}' height='{height}'>{title}"
+            f"<polyline fill='none' stroke='{COLORS.get(name, 'black')}' stroke-width='1' "
+            f"points='{points}'/></svg>")
+
+
+def serve(tail, port=8000, refresh=5, host="127.0.0.1"):
+    """
+    Serve the dashboard over HTTP; the metrics are read on each request.
+
+    Parameters
+    ----------
+    tail : Tail
+    port : int, optional
+    refresh : int, optional
+        Seconds between page reloads.
+    host : str, optional
+        Address to bind to. Only this machine by default; e.g. reach it from a laptop through
+        `ssh -L 8000:localhost:8000 <node>`. "" binds to every interface.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        """Renders the dashboard."""
+        def do_GET(self):  # noqa: N802  pylint: disable=invalid-name
+            """Update the statistics and respond with the dashboard."""
+            tail.update()
+            body = tail.html(refresh).encode("UTF-8")
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            """Silence the request log."""
+
+    # One request is served at a time, as `Tail` is not thread-safe.
+    server = HTTPServer((host, port), Handler)
+    print(f"Serving {tail.path} at http://{host or 'localhost'}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def write(tail, path, interval=5):
+    """
+    Periodically write the dashboard to a static HTML file.
+
+    Parameters
+    ----------
+    tail : Tail
+    path : str
+    interval : int, optional
+        Seconds between updates.
+    """
+    try:
+        while True:
+            tail.update()
+            with open(path + ".tmp", "w", encoding="UTF-8") as file:
+                file.write(tail.html(interval))
+            os.replace(path + ".tmp", path)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
+
+
+def main():
+    """Command-line entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("path", help="Metrics file (csv) or directory (binary columns).")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to bind to; \"\" for every interface.")
+    parser.add_argument("--html", default=None,
+                        help="Write a static HTML file instead of serving over HTTP.")
+    parser.add_argument("--interval", type=int, default=5, help="Seconds between updates.")
+    parser.add_argument("--window", type=int, default=50, help="Span of the moving averages.")
+    parser.add_argument("--points", type=int, default=1000, help="Resolution of the charts.")
+    arguments = parser.parse_args()
+
+    tail = Tail(arguments.path, window=arguments.window, points=arguments.points)
+    if arguments.html:
+        write(tail, arguments.html, arguments.interval)
+    else:
+        serve(tail, arguments.port, arguments.interval, arguments.host)
+
+
+if __name__ == "__main__":
+    main()
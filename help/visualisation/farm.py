@@ -0,0 +1,183 @@
+"""Render movies of many checkpoints (e.g. `weights-*.pth`) in parallel."""
+
+import os
+import re
+import sys
+import copy
+import glob
+import math
+import time
+import multiprocessing
+
+import cv2
+import numpy as np
+import torch
+import gymnasium as gym
+
+from help.training.checkpoint import load_weights
+from help.visualisation.stream import Stream
+
+
+def farm(pattern, agent, parameters, environment, output="./movies", **other):
+    """
+    Render a greedy game for each checkpoint in a pool of processes (one environment per worker),
+    and combine them into a side-by-side grid movie.
+
+    Parameters
+    ----------
+    pattern : str
+        Glob pattern of the checkpoints, e.g. "./output/weights-*.pth".
+    agent : type
+        Agent class, e.g. `VisionDeepQ` from `breakout/DQN.py`.
+    parameters : dict
+        Keyword arguments for the agent, e.g. `{"network": ..., "optimizer": ..., "shape": ...}`.
+    environment : dict
+        Keyword arguments for `gymnasium.make`, e.g. `{"id": "ALE/Breakout-v5",
+        "render_mode": "rgb_array", "obs_type": "grayscale", "frameskip": 1}`.
+    output : str, optional
+        Directory of the movies.
+    other
+        Additional parameters.
+
+        processes : int, optional
+            Number of workers. Defaults to the number of CPUs.
+        skip : int, optional
+            Number of frames to skip between each observation (see `VisionDeepQ.observe`).
+        fps : int, optional
+            Frames per second of the movies.
+        steps : int, optional
+            Maximum number of observations per game (in case the agent never loses).
+        exploration : float, optional
+            Exploration rate while playing; e.g. to avoid getting stuck without firing.
+        scale : float, optional
+            Downscaling factor of each movie in the grid.
+        seed : int, optional
+            Seed of the environments.
+
+    Returns
+    -------
+    results : list of dict
+        The movie, number of frames, reward, time and worker of each checkpoint.
+    workers : dict
+        Frames per second of each worker.
+    """
+    checkpoints = sorted(glob.glob(pattern), key=lambda file: int(
+        re.search(r'weights-(\d+).pth', file).group(1)
+    ) if re.search(r'weights-(\d+).pth', file) else 0)
+    os.makedirs(output, exist_ok=True)
+
+    tasks = [(checkpoint, agent, parameters, environment,
+              os.path.join(output, os.path.basename(checkpoint).rsplit(".", 1)[0] + ".mp4"),
+              other) for checkpoint in checkpoints]
+
+    with multiprocessing.Pool(other.get("processes", os.cpu_count()),
+                              initializer=_initialise, initargs=(sys.path,)) as pool:
+        results = pool.map(_render, tasks)
+
+    workers = {}
+    for result in results:
+        frames, seconds = workers.get(result["worker"], (0, 0.0))
+        workers[result["worker"]] = (frames + result["frames"], seconds + result["seconds"])
+    workers = {worker: frames / seconds for worker, (frames, seconds) in workers.items()}
+
+    grid([result["movie"] for result in results], os.path.join(output, "grid.mp4"),
+         fps=other.get("fps", 30), scale=other.get("scale", 0.5))
+
+    return results, workers
+
+
+def grid(movies, path, fps=30, scale=0.5):
+    """
+    Combine movies side by side, frame by frame. Finished movies show their last frame.
+
+    Parameters
+    ----------
+    movies : list of str
+        Paths of the movies.
+    path : str
+        Path of the grid movie.
+    fps : int, optional
+    scale : float, optional
+        Downscaling factor of each movie.
+    """
+    captures = [cv2.VideoCapture(movie) for movie in movies]
+    columns = math.ceil(math.sqrt(len(movies)))
+    rows = math.ceil(len(movies) / columns)
+
+    last = [None] * len(movies)
+    with Stream(path, duration=1000 / fps) as stream:
+        while True:
+            for i, capture in enumerate(captures):
+                success, frame = capture.read()
+                if success:
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale,
+                                       interpolation=cv2.INTER_AREA)
+                    cv2.putText(frame, os.path.basename(movies[i]).rsplit(".", 1)[0], (2, 12),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.35, (255, 255, 255), 1)
+                    last[i] = (cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), True)
+                elif last[i] is not None:
+                    last[i] = (last[i][0], False)
+
+            if not any(tile is not None and tile[1] for tile in last):
+                break
+
+            height, width, _ = next(tile[0].shape for tile in last if tile is not None)
+            frame = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+            for i, tile in enumerate(last):
+                if tile is not None:
+                    row, column = divmod(i, columns)
+                    frame[row * height:(row + 1) * height,
+                          column * width:(column + 1) * width] = tile[0]
+            stream.write(frame)
+
+    for capture in captures:
+        capture.release()
+
+
+def _initialise(path):
+    """Worker initialisation; the agent class must be importable from the worker."""
+    sys.path[:] = path
+    torch.set_num_threads(1)
+
+
+def _render(task):
+    """
+    Render a greedy game of a checkpoint (see `farm`).
+
+    Parameters
+    ----------
+    task : tuple
+        Checkpoint, agent class, agent parameters, environment parameters, movie path and the
+        additional parameters of `farm`.
+
+    Returns
+    -------
+    result : dict
+    """
+    checkpoint, agent, parameters, environment, path, other = task
+
+    agent = agent(**copy.deepcopy(parameters))
+    load_weights(agent, checkpoint, assign=True).eval()
+    agent.parameter["rate"] = other.get("exploration", 0.0)
+
+    environment = gym.make(**environment)
+    states = agent.preprocess(environment.reset(seed=other.get("seed", 0))[0])
+    states = torch.cat([states.view(1, 1, *agent.shape["reshape"][2:])]
+                       * agent.shape["reshape"][1], dim=1)
+
+    start = time.perf_counter()
+    done = False
+    frames = reward = 0
+    with Stream(path, duration=1000 / other.get("fps", 30)) as stream:
+        while not done and frames < other.get("steps", 10000):
+            _, states, rewards, done = agent.observe(environment, states, other.get("skip", 1))
+
+            stream.write(environment.render())
+            reward += rewards
+            frames += 1
+    environment.close()
+
+    return {
+        "checkpoint": checkpoint, "movie": path, "frames": frames, "reward": reward,
+        "seconds": time.perf_counter() - start, "worker": os.getpid(),
+    }
@@ -1,10 +1,11 @@
 """GIF utilities for visualizing pre-trained agents interacting with environments."""
 
 import torch
-import imageio
 
+from help.visualisation.stream import Stream
 
-def gif2(environment, agent, path="./live-preview.gif", duration=50):
+
+def gif2(environment, agent, path="./live-preview.gif", duration=50, **stream):
     """
     Create a GIF of the agent playing the environment.
 
@@ -16,22 +17,23 @@ def gif2(environment, agent, path="./live-preview.gif", duration=50):
         The path to save the GIF.
     duration : int, optional
         The duration of each frame in the GIF.
+    **stream
+        Frame decimation (`every`) and downscaling (`scale`), see `Stream`.
     """
     state = torch.tensor(environment.reset()[0], dtype=torch.float32)
 
-    images = []
     terminated = truncated = False
-    while not (terminated or truncated):
-        action = agent(state).argmax().item()
+    with Stream(path, duration=duration, **stream) as writer:
+        while not (terminated or truncated):
+            action = agent(state).argmax().item()
 
-        state, _, terminated, truncated, _ = environment.step(action)
-        state = torch.tensor(state, dtype=torch.float32)
+            state, _, terminated, truncated, _ = environment.step(action)
+            state = torch.tensor(state, dtype=torch.float32)
 
-        images.append(environment.render())
-    _ = imageio.mimsave(path, images, duration=duration)
+            writer.write(environment.render())
 
 
-def gif(environment, agent, path="./live-preview.gif", skip=1, duration=50):
+def gif(environment, agent, path="./live-preview.gif", skip=1, duration=50, **stream):
     """
     Create a GIF of the agent playing the environment.
 
@@ -45,15 +47,16 @@ def gif(environment, agent, path="./live-preview.gif", skip=1, duration=50):
         The number of frames to skip between observations.
     duration : int, optional
         The duration of each frame in the GIF.
+    **stream
+        Frame decimation (`every`) and downscaling (`scale`), see `Stream`.
     """
     states = agent.preprocess(environment.reset()[0]).view(1, 1, *agent.shape["reshape"][2:])
     if hasattr(agent, "shape") and "reshape" in agent.shape:
         states = torch.cat([states] * agent.shape["reshape"][1], dim=1)
 
-    images = []
     done = False
-    while not done:
-        _, states, _, done = agent.observe(environment, states, skip)
+    with Stream(path, duration=duration, **stream) as writer:
+        while not done:
+            _, states, _, done = agent.observe(environment, states, skip)
 
-        images.append(environment.render())
-    _ = imageio.mimsave(path, images, duration=duration)
+            writer.write(environment.render())
@@ -0,0 +1,194 @@
+"""Fast loading and downsampling of (large) training metrics for plotting."""
+
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.ndimage import gaussian_filter1d
+
+
+def load(path, cache=True):
+    """
+    Load the training metrics from a CSV file (e.g. `./output/metrics.csv`), or from a directory
+    of binary columns (see `help.training.sink.Sink`).
+
+    The parsed columns are cached next to the CSV file (`<path>.npz`), and are reused as long
+    as the size and modification time of the CSV file are unchanged.
+
+    Parameters
+    ----------
+    path : str
+    cache : bool, optional
+        Whether to read and write the cache.
+
+    Returns
+    -------
+    metrics : dict of numpy.ndarray
+        Columns of the CSV file, e.g. "game", "steps", "loss", "exploration" and "reward".
+    """
+    if os.path.isdir(path):
+        return {file[:-4]: np.fromfile(os.path.join(path, file), dtype=np.float64)
+                for file in sorted(os.listdir(path)) if file.endswith(".f64")}
+
+    stat = os.stat(path)
+    key = np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    _path = path + ".npz"
+
+    if cache and os.path.exists(_path):
+        try:
+            with np.load(_path) as file:
+                if np.array_equal(file["__key__"], key):
+                    return {name: file[name] for name in file.files if name != "__key__"}
+        except (OSError, ValueError, KeyError):
+            pass
+
+    metrics = {name: column.to_numpy()
+               for name, column in pd.read_csv(path, header=0).items()}
+
+    if cache:
+        # Written to a temporary file first, so that an interrupted write never leaves a
+        # corrupt cache behind.
+        try:
+            with open(_path + ".tmp", "wb") as file:
+                np.savez(file, __key__=key, **metrics)
+            os.replace(_path + ".tmp", _path)
+        except OSError:
+            pass
+
+    return metrics
+
+
+def lttb(x, y, points=2000):
+    """
+    Largest-Triangle-Three-Buckets downsampling (Steinarsson, 2013).
+
+    Keeps the visual shape of a series (peaks and dips included) with far fewer points, as
+    opposed to simple decimation or averaging.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+    y : numpy.ndarray
+    points : int, optional
+        Number of points to keep.
+
+    Returns
+    -------
+    index : numpy.ndarray
+        Indices of the kept points.
+    """
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # The first and last points are always kept; the rest is divided into equal buckets.
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    index = np.empty(points, dtype=int)
+    index[0], index[-1] = 0, n - 1
+
+    # Average of the bucket following each bucket (the last bucket is followed by the last point).
+    bounds = np.append(edges, n)
+    cumulative = [np.concatenate([[0.0], np.cumsum(values)]) for values in (x, y)]
+    _x, _y = ((total[bounds[2:]] - total[bounds[1:-1]]) / (bounds[2:] - bounds[1:-1])
+              for total in cumulative)
+
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+
+        a = index[i]
+        area = np.abs((x[a] - _x[i]) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (_y[i] - y[a]))
+        index[i + 1] = start + area.argmax()
+
+    return index
+
+
+def distinct(x, y, points=2000):
+    """
+    Downsampling of scattered values with few distinct levels (e.g. rewards).
+
+    The x-axis is divided into equal buckets, and one point is kept per distinct value of `y` in
+    each bucket; unlike `lttb`, every level remains visible.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        Increasing x-values.
+    y : numpy.ndarray
+    points : int, optional
+        Number of buckets.
+
+    Returns
+    -------
+    index : numpy.ndarray
+        Indices of the kept points.
+    """
+    if len(x) <= points:
+        return np.arange(len(x))
+
+    x = np.asarray(x, dtype=np.float64)
+    bucket = ((x - x[0]) / (x[-1] - x[0] + 1e-9) * points).astype(np.int64)
+    levels, level = np.unique(y, return_inverse=True)
+
+    _, index = np.unique(bucket * len(levels) + level, return_index=True)
+    return np.sort(index)
+
+
+def smooth(values, window, points=2000, x=None):
+    """
+    Gaussian smoothing (as `gaussian_filter1d` with `sigma=window`) of a long series.
+
+    Long series are first averaged in blocks (much narrower than the Gaussian kernel), so that
+    the cost is independent of the length of the series.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+    window : int
+        Standard deviation of the Gaussian kernel (in number of values).
+    points : int, optional
+        Approximate number of values to return.
+    x : numpy.ndarray, optional
+        Position of each value, e.g. the game column of the metrics; defaults to its index.
+
+    Returns
+    -------
+    x : numpy.ndarray
+        Position of each smoothed value (the mean of its block).
+    y : numpy.ndarray
+    """
+    values = np.asarray(values, dtype=np.float64)
+    x = np.arange(len(values), dtype=np.float64) if x is None else np.asarray(x, np.float64)
+    block = max(1, min(len(values) // max(points, 1), window // 4))
+
+    length = len(values) // block * block
+    if block > 1:
+        values = values[:length].reshape(-1, block).mean(1)
+        x = x[:length].reshape(-1, block).mean(1)
+
+    y = gaussian_filter1d(values, sigma=window / block)
+
+    index = lttb(x, y, points)
+    return x[index], y[index]
+
+
+def rolling(values, window):
+    """
+    Rolling average (as `pandas.Series.rolling(window, min_periods=1).mean()`).
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+    window : int
+
+    Returns
+    -------
+    numpy.ndarray
+    """
+    cumulative = np.concatenate([[0.0], np.cumsum(np.asarray(values, dtype=np.float64))])
+    end = np.arange(1, len(values) + 1)
+    start = np.maximum(end - window, 0)
+    return (cumulative[end] - cumulative[start]) / (end - start)
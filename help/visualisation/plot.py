@@ -5,6 +5,8 @@ import pandas as pd
 import matplotlib.pyplot as plt
 from scipy.ndimage import gaussian_filter1d
 
+from help.visualisation.metrics import distinct, load, lttb, rolling, smooth
+
 
 def plot(metrics, title, window=50):
     """
@@ -53,34 +55,62 @@ def plot(metrics, title, window=50):
     return fig
 
 
-def graph(path, title, window=50):
+def _series(path, window, points):
     """
-    Visualise the training metrics from a CSV file.
+    Load and downsample the training metrics for `graph` and `graph_grouped_rewards`.
 
     Parameters
     ----------
     path : str
-    title : str
     window : int
-        The window size for the rolling averages.
+    points : int
 
     Returns
     -------
-    plt.Figure
+    series : dict
     """
-    metrics = pd.read_csv(path, header=0).set_index("game", drop=True)
+    metrics = load(path)
+    games = len(metrics["game"])
 
-    steps = gaussian_filter1d(metrics["steps"], sigma=window)
-    rewards = metrics.loc[metrics["reward"] != 0, "reward"]
+    trained = ~np.isnan(metrics["loss"])
+    training = metrics["game"][np.argmax(metrics["loss"] > 0)]
+
+    steps = smooth(metrics["steps"], window, points, x=metrics["game"])
+    loss = smooth(metrics["loss"][trained], window, points, x=metrics["game"][trained])
+
+    exploration = rolling(metrics["exploration"], window)
+    index = lttb(metrics["game"], exploration, points)
+    exploration = (metrics["game"][index], exploration[index])
 
-    loss = gaussian_filter1d(metrics["loss"].dropna(), sigma=window)
-    exploration = metrics["exploration"].rolling(window=window, min_periods=1).mean()
+    rewarded = metrics["reward"] != 0
+    rewards = (metrics["game"][rewarded], metrics["reward"][rewarded])
+
+    return {"games": games, "training": training, "steps": steps, "loss": loss,
+            "exploration": exploration, "rewards": rewards, "maximum": metrics["reward"].max()}
+
+
+def _axes(series, title, window):
+    """
+    Plot the exploration rate, steps and loss of `graph` and `graph_grouped_rewards`.
+
+    Parameters
+    ----------
+    series : dict
+        See `_series`.
+    title : str
+    window : int
+
+    Returns
+    -------
+    fig : plt.Figure
+    ax : numpy.ndarray of plt.Axes
+    """
+    games, training = series["games"], series["training"]
 
     fig, ax = plt.subplots(2, 1, figsize=(12, 8))
     fig.suptitle(title + f" (window size {window})")
 
-    training = metrics[metrics['loss'] > 0].index[0]
-    if training > metrics.shape[0] / 50:
+    if training > games / 50:
         ax[0].axvline(x=training, color='black', linewidth=1)
         ax[1].axvline(x=training, color='black', linewidth=1)
         ax[1].text(training, 0.5, 'Training starts',
@@ -88,104 +118,94 @@ def graph(path, title, window=50):
                    transform=ax[1].get_xaxis_transform(),
                    rotation=90)
 
-    ax[0].plot(exploration, color='orange', linewidth=1)
+    ax[0].plot(*series["exploration"], color='orange', linewidth=1)
     ax[0].set_yticks([i / 10 for i in range(0, 11, 2)])
     ax[0].set_ylabel("Exploration rate", color='orange')
     ax[0].tick_params(axis='y', colors='orange')
-    ax[0].set_xlim(0, metrics.shape[0])
+    ax[0].set_xlim(0, games)
     ax[0].set_ylim(-0.1, 1.1)
 
     step = ax[0].twinx()
-    step.plot(steps, color='black', linewidth=0.5)
+    step.plot(*series["steps"], color='black', linewidth=0.5)
     step.set_ylabel("Steps")
-    step.set_xlim(0, metrics.shape[0])
+    step.set_xlim(0, games)
 
-    ax[1].scatter(rewards.index, rewards.values, marker='*', color='orange', s=25)
-    ax[1].set_yticks(np.linspace(1, metrics["reward"].max(), 9)) \
-        if metrics["reward"].max() > 1 else None
     ax[1].set_ylabel("\u2605 Reward", color='orange')
     ax[1].set_xlabel("Game nr.")
     ax[1].tick_params(axis='y', colors='orange')
-    ax[1].set_xlim(0, metrics.shape[0])
+    ax[1].set_xlim(0, games)
 
     losses = ax[1].twinx()
-    x_values = np.linspace(training, metrics.shape[0], len(loss))
-    losses.plot(x_values, loss, color='black', linewidth=1)
+    losses.plot(*series["loss"], color='black', linewidth=1)
     losses.tick_params(axis='y')
     losses.set_ylabel("Loss")
-    losses.set_xlim(0, metrics.shape[0])
+    losses.set_xlim(0, games)
     losses.set_yscale("log")
 
-    return fig
+    return fig, ax
 
 
-def graph_grouped_rewards(path, title, window=50):
+def graph(path, title, window=50, points=2000):
     """
     Visualise the training metrics from a CSV file.
 
+    The metrics are cached and downsampled (see `help.visualisation.metrics`), so that large
+    training logs render quickly.
+
     Parameters
     ----------
     path : str
     title : str
     window : int
         The window size for the rolling averages.
+    points : int, optional
+        Maximum number of points per plotted series.
 
     Returns
     -------
     plt.Figure
     """
-    metrics = pd.read_csv(path, header=0).set_index("game", drop=True)
+    series = _series(path, window, points)
+    fig, ax = _axes(series, title, window)
 
-    steps = gaussian_filter1d(metrics["steps"], sigma=window)
-    rewards = metrics.loc[metrics["reward"] != 0, "reward"]
+    games, rewards = series["rewards"]
+    index = distinct(games, rewards, points)
+    ax[1].scatter(games[index], rewards[index], marker='*', color='orange', s=25)
+    ax[1].set_yticks(np.linspace(1, series["maximum"], 9)) \
+        if series["maximum"] > 1 else None
 
-    loss = gaussian_filter1d(metrics["loss"].dropna(), sigma=window)
-    exploration = metrics["exploration"].rolling(window=window, min_periods=1).mean()
+    return fig
 
-    fig, ax = plt.subplots(2, 1, figsize=(12, 8))
-    fig.suptitle(title + f" (window size {window})")
 
-    training = metrics[metrics['loss'] > 0].index[0]
-    if training > metrics.shape[0] / 50:
-        ax[0].axvline(x=training, color='black', linewidth=1)
-        ax[1].axvline(x=training, color='black', linewidth=1)
-        ax[1].text(training, 0.5, 'Training starts',
-                   verticalalignment='center', horizontalalignment='right',
-                   transform=ax[1].get_xaxis_transform(),
-                   rotation=90)
+def graph_grouped_rewards(path, title, window=50, points=2000):
+    """
+    Visualise the training metrics from a CSV file, with the rewards grouped in ten intervals.
 
-    ax[0].plot(exploration, color='orange', linewidth=1)
-    ax[0].set_yticks([i / 10 for i in range(0, 11, 2)])
-    ax[0].set_ylabel("Exploration rate", color='orange')
-    ax[0].tick_params(axis='y', colors='orange')
-    ax[0].set_xlim(0, metrics.shape[0])
-    ax[0].set_ylim(-0.1, 1.1)
+    Parameters
+    ----------
+    path : str
+    title : str
+    window : int
+        The window size for the rolling averages.
+    points : int, optional
+        Maximum number of points per plotted series.
 
-    step = ax[0].twinx()
-    step.plot(steps, color='black', linewidth=0.5)
-    step.set_ylabel("Steps")
-    step.set_xlim(0, metrics.shape[0])
+    Returns
+    -------
+    plt.Figure
+    """
+    series = _series(path, window, points)
+    fig, ax = _axes(series, title, window)
 
+    rewards = pd.Series(series["rewards"][1], index=series["rewards"][0])
     bins = pd.cut(rewards.index,
-                  bins=range(0, metrics.shape[0], metrics.shape[0] // 10),
+                  bins=range(0, series["games"], series["games"] // 10),
                   include_lowest=True)
     grouped_rewards = rewards.groupby([bins, rewards], observed=True).count()
     x_values = [interval.mid for interval in grouped_rewards.index.get_level_values(0)]
     y_values = grouped_rewards.index.get_level_values(1).tolist()
     marker_sizes = 25 + grouped_rewards.values * 2
     ax[1].scatter(x_values, y_values, s=marker_sizes, marker='*', color='orange')
-    ax[1].set_yticks(list(set(metrics["reward"].unique()) - {0.0}))
-    ax[1].set_ylabel("\u2605 Reward", color='orange')
-    ax[1].set_xlabel("Game nr.")
-    ax[1].tick_params(axis='y', colors='orange')
-    ax[1].set_xlim(0, metrics.shape[0])
-
-    losses = ax[1].twinx()
-    x_values = np.linspace(training, metrics.shape[0], len(loss))
-    losses.plot(x_values, loss, color='black', linewidth=1)
-    losses.tick_params(axis='y')
-    losses.set_ylabel("Loss")
-    losses.set_xlim(0, metrics.shape[0])
-    losses.set_yscale("log")
+    ax[1].set_yticks(list(set(rewards.unique()) - {0.0}))
 
     return fig
@@ -0,0 +1,144 @@
+"""Streaming GIF and MP4 writer; frames are encoded on a background thread as they are produced."""
+
+import queue
+import threading
+
+import cv2
+import numpy as np
+from PIL import Image, GifImagePlugin
+
+# The GIF frames are written one by one through these undocumented functions of Pillow (see
+# `requirements.txt` for the versions with them). Without them, the GIF is written by the public
+# `Image.save`, which holds all (quantized) frames in memory until the end.
+_STREAMING = all(hasattr(GifImagePlugin, name) for name in ("getheader", "getdata"))
+
+
+class Stream:
+    """Streaming GIF and MP4 writer."""
+    def __init__(self, path, duration=50, every=1, scale=1.0, buffer=64):
+        """
+        Streaming GIF and MP4 writer.
+
+        Frames are passed to a background thread through a bounded queue, and are written to the
+        file one by one. The memory usage is therefore constant, regardless of the number of
+        frames. If the encoding is slower than the producer, `write` waits for a free slot.
+
+        Parameters
+        ----------
+        path : str
+            The path to save the GIF (".gif") or movie (".mp4").
+        duration : int, optional
+            The duration of each (produced) frame in milliseconds.
+        every : int, optional
+            Only every n-th frame is written (decimation). The duration of each written frame is
+            scaled accordingly, so that the playback speed is unchanged.
+        scale : float, optional
+            Downscaling factor of the written frames, e.g. `0.5` for half the width and height.
+        buffer : int, optional
+            Maximum number of frames waiting to be encoded.
+        """
+        self.path = path
+        self.parameter = {
+            "duration": duration * every,
+            "every": every,
+            "scale": scale,
+            "frames": 0,
+            "errors": [],
+        }
+
+        self.queue = queue.Queue(maxsize=buffer)
+        self.thread = threading.Thread(target=self._encode, daemon=True)
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def write(self, frame):
+        """
+        Add a frame to the stream.
+
+        Parameters
+        ----------
+        frame : numpy.ndarray
+            RGB frame of shape (height, width, 3), e.g. from `environment.render()`.
+        """
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+        self.parameter["frames"] += 1
+        if (self.parameter["frames"] - 1) % self.parameter["every"] == 0:
+            self.queue.put(frame)
+
+    def close(self):
+        """Wait until all frames are written and close the file."""
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.parameter["errors"]:
+            raise self.parameter["errors"][0]
+
+    def _encode(self):
+        """Background thread; write frames from the queue until `None` is received."""
+        try:
+            if self.path.lower().endswith(".gif"):
+                self._gif()
+            else:
+                self._movie()
+        except Exception as error:  # pylint: disable=broad-exception-caught
+            self.parameter["errors"].append(error)
+
+            # Unblocks the producer and discards the remaining frames.
+            while self.queue.get() is not None:
+                pass
+
+    def _frames(self):
+        """Yield the (downscaled) frames from the queue."""
+        while (frame := self.queue.get()) is not None:
+            frame = np.asarray(frame, dtype=np.uint8)
+
+            if self.parameter["scale"] != 1.0:
+                frame = cv2.resize(frame, None,
+                                   fx=self.parameter["scale"], fy=self.parameter["scale"],
+                                   interpolation=cv2.INTER_AREA)
+
+            yield frame
+
+    def _gif(self):
+        """Write the frames as a looping GIF; each frame has its own color palette."""
+        frames = (Image.fromarray(frame).quantize(method=Image.Quantize.FASTOCTREE)
+                  for frame in self._frames())
+        if not _STREAMING:
+            first = next(frames, None)
+            if first is not None:
+                first.save(self.path, save_all=True, append_images=frames, loop=0,
+                           duration=self.parameter["duration"], disposal=1)
+            return
+
+        with open(self.path, "wb") as file:
+            for i, frame in enumerate(frames):
+                if i == 0:
+                    for chunk in GifImagePlugin.getheader(frame, None, {"loop": 0})[0]:
+                        file.write(chunk)
+                for chunk in GifImagePlugin.getdata(frame, duration=self.parameter["duration"],
+                                                    include_color_table=True, disposal=1):
+                    file.write(chunk)
+
+            file.write(b";")
+
+    def _movie(self):
+        """Write the frames as an MP4 movie."""
+        writer = None
+        try:
+            for frame in self._frames():
+                if writer is None:
+                    height, width, _ = frame.shape
+                    writer = cv2.VideoWriter(self.path, cv2.VideoWriter_fourcc(*"mp4v"),  # noqa
+                                             1000 / self.parameter["duration"], (width, height))
+
+                writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        finally:
+            if writer is not None:
+                writer.release()
@@ -0,0 +1,34 @@
+"""Tests of `help.training.train`."""
+
+import os
+
+import pytest
+
+from benchmarks import ROOT
+
+train = pytest.importorskip("help.training.train")
+# Registers the stand-in environment, "benchmarks/Atari-v0".
+pytest.importorskip("benchmarks.atari")
+
+
+def _configuration(game, directory, envs):
+    """The configuration of a game on the stand-in environment, writing to `directory`."""
+    config = train.configuration(os.path.join(ROOT, game, "config.json"), [f"envs={envs}"])
+    config["environment"] = {"id": "benchmarks/Atari-v0",
+                             "actions": config["network"]["outputs"]}
+    for key in ("output", "metrics", "replay"):
+        config[key] = os.path.join(directory, os.path.basename(config[key]))
+    return config
+
+
+def test_tetris_rejects_several_environments(tmp_path):
+    """Tetris keeps the state of the game in the agent, so it is limited to one environment."""
+    with pytest.raises(ValueError, match="one environment"):
+        train.Trainer(_configuration("tetris", str(tmp_path), envs=2))
+
+
+def test_breakout_accepts_several_environments(tmp_path):
+    """Agents without state of the game are played in lockstep."""
+    trainer = train.Trainer(_configuration("breakout", str(tmp_path), envs=2))
+    assert len(trainer.environments) == 2
+    trainer.close()